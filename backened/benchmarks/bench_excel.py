@@ -0,0 +1,108 @@
+"""Upload parsing: pandas read_excel + melt (old) vs streaming openpyxl reader.
+
+Run from ``backened/``::
+
+    python -m benchmarks.bench_excel --weights 300 --countries 220
+
+A synthetic country-weight workbook is written to a temp directory; each
+parser then runs in its own subprocess so peak RSS is measured in isolation.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_workbook(path: str, weights: int, countries: int):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("rates")
+    sheet.append(["WEIGHT"] + [f"Country {c}" for c in range(countries)])
+    for w in range(weights):
+        weight = (w + 1) * 0.5
+        sheet.append([weight] + [round(10 + weight * 3 + c * 0.01, 2) for c in range(countries)])
+    workbook.save(path)
+
+
+def parse_pandas(path: str) -> int:
+    import pandas as pd
+
+    df = pd.read_excel(path, sheet_name=0, engine="openpyxl")
+    long_df = df.melt(id_vars=["WEIGHT"], var_name="Country", value_name="Retail Rate")
+    long_df["Retail Rate"] = pd.to_numeric(long_df["Retail Rate"], errors="coerce")
+    long_df.dropna(subset=["WEIGHT", "Retail Rate"], inplace=True)
+    return len(long_df)
+
+
+def parse_streaming(path: str) -> int:
+    import pandas as pd
+
+    from src import excel
+
+    rows = excel.Sheet(path, 0)
+    try:
+        header = rows.header()
+        weights, countries, retail_rates = excel.melt_columns(rows, header, header.index("WEIGHT"))
+        long_df = pd.DataFrame({"Weight": weights, "Country": countries, "Retail Rate": retail_rates})
+    finally:
+        rows.close()
+    long_df["Retail Rate"] = pd.to_numeric(long_df["Retail Rate"], errors="coerce")
+    long_df.dropna(subset=["Weight", "Retail Rate"], inplace=True)
+    return len(long_df)
+
+
+PARSERS = {"pandas": parse_pandas, "streaming": parse_streaming}
+
+
+def _child(mode: str, path: str):
+    sys.path.insert(0, BACKEND_DIR)
+    import pandas  # noqa: F401  (import cost excluded from both timings)
+    import openpyxl  # noqa: F401
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    records = PARSERS[mode](path)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux
+    print(json.dumps({"records": records, "seconds": elapsed, "peak_mib": peak / 1024, "delta_mib": (peak - baseline) / 1024}))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--weights", type=int, default=300)
+    parser.add_argument("--countries", type=int, default=220)
+    parser.add_argument("--child", choices=sorted(PARSERS), help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child(args.child, args.path)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="bench_excel_")
+    path = os.path.join(workdir, "rates.xlsx")
+    try:
+        write_workbook(path, args.weights, args.countries)
+        print(f"workbook: {args.weights} x {args.countries} cells, {os.path.getsize(path) / 1024:.0f} KiB")
+        for mode in PARSERS:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_excel", "--child", mode, "--path", path],
+                cwd=BACKEND_DIR, check=True, capture_output=True, text=True,
+            )
+            stats = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{mode:10s} " + "  ".join(f"{k}={v:10.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in stats.items()))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
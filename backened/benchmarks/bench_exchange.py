@@ -0,0 +1,99 @@
+"""Exchange-rate cache: provider calls and latency of ``/quote?currency=PKR``.
+
+Run from ``backened/``::
+
+    python -m benchmarks.bench_exchange --clients 200 --delay 0.3
+
+The provider is the local stand-in (``exchange.StaticProvider``) with
+``--delay`` seconds of simulated API latency; the app runs in-process over a
+copy of the province DB (temp dir, the checked-in ``shippingrates_*.db``
+files are never touched). Three phases, each ``--clients`` concurrent
+requests:
+
+* cold: empty cache, every request misses; they must share one fetch;
+* warm: fresh rate, no provider call;
+* expired: past the TTL, the stale rate is served while one background
+  fetch refreshes it, so no request waits for the provider.
+
+Exits non-zero if a phase calls the provider more than once.
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def _burst(client, params: dict, clients: int) -> list:
+    async def one():
+        begin = time.perf_counter()
+        response = await client.get("/quote", params=params)
+        response.raise_for_status()
+        return time.perf_counter() - begin
+
+    return sorted(await asyncio.gather(*(one() for _ in range(clients))))
+
+
+async def _run(args) -> bool:
+    import httpx
+
+    from src import exchange, snapshots
+    from src.main import app
+
+    index = snapshots.get_rate_index(args.province)
+    country = sorted({country for country, _, _ in index.lanes})[0]
+    params = {"province": args.province, "country": country, "weight": 1, "currency": "PKR"}
+
+    provider = exchange.StaticProvider({"PKR": 280.0}, delay=args.delay)
+    exchange.set_provider(provider, ttl=args.ttl, stale=3600, path=os.path.join(os.getcwd(), "exchange_rates.json"))
+
+    ok = True
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for phase in ("cold", "warm", "expired"):
+            if phase == "expired":
+                await asyncio.sleep(args.ttl)
+            calls = provider.calls
+            samples = await _burst(client, params, args.clients)
+            if phase == "expired":
+                await asyncio.sleep(args.delay + 0.1)  # let the background refresh land before counting
+            fetched = provider.calls - calls
+            p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+            print(
+                f"{phase:8s} {args.clients} requests  provider calls={fetched}"
+                f"  p50={statistics.median(samples) * 1000:8.1f}ms  p99={p99 * 1000:8.1f}ms"
+            )
+            ok = ok and fetched <= 1
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--province", default="sindh")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.3)
+    parser.add_argument("--ttl", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="bench_exchange_")
+    src_db = os.path.join(BACKEND_DIR, f"shippingrates_{args.province}.db")
+    if os.path.exists(src_db):
+        shutil.copy(src_db, workdir)
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+    try:
+        ok = asyncio.run(_run(args))
+    finally:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
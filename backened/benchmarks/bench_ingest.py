@@ -0,0 +1,221 @@
+"""Ingestion + read-path benchmark against a throw-away province DB.
+
+Run from ``backened/``::
+
+    python -m benchmarks.bench_ingest --output benchmarks/baseline.json
+    python -m benchmarks.bench_ingest --compare benchmarks/baseline.json
+
+Every workbook layout from :mod:`benchmarks.workbooks` is uploaded through
+the FastAPI TestClient (polling ``/jobs/{id}``), then the rate endpoints are
+read cold and warm. Each step records wall time, SQL statements sent to the
+province DB and peak traced memory; ``--output`` writes them as a JSON
+baseline and ``--compare`` flags steps that got slower, chattier or bigger.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from . import workbooks
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "benchmarks", "baseline.json")
+# differences below these are noise, whatever the relative change
+MIN_WALL_DELTA_S = 0.1
+MIN_PEAK_DELTA_MIB = 1.0
+
+
+class QueryCounter:
+    """Counts cursor executions on the province DBs (job bookkeeping excluded)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if "shippingrates_" in (conn.engine.url.database or ""):
+            self.count += 1
+
+    def install(self):
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        event.listen(Engine, "before_cursor_execute", self)
+
+
+class Step:
+    def __init__(self, counter: QueryCounter, trace_memory: bool):
+        self.counter = counter
+        self.trace_memory = trace_memory
+
+    def __enter__(self):
+        self.queries = self.counter.count
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            self.memory = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_s = time.perf_counter() - self.start
+        self.queries = self.counter.count - self.queries
+        self.peak_mib = None
+        if self.trace_memory:
+            self.peak_mib = (tracemalloc.get_traced_memory()[1] - self.memory) / 2**20
+
+
+def _upload(client, province: str, file_type: str, path: str) -> dict:
+    data = {"province": province, "file_type": file_type, "sheet": 1}
+    if file_type == "student":
+        data["student"] = "true"
+    with open(path, "rb") as handle:
+        response = client.post("/upload-rates", files={"file": (os.path.basename(path), handle)}, data=data)
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    while True:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.005)
+
+
+def run(client, paths: dict, province: str, counter: QueryCounter, trace_memory: bool, reads: int) -> list:
+    steps = []
+
+    def record(name, step, **extra):
+        steps.append({"name": name, "wall_s": round(step.wall_s, 4), "queries": step.queries,
+                      "peak_mib": None if step.peak_mib is None else round(step.peak_mib, 2), **extra})
+        print(f"{name:36s} wall={step.wall_s:8.3f}s  queries={step.queries:7d}  "
+              + (f"peak={step.peak_mib:8.2f}MiB" if step.peak_mib is not None else ""))
+
+    uploads = list(paths.items()) + [("retail (re-upload)", paths["retail"])]
+    for name, path in uploads:
+        file_type = name.split(" ")[0]
+        with Step(counter, trace_memory) as step:
+            job = _upload(client, province, file_type, path)
+        if job["status"] != "done":
+            raise RuntimeError(f"{name} upload failed: {job['error']}")
+        record(f"upload {name}", step, inserted=job["inserted"], updated=job["updated"], skipped=job["skipped"])
+
+    endpoints = [
+        f"/{province}-rates",
+        f"/{province}-rates?format=columnar",
+        "/all-rates",
+        f"/quote?province={province}&country=Country%200001&weight=2&type=pkg",
+        "/compare-rates?country=Country%200001&weight=2&type=pkg",
+    ]
+    for url in endpoints:
+        with Step(counter, trace_memory) as step:
+            client.get(url).raise_for_status()
+        record(f"GET {url} (cold)", step)
+
+        with Step(counter, trace_memory) as step:
+            for _ in range(reads):
+                client.get(url).raise_for_status()
+        step.wall_s /= reads
+        record(f"GET {url} (warm)", step, repeats=reads)
+    return steps
+
+
+def compare(steps: list, baseline: dict, tolerance: float) -> list:
+    previous = {step["name"]: step for step in baseline.get("steps", [])}
+    regressions = []
+    for step in steps:
+        before = previous.get(step["name"])
+        if before is None:
+            continue
+        if step["wall_s"] > before["wall_s"] * (1 + tolerance) and step["wall_s"] - before["wall_s"] > MIN_WALL_DELTA_S:
+            regressions.append(f"{step['name']}: wall {before['wall_s']}s -> {step['wall_s']}s")
+        if step["queries"] > before["queries"]:
+            regressions.append(f"{step['name']}: queries {before['queries']} -> {step['queries']}")
+        if step["peak_mib"] is not None and before.get("peak_mib") is not None \
+                and step["peak_mib"] > before["peak_mib"] * (1 + tolerance) and step["peak_mib"] - before["peak_mib"] > MIN_PEAK_DELTA_MIB:
+            regressions.append(f"{step['name']}: peak {before['peak_mib']}MiB -> {step['peak_mib']}MiB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--province", default="sindh")
+    parser.add_argument("--countries", type=int, default=50)
+    parser.add_argument("--weights", type=int, default=20)
+    parser.add_argument("--zones", type=int, default=11)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reads", type=int, default=20, help="repeats for each warm read")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (it slows every step down)")
+    parser.add_argument("--output", help=f"write results as JSON (e.g. {os.path.relpath(DEFAULT_BASELINE, BACKEND_DIR)})")
+    parser.add_argument("--compare", help="baseline JSON to check against; exits 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown / growth")
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    workdir = tempfile.mkdtemp(prefix="bench_ingest_")
+    try:
+        paths = workbooks.generate(os.path.join(workdir, "workbooks"), args.countries, args.weights, args.zones, args.seed)
+
+        # 📌 Province DBs, job store and uploads all live in the temp dir
+        os.chdir(workdir)
+        sys.path.insert(0, BACKEND_DIR)
+        from fastapi.testclient import TestClient
+
+        from src import database, provinces
+        from src.main import app
+
+        # schemas, the upload-only imports (pandas, openpyxl) and the parse pool are
+        # lazy; load them before anything is measured (bench_startup covers that cost)
+        for name in provinces.PROVINCES:
+            database.get_session(name).close()  # runs the first-use migration
+        from src import excel, ingest, parsing  # noqa: F401
+        parsing.warm_up()
+
+        counter = QueryCounter()
+        counter.install()
+        trace_memory = not args.no_memory
+        if trace_memory:
+            tracemalloc.start()
+
+        with TestClient(app) as client:
+            steps = run(client, paths, args.province, counter, trace_memory, args.reads)
+
+        if trace_memory:
+            tracemalloc.stop()
+        database.dispose_engines()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "countries": args.countries, "weights": args.weights, "zones": args.zones, "seed": args.seed,
+            "reads": args.reads, "trace_memory": trace_memory,
+            "python": platform.python_version(), "platform": platform.platform(),
+        },
+        "steps": steps,
+    }
+    if output:
+        with open(output, "w") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"📝 wrote {output}")
+
+    if baseline_path:
+        with open(baseline_path) as handle:
+            baseline = json.load(handle)
+        if baseline["meta"].get("trace_memory") != trace_memory or any(
+            baseline["meta"].get(k) != report["meta"][k] for k in ("countries", "weights", "zones", "seed")
+        ):
+            print("⚠️ baseline was recorded with different settings; numbers are not comparable")
+        regressions = compare(steps, baseline, args.tolerance)
+        for line in regressions:
+            print(f"❌ {line}")
+        if regressions:
+            sys.exit(1)
+        print("✅ no regressions against", baseline_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Read-path load test: async endpoints vs the previous sync handlers.
+
+Run from ``backened/``::
+
+    python -m benchmarks.bench_load --clients 200 --seconds 10
+
+Each mode starts a uvicorn server (one worker) in a temp directory holding
+copies of the province DBs, so the checked-in ``shippingrates_*.db`` files
+are never touched. ``async`` serves ``src.main:app``; ``sync`` serves the
+same snapshots through plain ``def`` handlers (Starlette's threadpool), as
+the endpoints were before the async read path. ``--clients`` concurrent
+clients loop over the rate table (half revalidating with ``If-None-Match``),
+``/quote`` and ``/compare-rates`` while a probe times ``/health``. Reports
+req/s and p50/p99 latency per endpoint.
+"""
+import argparse
+import asyncio
+import glob
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {"async": "src.main:app", "sync": "benchmarks.bench_load:sync_app"}
+WEIGHTS = [0.5, 1, 2, 5, 10, 25.3, 45]
+
+
+def sync_app():
+    """The read endpoints as sync handlers over the same snapshot cache."""
+    from fastapi import FastAPI, HTTPException, Query, Request
+
+    from src import database, migrations, pricing, responses, snapshots
+    from src.provinces import PROVINCES
+
+    database.on_first_use(migrations.ensure_schema)
+    app = FastAPI()
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    @app.get("/{province}-rates")
+    def get_province_rates(request: Request, province: str, format: str = Query("rows")):
+        snapshot = snapshots.get_snapshot(province)
+        return responses.versioned_response(request, f"{province}-v{snapshot.version}-{format}", lambda: snapshot.payload(format))
+
+    @app.get("/quote")
+    def get_quote(province: str, country: str, weight: float, type: str = "pkg"):
+        index = snapshots.get_rate_index(province)
+        try:
+            return {"province": province, "country": index.canonical(country), **index.quote(country, weight, type)}
+        except (ValueError, pricing.QuoteError) as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+    @app.get("/compare-rates")
+    def compare_rates(country: str, weight: float, type: str = "pkg"):
+        rates = []
+        for province, index in zip(PROVINCES, snapshots.get_rate_indexes(PROVINCES)):
+            try:
+                rates.append({"province": province, **index.quote(country, weight, type)})
+            except (ValueError, pricing.QuoteError) as e:
+                rates.append({"province": province, "detail": str(e)})
+        return {"country": country, "rates": rates}
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(mode: str, workdir: str, port: int, env: dict = None) -> subprocess.Popen:
+    command = [sys.executable, "-m", "uvicorn", MODES[mode], "--app-dir", BACKEND_DIR,
+               "--port", str(port), "--log-level", "warning", "--no-access-log"]
+    if mode == "sync":
+        command.append("--factory")
+    server = subprocess.Popen(command, cwd=workdir, env={**os.environ, **(env or {})})
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return server
+        except httpx.TransportError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+async def _drive(base: str, province: str, clients: int, seconds: float, seed: int) -> dict:
+    latencies = {}
+    errors = {}
+    limits = httpx.Limits(max_connections=clients + 1, max_keepalive_connections=clients + 1)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as client:
+        # warm-up: snapshot load, pricing indexes, encoded bodies
+        rates = await client.get(f"/{province}-rates", headers={"accept-encoding": "gzip"})
+        etag = rates.headers.get("etag", "")
+        countries = sorted({row["Country"] for row in rates.json()["data"]}) or ["nowhere"]
+        await client.get("/compare-rates", params={"country": countries[0], "weight": 1})
+        end = time.monotonic() + seconds
+
+        async def request(label: str, path: str, **kwargs):
+            begin = time.perf_counter()
+            response = await client.get(path, **kwargs)
+            latencies.setdefault(label, []).append(time.perf_counter() - begin)
+            if response.status_code >= 500:
+                errors[label] = errors.get(label, 0) + 1
+
+        async def worker(rng: random.Random):
+            while time.monotonic() < end:
+                country, weight = rng.choice(countries), rng.choice(WEIGHTS)
+                pick = rng.random()
+                if pick < 0.25:
+                    await request("rates", f"/{province}-rates", headers={"accept-encoding": "gzip"})
+                elif pick < 0.5:
+                    await request("rates 304", f"/{province}-rates", headers={"accept-encoding": "gzip", "if-none-match": etag})
+                elif pick < 0.85:
+                    await request("quote", "/quote", params={"province": province, "country": country, "weight": weight})
+                else:
+                    await request("compare-rates", "/compare-rates", params={"country": country, "weight": weight})
+
+        async def probe():
+            while time.monotonic() < end:
+                await request("health (probe)", "/health")
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(probe(), *(worker(random.Random(seed + i)) for i in range(clients)))
+    return {"latencies": latencies, "errors": errors}
+
+
+def _report(mode: str, result: dict, seconds: float):
+    total = sum(len(samples) for samples in result["latencies"].values())
+    print(f"[{mode}] {total / seconds:,.0f} req/s total")
+    for label, samples in sorted(result["latencies"].items()):
+        samples = sorted(samples)
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        print(
+            f"  {label:16s} {len(samples) / seconds:8,.0f} req/s  p50={statistics.median(samples) * 1000:8.1f}ms"
+            f"  p99={p99 * 1000:8.1f}ms  5xx={result['errors'].get(label, 0)}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--province", default="sindh")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--mode", choices=[*MODES, "both"], default="both")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for mode in MODES if args.mode == "both" else [args.mode]:
+        workdir = tempfile.mkdtemp(prefix="bench_load_")
+        for path in glob.glob(os.path.join(BACKEND_DIR, "shippingrates_*.db")):
+            shutil.copy(path, workdir)
+        port = _free_port()
+        server = _start_server(mode, workdir, port)
+        try:
+            result = asyncio.run(_drive(f"http://127.0.0.1:{port}", args.province, args.clients, args.seconds, args.seed))
+        finally:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+        _report(mode, result, args.seconds)
+        failed = failed or bool(result["errors"])
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Bulk quote throughput: scalar RateIndex.quote vs vectorized POST /quotes.
+
+Run from ``backened/``::
+
+    python -m benchmarks.bench_quotes --quotes 100000
+
+Quotes are drawn from the lanes of a copy of the province DB (temp dir, the
+checked-in ``shippingrates_*.db`` files are never touched). Reports quotes/s
+for the scalar loop, the vectorized pricing alone and the full endpoint in
+every output format.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEIGHTS = [0.5, 1, 1.5, 2, 2.5, 5, 10, 20, 25, 25.3, 30.7, 45, 70]
+
+
+def _rate(label: str, count: int, seconds: float):
+    print(f"{label:34s} {count / seconds:12,.0f} quotes/s  ({seconds * 1000:8.1f} ms)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--province", default="sindh")
+    parser.add_argument("--quotes", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="bench_quotes_")
+    src_db = os.path.join(BACKEND_DIR, f"shippingrates_{args.province}.db")
+    if os.path.exists(src_db):
+        shutil.copy(src_db, workdir)
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+
+    from fastapi.testclient import TestClient
+
+    from src import batch, database, pricing, provinces, snapshots
+    from src.main import app
+
+    index = snapshots.get_rate_index(args.province)
+    countries = sorted({country for country, _, _ in index.lanes}) or ["nowhere"]
+    rng = random.Random(args.seed)
+    quotes = [
+        {
+            "province": args.province,
+            "country": rng.choice(countries),
+            "weight": rng.choice(WEIGHTS),
+            "type": "docs" if rng.random() < 0.2 else "pkg",
+        }
+        for _ in range(args.quotes)
+    ]
+
+    start = time.perf_counter()
+    for quote in quotes:
+        try:
+            index.quote(quote["country"], quote["weight"], quote["type"])
+        except (ValueError, pricing.QuoteError):
+            pass
+    _rate("scalar RateIndex.quote", len(quotes), time.perf_counter() - start)
+
+    tables = snapshots.get_price_tables(provinces.PROVINCES)
+    start = time.perf_counter()
+    for chunk in batch.chunked(quotes):
+        batch.price_chunk(chunk, 0, tables)
+    _rate("vectorized price_chunk", len(quotes), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in batch.stream_quotes(iter(quotes), tables, "ndjson"):
+        pass
+    _rate("price + NDJSON encode", len(quotes), time.perf_counter() - start)
+
+    client = TestClient(app)
+    ndjson_body = "".join(json.dumps(q) + "\n" for q in quotes).encode()
+    csv_buffer = io.StringIO()
+    writer = csv.DictWriter(csv_buffer, fieldnames=["province", "country", "weight", "type"])
+    writer.writeheader()
+    writer.writerows(quotes)
+    bodies = {
+        "json": (json.dumps(quotes).encode(), "application/json"),
+        "ndjson": (ndjson_body, "application/x-ndjson"),
+        "csv": (csv_buffer.getvalue().encode(), "text/csv"),
+    }
+    for name, (body, content_type) in bodies.items():
+        start = time.perf_counter()
+        response = client.post("/quotes", content=body, headers={"content-type": content_type})
+        response.raise_for_status()
+        _rate(f"POST /quotes ({name})", len(quotes), time.perf_counter() - start)
+
+    database.dispose_engines()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Per-request latency: fresh engine per request (old) vs shared province registry.
+
+Run from ``backened/``::
+
+    python -m benchmarks.bench_sessions --requests 500
+
+The province DB is copied into a temp directory first, so the checked-in
+``shippingrates_*.db`` files are never touched.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": pick(0.50) * 1000,
+        "p95_ms": pick(0.95) * 1000,
+    }
+
+
+def _time(fn, n):
+    fn()  # warm-up
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return _percentiles(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--province", default="sindh")
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="bench_sessions_")
+    src_db = os.path.join(BACKEND_DIR, f"shippingrates_{args.province}.db")
+    if os.path.exists(src_db):
+        shutil.copy(src_db, workdir)
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import sessionmaker
+
+    from src import database, models
+
+    database.Base.metadata.create_all(bind=database.get_engine(args.province))
+    probe = select(models.ShippingRate.id).limit(1)
+
+    # 🐢 Old behaviour: build an engine + sessionmaker on every request
+    def per_request_engine():
+        engine = create_engine(
+            f"sqlite:///./shippingrates_{args.province}.db",
+            connect_args={"check_same_thread": False},
+        )
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        db = SessionLocal()
+        try:
+            db.execute(probe).first()
+        finally:
+            db.close()
+
+    # 🚀 New behaviour: pooled connection from the shared registry
+    def registry_session():
+        with database.get_session(args.province) as db:
+            db.execute(probe).first()
+
+    results = {
+        "per_request_engine": _time(per_request_engine, args.requests),
+        "shared_registry": _time(registry_session, args.requests),
+    }
+
+    from fastapi.testclient import TestClient
+    from src.main import app
+
+    client = TestClient(app)
+    endpoint = f"/{args.province}-rates"
+    results[f"GET {endpoint} (registry)"] = _time(
+        lambda: client.get(endpoint), max(10, args.requests // 20)
+    )
+
+    for name, stats in results.items():
+        print(f"{name:32s} " + "  ".join(f"{k}={v:8.3f}" for k, v in stats.items()))
+
+    database.dispose_engines()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Cold-start cost of a worker: importing the app and its first requests.
+
+Run from ``backened/``::
+
+    python -m benchmarks.bench_startup --runs 5
+
+Every run is a fresh interpreter (like a gunicorn worker restart or an
+autoscaled container) in a temp directory holding copies of the province
+DBs, so the checked-in ``shippingrates_*.db`` files are never touched. It
+times ``import src.main``, the first ``/health`` and the first rate read of
+a province (schema check + snapshot load), and lists which heavy modules
+the import pulled in. Exits 1 if pandas or openpyxl are imported at start-up.
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("pandas", "openpyxl", "numpy", "sqlalchemy", "pydantic")
+UPLOAD_ONLY = ("pandas", "openpyxl")
+
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {backend!r})
+start = time.perf_counter()
+from src.main import app
+imported = time.perf_counter()
+loaded = [name for name in {heavy!r} if name in sys.modules]
+from fastapi.testclient import TestClient
+client = TestClient(app)
+timings = {{"import": imported - start}}
+for label, path in (("first /health", "/health"), ("first /{province}-rates", "/{province}-rates")):
+    begin = time.perf_counter()
+    assert client.get(path).status_code == 200, path
+    timings[label] = time.perf_counter() - begin
+print(json.dumps({{"timings": timings, "loaded": loaded}}))
+"""
+
+
+def _run_once(province: str) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench_startup_")
+    try:
+        for path in glob.glob(os.path.join(BACKEND_DIR, "shippingrates_*.db")):
+            shutil.copy(path, workdir)
+        code = CHILD.format(backend=BACKEND_DIR, heavy=HEAVY_MODULES, province=province)
+        output = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", code], cwd=workdir, capture_output=True, text=True, check=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--province", default="sindh")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    runs = [_run_once(args.province) for _ in range(args.runs)]
+    for label in runs[0]["timings"]:
+        samples = [run["timings"][label] * 1000 for run in runs]
+        print(f"{label:28s} median={statistics.median(samples):8.1f}ms  min={min(samples):8.1f}ms  max={max(samples):8.1f}ms")
+
+    loaded = runs[0]["loaded"]
+    print(f"{'loaded at import':28s} {', '.join(loaded) or '-'}")
+    eager = [name for name in UPLOAD_ONLY if name in loaded]
+    if eager:
+        print(f"❌ upload-only dependencies imported at start-up: {', '.join(eager)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
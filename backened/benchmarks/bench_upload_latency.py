@@ -0,0 +1,104 @@
+"""``/health`` latency while uploads are being parsed: in-process vs parse pool.
+
+Run from ``backened/``::
+
+    python -m benchmarks.bench_upload_latency --countries 1000 --weights 60
+
+For each setting of ``EXCEL_PARSE_PROCESSES`` (0 = parse on the ingest
+thread, the old behaviour; N = the process pool of :mod:`src.parsing`) a
+uvicorn server is started on copies of the province DBs in a temp dir.
+A large retail workbook from :mod:`benchmarks.workbooks` is then uploaded
+as dry runs, back to back, while a probe requests ``/health`` every 20ms.
+Reports the probe's p50 / p99 / max latency and the jobs' parse and total
+times.
+"""
+import argparse
+import glob
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+import httpx
+
+from . import workbooks
+from .bench_load import BACKEND_DIR, _free_port, _start_server
+
+
+def _probe(base: str, stop: threading.Event, samples: list):
+    with httpx.Client(base_url=base, timeout=60) as client:
+        while not stop.is_set():
+            begin = time.perf_counter()
+            client.get("/health").raise_for_status()
+            samples.append(time.perf_counter() - begin)
+            time.sleep(0.02)
+
+
+def _run(processes: int, workbook: str, uploads: int, province: str) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench_upload_latency_")
+    for path in glob.glob(os.path.join(BACKEND_DIR, "shippingrates_*.db")):
+        shutil.copy(path, workdir)
+    port = _free_port()
+    server = _start_server("async", workdir, port, env={"EXCEL_PARSE_PROCESSES": str(processes)})
+    base = f"http://127.0.0.1:{port}"
+    samples, jobs = [], []
+    stop = threading.Event()
+    try:
+        with httpx.Client(base_url=base, timeout=120) as client:
+            client.get(f"/{province}-rates").raise_for_status()  # schema check + snapshot before measuring
+            probe = threading.Thread(target=_probe, args=(base, stop, samples))
+            probe.start()
+            for _ in range(uploads):
+                started = time.perf_counter()
+                with open(workbook, "rb") as handle:
+                    response = client.post(
+                        "/upload-rates", files={"file": ("retail.xlsx", handle)},
+                        data={"province": province, "file_type": "retail", "sheet": 1, "dry_run": "true"},
+                    )
+                response.raise_for_status()
+                job_id = response.json()["job_id"]
+                while (job := client.get(f"/jobs/{job_id}").json())["status"] not in ("done", "failed"):
+                    time.sleep(0.05)
+                if job["status"] == "failed":
+                    raise RuntimeError(job["error"])
+                jobs.append(time.perf_counter() - started)
+            stop.set()
+            probe.join()
+    finally:
+        stop.set()
+        server.terminate()
+        server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {"health": sorted(samples), "jobs": jobs}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--province", default="sindh")
+    parser.add_argument("--countries", type=int, default=1000)
+    parser.add_argument("--weights", type=int, default=60)
+    parser.add_argument("--uploads", type=int, default=2)
+    parser.add_argument("--processes", type=int, nargs="+", default=[0, 2])
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="bench_upload_latency_wb_")
+    try:
+        workbook = os.path.join(directory, "retail.xlsx")
+        workbooks.write_workbook(workbook, workbooks.build_rows("retail", args.countries, args.weights))
+        for processes in args.processes:
+            result = _run(processes, workbook, args.uploads, args.province)
+            health = result["health"]
+            p99 = health[min(len(health) - 1, int(len(health) * 0.99))]
+            print(
+                f"EXCEL_PARSE_PROCESSES={processes}  /health p50={statistics.median(health) * 1000:7.1f}ms"
+                f"  p99={p99 * 1000:7.1f}ms  max={health[-1] * 1000:7.1f}ms"
+                f"  upload={statistics.median(result['jobs']):6.2f}s (median of {len(result['jobs'])})"
+            )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
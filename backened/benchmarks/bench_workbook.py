@@ -0,0 +1,94 @@
+"""One ``/upload-workbook`` vs one ``/upload-rates`` per sheet.
+
+Run from ``backened/``::
+
+    python -m benchmarks.bench_workbook --countries 200 --weights 50
+
+Every layout from :mod:`benchmarks.workbooks` is loaded into a throw-away
+province DB twice: sheet by sheet through ``/upload-rates`` (one job, one
+workbook open and one published card per sheet) and as a single
+``rate_card.xlsx`` through ``/upload-workbook``. Prints both totals and the
+per-sheet parse / write timings reported by the workbook job.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from . import workbooks
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _wait(client, response) -> dict:
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    while True:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            if job["status"] == "failed":
+                raise RuntimeError(job["error"])
+            return job
+        time.sleep(0.005)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sheets-province", default="sindh", help="province loaded sheet by sheet")
+    parser.add_argument("--workbook-province", default="punjab", help="province loaded from the combined workbook")
+    parser.add_argument("--countries", type=int, default=200)
+    parser.add_argument("--weights", type=int, default=50)
+    parser.add_argument("--zones", type=int, default=11)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="bench_workbook_")
+    try:
+        directory = os.path.join(workdir, "workbooks")
+        paths = workbooks.generate(directory, args.countries, args.weights, args.zones, args.seed)
+        combined = os.path.join(directory, "rate_card.xlsx")
+        manifest = workbooks.write_combined(combined, args.countries, args.weights, args.zones, args.seed)
+
+        os.chdir(workdir)
+        sys.path.insert(0, BACKEND_DIR)
+        from fastapi.testclient import TestClient
+
+        from src import database
+        from src.main import app
+
+        for name in (args.sheets_province, args.workbook_province):
+            database.get_session(name).close()  # runs the first-use migration
+        from src import excel, ingest, parsing  # noqa: F401
+        parsing.warm_up()
+
+        with TestClient(app) as client:
+            started = time.perf_counter()
+            for file_type, path in paths.items():
+                data = {"province": args.sheets_province, "file_type": file_type, "sheet": 1, "student": "true"}
+                with open(path, "rb") as handle:
+                    _wait(client, client.post("/upload-rates", files={"file": (os.path.basename(path), handle)}, data=data))
+            separate = time.perf_counter() - started
+
+            started = time.perf_counter()
+            data = {"province": args.workbook_province, "manifest": json.dumps(manifest), "student": "true"}
+            with open(combined, "rb") as handle:
+                job = _wait(client, client.post("/upload-workbook", files={"file": ("rate_card.xlsx", handle)}, data=data))
+            whole = time.perf_counter() - started
+
+            rows = [len(client.get(f"/{name}-rates").json()["data"]) for name in (args.sheets_province, args.workbook_province)]
+        database.dispose_engines()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'per-sheet /upload-rates':28s} {separate:8.3f}s  {len(paths)} jobs, {rows[0]} rows published")
+    print(f"{'one /upload-workbook':28s} {whole:8.3f}s  1 job, {rows[1]} rows published")
+    for sheet in job["result"]["sheets"]:
+        timings = sheet["timings"]
+        print(f"  {sheet['sheet']:14s} {sheet['file_type']:14s} parse={timings['parse'] * 1000:8.1f}ms  write={timings['write'] * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Synthetic rate workbooks in every layout ``/upload-rates`` accepts.
+
+Run from ``backened/``::
+
+    python -m benchmarks.workbooks /tmp/workbooks --countries 200 --weights 50
+
+Country, zone and weight sets are shared between the files, so uploading
+them in ``FILE_TYPES`` order builds a consistent province (zones first,
+then zone rates, country rates, discounts, add-kg and surcharges).
+``--combined`` also writes ``rate_card.xlsx`` with every layout as a named
+sheet, for ``/upload-workbook`` (manifest: sheet name → file type).
+"""
+import argparse
+import os
+import random
+
+from openpyxl import Workbook
+
+FILE_TYPES = (
+    "zones",
+    "zones_pkg",
+    "zones_docs",
+    "retail",
+    "docs",
+    "student",
+    "pkg_discount",
+    "addkg",
+    "zoneaddkg",
+    "surcharges",
+)
+
+# ✅ Sheets uploaded with header=None (two horizontal rows)
+HORIZONTAL = {"addkg", "zoneaddkg"}
+
+DOCS_WEIGHTS = 4  # docs sheets stop at 2 kg, like the real rate cards
+
+
+def country_names(count: int) -> list:
+    return [f"Country {i:04d}" for i in range(count)]
+
+
+def weight_brackets(count: int) -> list:
+    return [0.5 * (i + 1) for i in range(count)]
+
+
+def zone_of(index: int, zones: int) -> int:
+    return index % zones + 1
+
+
+def _rate(rng, weight: float, base: float) -> float:
+    return round(base + weight * rng.uniform(2.5, 4.0), 2)
+
+
+def build_rows(file_type: str, countries: int = 200, weights: int = 50, zones: int = 11, seed: int = 0) -> list:
+    """Cell rows (header first) for one ``file_type``; deterministic per seed."""
+    rng = random.Random(f"{file_type}-{seed}")
+    names = country_names(countries)
+    brackets = weight_brackets(weights)
+    zone_labels = [f"Zone {z}" for z in range(1, zones + 1)]
+
+    if file_type == "zones":
+        return [["COUNTRIES", "ZONE"]] + [[name, zone_of(i, zones)] for i, name in enumerate(names)]
+
+    if file_type in ("zones_pkg", "zones_docs"):
+        rows_for = brackets[:DOCS_WEIGHTS] if file_type == "zones_docs" else brackets
+        bases = [rng.uniform(5, 40) for _ in zone_labels]
+        return [["WEIGHT"] + zone_labels] + [[w] + [_rate(rng, w, b) for b in bases] for w in rows_for]
+
+    if file_type in ("retail", "docs", "student"):
+        rows_for = brackets[:DOCS_WEIGHTS] if file_type == "docs" else brackets
+        bases = [rng.uniform(5, 40) for _ in names]
+        return [["WEIGHT"] + names] + [[f"{w} KG"] + [_rate(rng, w, b) for b in bases] for w in rows_for]
+
+    if file_type == "pkg_discount":
+        header = ["COUNTRIES"] + [f"{w} KG" for w in brackets]
+        return [header] + [[name] + [_rate(rng, w, 3) for w in brackets] for name in names]
+
+    if file_type == "addkg":
+        return [["COUNTRIES"] + names, ["ADD KG"] + [round(rng.uniform(1, 6), 2) for _ in names]]
+
+    if file_type == "zoneaddkg":
+        return [["COUNTRIES"] + zone_labels, ["ADD KG"] + [round(rng.uniform(1, 6), 2) for _ in zone_labels]]
+
+    if file_type == "surcharges":
+        return [["COUNTRIES", "SURCHARGES"]] + [[name, f"${rng.uniform(0, 60):.2f}"] for name in names]
+
+    raise ValueError(f"Unknown file type '{file_type}'")
+
+
+def write_workbook(path: str, rows: list):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def write_combined(path: str, countries: int = 200, weights: int = 50, zones: int = 11, seed: int = 0) -> dict:
+    """All layouts as sheets of one workbook; returns the ``/upload-workbook`` manifest."""
+    workbook = Workbook(write_only=True)
+    for file_type in FILE_TYPES:
+        sheet = workbook.create_sheet(file_type)
+        for row in build_rows(file_type, countries, weights, zones, seed):
+            sheet.append(row)
+    workbook.save(path)
+    return {file_type: file_type for file_type in FILE_TYPES}
+
+
+def generate(directory: str, countries: int = 200, weights: int = 50, zones: int = 11, seed: int = 0) -> dict:
+    """Write one ``<file_type>.xlsx`` per layout; returns ``{file_type: path}``."""
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for file_type in FILE_TYPES:
+        path = os.path.join(directory, f"{file_type}.xlsx")
+        write_workbook(path, build_rows(file_type, countries, weights, zones, seed))
+        paths[file_type] = path
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--countries", type=int, default=200)
+    parser.add_argument("--weights", type=int, default=50)
+    parser.add_argument("--zones", type=int, default=11)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--combined", action="store_true")
+    args = parser.parse_args(argv)
+
+    paths = generate(args.directory, args.countries, args.weights, args.zones, args.seed)
+    if args.combined:
+        paths["(workbook)"] = os.path.join(args.directory, "rate_card.xlsx")
+        write_combined(paths["(workbook)"], args.countries, args.weights, args.zones, args.seed)
+    for file_type, path in paths.items():
+        print(f"{file_type:14s} {os.path.getsize(path) / 1024:8.1f} KiB  {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,475 @@
+"""Bulk quoting for ``POST /quotes``.
+
+Rows arrive as JSON, CSV or NDJSON and are parsed as the body comes in
+(:func:`row_parser`), priced in fixed-size chunks with
+:class:`pricing.PriceTable` (one per province, taken from the snapshots at
+the start of the request) and encoded chunk by chunk into a
+:class:`QuoteSpool`, so neither the body nor the output is ever held whole.
+"""
+import codecs
+import csv
+import io
+import json
+import math
+import os
+import re
+import tempfile
+
+import numpy as np
+
+from . import pricing, responses
+
+CHUNK_ROWS = 10_000
+SPOOL_BYTES = int(os.environ.get("QUOTES_SPOOL_BYTES", str(8 * 2**20)))  # output beyond this goes to disk
+READ_BYTES = 64 * 1024
+
+INPUT_FORMATS = {
+    "application/json": "json",
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+MEDIA_TYPES = {"json": "application/json", "csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+OUTPUT_FIELDS = [
+    "row", "province", "country", "weight", "type", "student",
+    "original", "discounted", "discount_dollar", "surcharge", "error",
+]
+PRICE_FIELDS = ["original", "discounted", "discount_dollar", "surcharge"]
+
+
+class BatchError(ValueError):
+    pass
+
+
+# 📥 Input → dict rows, fed piece by piece as the body arrives
+def row_parser(input_format: str) -> "RowParser":
+    return {"json": _JsonParser, "csv": _CsvParser, "ndjson": _NdjsonParser}[input_format]()
+
+
+class RowParser:
+    """``feed(data)`` returns the rows that piece of the body completes,
+    ``close()`` the rest; a malformed body raises :class:`BatchError`."""
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+
+    def feed(self, data: bytes) -> list:
+        return self._parse(self._decode(data, False), False)
+
+    def close(self) -> list:
+        return self._parse(self._decode(b"", True), True)
+
+    def _decode(self, data: bytes, final: bool) -> str:
+        try:
+            return self._decoder.decode(data, final)
+        except UnicodeDecodeError:
+            raise BatchError("Body must be UTF-8 text.")
+
+    def _parse(self, text: str, final: bool) -> list:
+        raise NotImplementedError
+
+
+class _LineParser(RowParser):
+    def __init__(self):
+        super().__init__()
+        self._partial = []  # pieces of a line whose break hasn't arrived yet
+
+    def _lines(self, text: str, final: bool) -> list:
+        """Complete lines (breaks kept); a trailing partial line waits for the next piece."""
+        if not final and text.splitlines(keepends=True) == [text] and not _line_done(text):
+            self._partial.append(text)  # no break yet: don't re-split a long line on every piece
+            return []
+        lines = ("".join(self._partial) + text).splitlines(keepends=True)
+        self._partial = []
+        if not final and lines and not _line_done(lines[-1]):
+            self._partial.append(lines.pop())
+        return lines
+
+
+def _line_done(line: str) -> bool:
+    # a lone "\r" may be the first half of "\r\n"
+    return line.splitlines()[0] != line and not line.endswith("\r")
+
+
+class _NdjsonParser(_LineParser):
+    def __init__(self):
+        super().__init__()
+        self._number = 0
+
+    def _parse(self, text: str, final: bool) -> list:
+        rows = []
+        for line in self._lines(text, final):
+            self._number += 1
+            if not line.strip():
+                continue
+            try:
+                rows.append(responses.loads(line))
+            except ValueError:
+                rows.append({"_error": f"Invalid JSON on line {self._number}."})
+        return rows
+
+
+class _CsvParser(_LineParser):
+    def __init__(self):
+        super().__init__()
+        self._header = None
+        self._record = []  # lines of a record still inside a quoted field
+        self._quotes = 0
+
+    def _parse(self, text: str, final: bool) -> list:
+        # 📌 an odd number of quotes so far → a quoted field spans the line break
+        lines = self._lines(text, final)
+        complete = "".join(lines)
+        if self._record or '"' in complete:
+            complete = []
+            for line in lines:
+                self._record.append(line)
+                self._quotes += line.count('"')
+                if self._quotes % 2 == 0:
+                    complete.extend(self._record)
+                    self._record, self._quotes = [], 0
+            if final:
+                complete.extend(self._record)
+            complete = "".join(complete)
+
+        rows = []
+        for record in csv.reader(io.StringIO(complete)):
+            if self._header is None:
+                self._header = [name.strip().lower() for name in record]
+                if "country" not in self._header:
+                    raise BatchError(CSV_HEADER_ERROR)
+            elif record:
+                rows.append(dict(zip(self._header, record)))
+        if final and self._header is None:
+            raise BatchError(CSV_HEADER_ERROR)
+        return rows
+
+
+CSV_HEADER_ERROR = "CSV must have a header row with at least 'country' and 'weight'."
+JSON_SHAPE_ERROR = "JSON body must be a list of quotes or {\"quotes\": [...]}."
+_SPACE = re.compile(r"[ \t\n\r]*")
+_MORE = object()
+
+
+class _JsonParser(RowParser):
+    """``[...]`` or ``{"quotes": [...]}``, decoded one element at a time."""
+
+    def __init__(self):
+        super().__init__()
+        self._buffer, self._pos = "", 0
+        self._state = "start"
+        self._in_object = False
+        self._key = None
+        self._quotes_seen = False
+        self._json = json.JSONDecoder()
+
+    def _parse(self, text: str, final: bool) -> list:
+        self._buffer, self._pos = self._buffer[self._pos:] + text, 0
+        rows = []
+        while True:
+            self._pos = _SPACE.match(self._buffer, self._pos).end()
+            if self._pos == len(self._buffer):
+                if final and self._state not in ("start", "done"):
+                    raise BatchError("Invalid JSON body: unexpected end of data.")
+                return rows
+            char, state = self._buffer[self._pos], self._state
+
+            if state == "done":
+                raise BatchError("Invalid JSON body: extra data after the quotes.")
+            if state == "start":
+                if char not in "[{":
+                    raise BatchError(JSON_SHAPE_ERROR)
+                self._pos += 1
+                self._in_object = char == "{"
+                self._state = "members" if self._in_object else "items"
+            elif state in ("items", "item_end") and char == "]":
+                self._pos += 1
+                self._state = "member_end" if self._in_object else "done"
+            elif state == "item_end":
+                self._expect(char, ",", "item")
+            elif state in ("items", "item"):
+                # ⚡ every complete object up to the last "}," in one decode; a cut that lands
+                # inside a string or a nested value can't parse, and falls back to one at a time
+                cut = self._buffer.rfind("},", self._pos)
+                if cut > self._pos:
+                    try:
+                        rows.extend(responses.loads("[" + self._buffer[self._pos:cut + 1] + "]"))
+                    except ValueError:
+                        pass
+                    else:
+                        self._pos, self._state = cut + 2, "item"
+                        continue
+                value = self._value(final)
+                if value is _MORE:
+                    return rows
+                rows.append(value)
+                self._state = "item_end"
+            elif state in ("members", "member_end") and char == "}":
+                if not self._quotes_seen:
+                    raise BatchError(JSON_SHAPE_ERROR)
+                self._pos += 1
+                self._state = "done"
+            elif state == "member_end":
+                self._expect(char, ",", "member")
+            elif state in ("members", "member"):
+                key = self._value(final)
+                if key is _MORE:
+                    return rows
+                if not isinstance(key, str):
+                    raise BatchError("Invalid JSON body: object keys must be strings.")
+                self._key, self._state = key, "colon"
+            elif state == "colon":
+                self._expect(char, ":", "value")
+            elif self._key == "quotes" and not self._quotes_seen:  # state == "value"
+                if char != "[":
+                    raise BatchError(JSON_SHAPE_ERROR)
+                self._pos += 1
+                self._quotes_seen, self._state = True, "items"
+            else:  # any other member is skipped
+                if self._value(final) is _MORE:
+                    return rows
+                self._state = "member_end"
+
+    def _expect(self, char: str, wanted: str, state: str):
+        if char != wanted:
+            raise BatchError(f"Invalid JSON body: expected '{wanted}'.")
+        self._pos += 1
+        self._state = state
+
+    def _value(self, final: bool):
+        try:
+            value, end = self._json.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError as e:
+            if final:
+                raise BatchError(f"Invalid JSON body: {e.msg}.")
+            return _MORE  # most likely cut off at the end of this piece
+        if end == len(self._buffer) and not final:
+            return _MORE  # a number could go on in the next piece
+        self._pos = end
+        return value
+
+
+def chunked(rows, size: int = CHUNK_ROWS):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _flag(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "y")
+    return bool(value)
+
+
+def _weight(value) -> float:
+    try:
+        weight = float(value)
+    except (TypeError, ValueError):
+        return math.nan
+    return weight if math.isfinite(weight) else math.nan  # inf is no weight either
+
+
+# 💲 One chunk of dict rows → output columns
+def price_chunk(rows: list, start: int, tables: dict, default_province: str = None, countries: dict = None,
+                canonical: dict = None) -> dict:
+    countries = {} if countries is None else countries  # raw name → normalized, shared across chunks
+    canonical = {} if canonical is None else canonical  # (province, normalized) → canonical name, likewise
+    n = len(rows)
+    rows = [row if isinstance(row, dict) else {"_error": "Each quote must be an object."} for row in rows]
+
+    provinces = [str(row.get("province") or default_province or "").strip().lower() for row in rows]
+    names = []
+    for row in rows:
+        raw = row.get("country")
+        if not isinstance(raw, str):
+            raw = "" if raw is None else str(raw)
+        name = countries.get(raw)
+        if name is None:
+            name = countries[raw] = pricing.normalize_country(raw)
+        names.append(name)
+    types = [str(row.get("type") or "pkg").strip().lower() for row in rows]
+    students = [_flag(row.get("student")) for row in rows]
+    weights = np.fromiter((_weight(row.get("weight")) for row in rows), dtype=float, count=n)
+    rate_types = [pricing.QUOTE_TYPES.get(t) for t in types]
+
+    errors = [row.get("_error") for row in rows]
+    for i in range(n):
+        if errors[i]:
+            continue
+        if provinces[i] not in tables:
+            errors[i] = f"Unknown province '{provinces[i]}'." if provinces[i] else "Missing province."
+        elif not names[i]:
+            errors[i] = "Missing country."
+        elif rate_types[i] is None:
+            errors[i] = f"Unknown type '{types[i]}'. Use 'docs' or 'pkg'."
+        elif not weights[i] > 0:
+            errors[i] = "Weight must be greater than 0."
+
+    out = {name: np.full(n, np.nan) for name in PRICE_FIELDS}
+    ok = np.array([e is None for e in errors], dtype=bool)
+    province_array = np.array(provinces, dtype=object)
+    for province, table in tables.items():
+        idx = np.flatnonzero(ok & (province_array == province))
+        if not len(idx):
+            continue
+        picked = idx.tolist()
+        result = table.price(
+            [names[i] for i in picked], weights[idx], [rate_types[i] for i in picked], [students[i] for i in picked],
+        )
+        for name in PRICE_FIELDS:
+            out[name][idx] = result[name]
+        # an overflowing add-kg price (inf) fails like quote() does
+        status = np.where(np.isfinite(result["original"]), result["status"], pricing.NO_RATE)
+        for i, status in zip(picked, status.tolist()):
+            if status != pricing.PRICED:
+                errors[i] = table.error(names[i], float(weights[i]), types[i], students[i])
+
+    failed = np.array([e is not None for e in errors], dtype=bool)
+    columns = {"weight": weights}
+    for name in PRICE_FIELDS:
+        out[name][failed] = np.nan
+        columns[name] = out[name]
+    if failed.any():  # NaN → None only where something failed
+        columns = {name: [None if v != v else v for v in values.tolist()] for name, values in columns.items()}
+    else:
+        columns = {name: values.tolist() for name, values in columns.items()}
+    # 🌍 the canonical name of the province's resolver, like /quote
+    shown = []
+    for province, name in zip(provinces, names):
+        table = tables.get(province)
+        if table is not None and name:
+            key = (province, name)
+            name = canonical.get(key)
+            if name is None:
+                name = canonical[key] = table.index.canonical(key[1])
+        shown.append(name)
+    return {
+        "row": list(range(start, start + n)),
+        "province": provinces,
+        "country": shown,
+        "type": types,
+        "student": students,
+        **columns,
+        "error": errors,
+    }
+
+
+# 💱 ?currency=PKR → <field>_pkr columns + the rate used, before "error"
+def output_fields(rate=None) -> list:
+    if rate is None:
+        return OUTPUT_FIELDS
+    converted = [f"{name}_{rate.symbol.lower()}" for name in PRICE_FIELDS]
+    return OUTPUT_FIELDS[:-1] + converted + ["exchange_rate", "error"]
+
+
+def convert_chunk(columns: dict, rate) -> dict:
+    for name in PRICE_FIELDS:
+        columns[f"{name}_{rate.symbol.lower()}"] = [None if v is None else round(v * rate.rate, 2) for v in columns[name]]
+    columns["exchange_rate"] = [rate.rate] * len(columns["row"])
+    return columns
+
+
+# 📤 Output columns → bytes
+def format_chunk(columns: dict, output_format: str, first: bool, fields: list = OUTPUT_FIELDS) -> bytes:
+    records = zip(*(columns[name] for name in fields))
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if first:
+            writer.writerow(fields)
+        writer.writerows(["" if v is None else v for v in record] for record in records)
+        return buffer.getvalue().encode("utf-8")
+
+    payloads = [dict(zip(fields, record)) for record in records]
+    if output_format == "ndjson":
+        return responses.dumps_lines(payloads)
+    body = responses.dumps(payloads)[1:-1]  # one array dump, brackets come from stream_quotes
+    return body if first else b"," + body
+
+
+class QuoteEncoder:
+    """Prices and encodes one chunk of rows at a time; ``rate`` (an
+    ``exchange.Rate``) adds the amounts converted to its currency."""
+
+    def __init__(self, tables: dict, output_format: str, default_province: str = None, rate=None):
+        self.tables = tables
+        self.output_format = output_format
+        self.default_province = default_province
+        self.rate = rate
+        self.fields = output_fields(rate)
+        self.start = 0
+        self.countries, self.canonical = {}, {}
+
+    def head(self) -> bytes:
+        return b'{"quotes":[' if self.output_format == "json" else b""
+
+    def encode(self, chunk: list) -> bytes:
+        if not chunk:
+            return b""
+        columns = price_chunk(chunk, self.start, self.tables, self.default_province, self.countries, self.canonical)
+        if self.rate is not None:
+            columns = convert_chunk(columns, self.rate)
+        body = format_chunk(columns, self.output_format, first=self.start == 0, fields=self.fields)
+        self.start += len(chunk)
+        return body
+
+    def tail(self) -> bytes:
+        if self.output_format == "csv" and self.start == 0:
+            return (",".join(self.fields) + "\n").encode("utf-8")
+        return b"]}" if self.output_format == "json" else b""
+
+
+def stream_quotes(rows, tables: dict, output_format: str, default_province: str = None, rate=None):
+    """Sync generator over an iterable of rows."""
+    encoder = QuoteEncoder(tables, output_format, default_province, rate)
+    yield encoder.head()
+    for chunk in chunked(rows):
+        yield encoder.encode(chunk)
+    yield encoder.tail()
+
+
+class QuoteSpool:
+    """Output of a request whose rows arrive with its body: ``add`` collects
+    parsed rows, ``write`` (blocking, for the reader pool) prices every full
+    chunk into a temporary file kept in memory up to ``SPOOL_BYTES``.
+    Iterating it streams the file back and closes it."""
+
+    def __init__(self, encoder: QuoteEncoder):
+        self.encoder = encoder
+        self.file = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        self.file.write(encoder.head())
+        self.pending = []
+
+    def add(self, rows: list) -> bool:
+        """True once a full chunk is waiting to be written."""
+        self.pending.extend(rows)
+        return len(self.pending) >= CHUNK_ROWS
+
+    def write(self, final: bool = False):
+        while len(self.pending) >= CHUNK_ROWS or (final and self.pending):
+            chunk, self.pending = self.pending[:CHUNK_ROWS], self.pending[CHUNK_ROWS:]
+            self.file.write(self.encoder.encode(chunk))
+        if final:
+            self.file.write(self.encoder.tail())
+            self.file.seek(0)
+
+    def close(self):
+        self.file.close()
+
+    def __iter__(self):
+        try:
+            while True:
+                block = self.file.read(READ_BYTES)
+                if not block:
+                    return
+                yield block
+        finally:
+            self.file.close()
@@ -0,0 +1,43 @@
+"""Incremental sync of the rate tables (``/{province}-rates/changes?since=N``).
+
+Every publish (uploads, ``/clear-database``, rollbacks) logs how its card
+differs from the card published before it in ``rate_changes``
+(:func:`crud.record_changes`), under a sequence number that only grows.
+``/{province}-rates`` returns the ``seq`` its rows are current to; a client
+passes it back as ``since`` and gets the last change of every row after it:
+``deletes`` (apply first), then ``upserts``. Both use the row shape of the
+rate table plus the row ``id``. The full table carries no ids, so a client
+keys its rows by lane (Country, Type, Weight, Student, Zone): a row whose
+lane changed, e.g. a country moved to another zone, comes as a delete of
+its old lane plus an upsert of the new one.
+
+``resync: true`` means "fetch the full table again": ``since`` is older
+than the compacted part of the log (``RATE_CHANGE_KEEP`` rows are kept) or
+newer than its head, or the changes outnumber the rows of the table.
+"""
+from . import crud, responses
+from .database import get_session
+
+
+def up_to_date(province: str, seq: int) -> dict:
+    return {"province": province, "since": seq, "seq": seq, "resync": False, "deletes": [], "upserts": []}
+
+
+def changes_since(province: str, since: int) -> dict:
+    with get_session(province) as db:
+        seq, compacted, rows = crud.get_change_state(db)
+        result = {**up_to_date(province, seq), "since": since}
+        if since == seq:
+            return result
+        if since < compacted or since > seq:
+            result["resync"] = True
+            return result
+        changes = crud.get_changes(db, since, seq)
+    if len(changes) > rows:
+        result["resync"] = True  # the table itself is the smaller download
+        return result
+    for rate_id, op, *values in changes:
+        row = dict(zip(responses.FIELDS, values))
+        row["id"] = rate_id
+        result["deletes" if op == "delete" else "upserts"].append(row)
+    return result
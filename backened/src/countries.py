@@ -0,0 +1,203 @@
+"""Country dimension: canonical ids, aliases and the name resolver.
+
+Every province DB has a ``countries`` table (one canonical name per id) and
+``country_aliases`` (other spellings → id). :class:`CountryResolver` keeps
+both in dicts and resolves a name by its key (``models.country_key``), then
+by its squashed key (letters and digits only, so "Costa Rica" finds
+"costarica"), then by a difflib close match (memoized per resolver).
+
+Uploads resolve every sheet name through :class:`UploadCountries`, which
+only trusts exact and alias matches: a typo must not write rates onto
+another country's lanes. Names that match nothing become new countries and
+are reported as ``countries.unresolved`` in the upload result; a close match
+is only a warning (``countries.fuzzy``: name → the country it may mean).
+``POST /country-aliases`` with such a name merges the new country into the
+one it meant, rates included. The quote path resolves through the
+resolver of the province snapshot, fuzzy matches included.
+"""
+import difflib
+import os
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+from . import crud, models
+
+FUZZY_CUTOFF = float(os.environ.get("COUNTRY_FUZZY_CUTOFF", "0.9"))
+FUZZY_CACHE_SIZE = 4096
+
+# how a name was resolved
+EXACT = "exact"
+ALIAS = "alias"
+FUZZY = "fuzzy"
+
+# 📌 Common spellings of countries the rate sheets store differently; seeded
+# by the migration for every target that exists in the province
+BUILTIN_ALIASES = {
+    "united arab emirates": "uae",
+    "emirates": "uae",
+    "united kingdom": "uk",
+    "great britain": "uk",
+    "britain": "uk",
+    "england": "uk",
+    "united states": "usa",
+    "united states of america": "usa",
+    "us": "usa",
+    "america": "usa",
+    "ksa": "saudi arabia",
+    "czech republic": "czechrep.",
+    "czechia": "czechrep.",
+    "netherlands": "netherland",
+    "holland": "netherland",
+    "papua new guinea": "papuanew",
+    "ivory coast": "cote d'ivoire",
+    "republic of korea": "south korea",
+    "dprk": "north korea",
+    "burma": "myanmar",
+    "eswatini": "swaziland",
+    "macedonia": "north macedonia",
+    "turkiye": "turkey",
+    "russian federation": "russia",
+    "viet nam": "vietnam",
+    "lao pdr": "laos",
+    "macao": "macau",
+    "cabo verde": "cape verde",
+    "east timor": "timor-leste",
+    "british virgin islands": "virgin islands-british",
+    "us virgin islands": "virgin islands-us",
+    "bosnia and herzegovina": "bosnia & herzegovina",
+    "trinidad & tobago": "trinidad and tobago",
+    "saint kitts and nevis": "st.kitts",
+    "saint lucia": "st.lucia",
+    "saint vincent": "st.vincent",
+    "guinea republic": "guinearep",
+    "equatorial guinea": "guinea-equatorial",
+    "central african republic": "central african",
+    "dominican republic": "dominican rep",
+    "moldova": "moldova rep",
+    "montenegro": "montenegro rep",
+    "somaliland": "somaliland rep",
+}
+
+
+def squash(key: str) -> str:
+    return "".join(ch for ch in key if ch.isalnum())
+
+
+class Match(NamedTuple):
+    id: int
+    name: str  # canonical name
+    how: str   # EXACT, ALIAS or FUZZY
+
+
+class CountryResolver:
+    def __init__(self, countries=(), aliases=()):
+        """``countries`` are (id, name) pairs, ``aliases`` (alias, country id)."""
+        self._closest = lru_cache(maxsize=FUZZY_CACHE_SIZE)(self._closest_uncached)
+        self.names = {}     # id → canonical name
+        self.ids = {}       # canonical name or alias → id
+        self.squashed = {}  # squashed key → id (None when two countries share it)
+        for id_, name in countries:
+            self.add(id_, name)
+        for alias, id_ in aliases:
+            if id_ in self.names:
+                self._index(alias, id_)
+
+    def add(self, id_: int, name: str):
+        self.names[id_] = name
+        self._index(name, id_)
+
+    def _index(self, key: str, id_: int):
+        self.ids.setdefault(key, id_)
+        squashed = squash(key)
+        if squashed and self.squashed.setdefault(squashed, id_) != id_:
+            self.squashed[squashed] = None  # ambiguous → never matched this way
+        self._closest.cache_clear()  # a new name can be the closer match
+
+    def resolve(self, country, fuzzy: bool = True) -> Optional[Match]:
+        key = models.country_key(country)
+        if not key:
+            return None
+        id_ = self.ids.get(key)
+        if id_ is not None:
+            return Match(id_, self.names[id_], EXACT if self.names[id_] == key else ALIAS)
+        id_ = self.squashed.get(squash(key))
+        if id_ is not None:
+            return Match(id_, self.names[id_], ALIAS)
+        return self._closest(key) if fuzzy else None
+
+    def closest(self, country) -> Optional[Match]:
+        """Fuzzy match only (the name itself is not known)."""
+        key = models.country_key(country)
+        return self._closest(key) if key else None
+
+    def _closest_uncached(self, key: str) -> Optional[Match]:
+        close = difflib.get_close_matches(key, self.ids.keys(), n=1, cutoff=FUZZY_CUTOFF)
+        if not close:
+            return None
+        id_ = self.ids[close[0]]
+        return Match(id_, self.names[id_], FUZZY)
+
+    def canonical(self, country) -> str:
+        """Canonical name, or the plain key when nothing matches."""
+        match = self.resolve(country)
+        return match.name if match is not None else models.country_key(country)
+
+
+def load_resolver(db) -> CountryResolver:
+    rows = crud.get_country_names(db)
+    return CountryResolver(
+        sorted((id_, name) for name, id_, alias in rows if not alias),
+        [(name, id_) for name, id_, alias in rows if alias],
+    )
+
+
+class UploadCountries:
+    """Resolver of one upload: exact and alias matches only. Names that
+    match nothing are added as new countries inside the upload's transaction
+    (so a dry run or a failed upload leaves none behind) and listed in
+    :meth:`summary`, with the known country each one might be a typo of."""
+
+    def __init__(self, db, resolver: CountryResolver = None):
+        self.db = db
+        self.resolver = resolver or load_resolver(db)
+        self.unresolved = {}  # key → whether a country was created for it
+        self.fuzzy = {}       # key → canonical name it is close to (not applied)
+
+    def resolve(self, country, create: bool = True) -> Optional[Match]:
+        match = self.resolver.resolve(country, fuzzy=False)
+        if match is not None:
+            return match
+        key = models.country_key(country)
+        if not key:
+            return None
+        if key not in self.unresolved:
+            close = self.resolver.closest(key)  # ⚠️ before add(): the new name would match itself
+            if close is not None:
+                self.fuzzy[key] = close.name
+        if create:
+            id_ = crud.add_country(self.db, key)
+            self.resolver.add(id_, key)
+            self.unresolved[key] = True
+            return Match(id_, key, EXACT)
+        self.unresolved.setdefault(key, False)
+        return None
+
+    def resolve_many(self, names, create: bool = True) -> dict:
+        """``{name: Match or None}`` for every distinct name."""
+        return {name: self.resolve(name, create) for name in dict.fromkeys(names)}
+
+    def summary(self) -> dict:
+        return {
+            "unresolved": sorted(self.unresolved),
+            "created": sorted(key for key, created in self.unresolved.items() if created),
+            "fuzzy": dict(sorted(self.fuzzy.items())),
+            "warnings": [self._warning(key, name) for key, name in sorted(self.fuzzy.items())],
+        }
+
+    def _warning(self, key: str, name: str) -> str:
+        if not self.unresolved.get(key):
+            return f"'{key}' matched no country (closest: '{name}'); its rows were skipped."
+        return (
+            f"'{key}' was added as a new country, not matched to '{name}'; if it is the same country, "
+            f"POST /country-aliases?alias={key}&country={name} merges it."
+        )
@@ -0,0 +1,105 @@
+"""Country autocomplete (``/countries?province=&prefix=``).
+
+:class:`CountryIndex` is built once per snapshot version from the rate rows
+and the country dimension. It holds one sorted array of search keys: every
+canonical name with rates in the province and every alias of one. A prefix
+is the range ``bisect_left(prefix) .. bisect_left(prefix + U+10FFFF)`` of that
+array, so a lookup costs two binary searches plus the matches it returns.
+Each match carries the country's zone and rate types, which lets a client
+autocomplete without downloading the rate table.
+"""
+from bisect import bisect_left
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from . import models
+from .pricing import dictionary_codes
+
+RATE_TYPES = ("docs", "non-docs")
+_END = "\U0010ffff"  # sorts after every character a key can hold
+
+
+class CountryInfo(NamedTuple):
+    name: str
+    zone: Optional[str]
+    types: tuple
+
+
+class CountryIndex:
+    def __init__(self, infos: dict, aliases=(), version: int = 0):
+        """``infos``: canonical name → :class:`CountryInfo`; ``aliases``: (alias, canonical name)."""
+        self.version = version
+        entries = {models.country_key(name): name for name in infos}
+        for alias, name in aliases:
+            if name in infos:
+                entries.setdefault(alias, name)
+        self.keys = sorted(entries)
+        self.countries = [infos[entries[key]] for key in self.keys]
+
+    @classmethod
+    def from_rows(cls, rows, resolver=None, version: int = 0) -> "CountryIndex":
+        zones, types = {}, {}
+        for country, _, type_, _, _, _, zone, _, _ in rows:
+            if zone is not None and (type_ == "zone" or country not in zones):
+                zones[country] = zone  # 📌 the zone row wins over the zone copied onto rate rows
+            if type_ in RATE_TYPES:
+                types.setdefault(country, set()).add(type_)
+        infos = {
+            country: CountryInfo(country, zones.get(country), tuple(sorted(types.get(country, ()))))
+            for country in {row[0] for row in rows}
+        }
+        return cls(infos, _aliases(resolver), version)
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, resolver=None, version: int = 0) -> "CountryIndex":
+        """:meth:`from_rows` over the columns of a binary snapshot (``snapshot_files.load``)."""
+        names, country = dictionary_codes(arrays, "country")
+        types, type_ = dictionary_codes(arrays, "type")
+        zone_names, zone = dictionary_codes(arrays, "zone")
+        present, zoned = np.unique(country), zone != len(zone_names) - 1  # last code: null
+
+        # 📌 the last zone row wins over the first zone copied onto a rate row (as in from_rows)
+        zones, zone_rows = {}, type_ == _code(types, "zone")
+        for rows, last in ((zoned & ~zone_rows, False), (zoned & zone_rows, True)):
+            codes, values = (country[rows][::-1], zone[rows][::-1]) if last else (country[rows], zone[rows])
+            found, at = np.unique(codes, return_index=True)
+            for code, i in zip(found.tolist(), at.tolist()):
+                zones[names[code]] = zone_names[values[i]]
+
+        rated = np.isin(type_, [_code(types, name) for name in RATE_TYPES])
+        pairs = np.unique(np.stack([country[rated], type_[rated]]), axis=1) if rated.any() else np.zeros((2, 0), dtype=int)
+        kinds = {}
+        for code, kind in pairs.T.tolist():
+            kinds.setdefault(names[code], []).append(types[kind])
+        infos = {
+            names[code]: CountryInfo(names[code], zones.get(names[code]), tuple(sorted(kinds.get(names[code], ()))))
+            for code in present.tolist()
+        }
+        return cls(infos, _aliases(resolver), version)
+
+    def search(self, prefix: str, limit: int = 20) -> list:
+        """``[(matched key, CountryInfo)]``, one per country, in key order."""
+        key = models.country_key(prefix) if prefix else ""
+        start = bisect_left(self.keys, key)
+        end = bisect_left(self.keys, key + _END, start)
+        matches, seen = [], set()
+        for i in range(start, end):
+            info = self.countries[i]
+            if info.name in seen:
+                continue
+            seen.add(info.name)
+            matches.append((self.keys[i], info))
+            if len(matches) >= limit:
+                break
+        return matches
+
+
+def _aliases(resolver) -> list:
+    if resolver is None:
+        return []
+    return [(key, resolver.names[id_]) for key, id_ in resolver.ids.items() if key != resolver.names[id_]]
+
+
+def _code(values: list, name: str) -> int:
+    return values.index(name) if name in values else -1
@@ -1,12 +1,292 @@
+import os
+import time
+
+from sqlalchemy import and_, delete, exists, func, literal, not_, or_, select, union_all, update
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
 from . import models, schemas
 
+DATA_VERSION_KEY = "data_version"
+PUBLISHED_CARD_KEY = "published_card"  # the card every reader sees
+WORKING_CARD_KEY = "working_card"      # the card shipping_rates currently mirrors
+CARD_KEEP = int(os.environ.get("RATE_CARD_KEEP", "20"))  # newest cards kept (plus the published one)
+CHANGE_KEEP = max(1, int(os.environ.get("RATE_CHANGE_KEEP", "100000")))  # newest change rows kept
+
+# Column order of the public rate table (see responses.FIELDS)
+RATE_COLUMNS = (
+    models.RateCardRow.country,
+    models.RateCardRow.weight,
+    models.RateCardRow.type,
+    models.RateCardRow.original_rate,
+    models.RateCardRow.discount_rate,
+    models.RateCardRow.student,
+    models.RateCardRow.zone,
+    models.RateCardRow.addkg,
+    models.RateCardRow.surcharges,
+)
+
+# Columns of a change (same order as RATE_COLUMNS)
+FEED_COLUMNS = (
+    "country", "weight", "type", "original_rate", "discount_rate",
+    "student", "zone", "addkg", "surcharges",
+)
+
+# What a client keys a row of the rate table by
+LANE_FEED_COLUMNS = ("country", "type", "weight", "student", "zone")
+
+# Copied between the working table and a card
+CARD_COLUMNS = (
+    "country", "weight", "type", "original_rate", "discount_rate", "source",
+    "student", "zone", "addkg", "surcharges", "country_key", "zone_key", "country_id",
+)
+
 def get_all_rates(db: Session):
     return db.query(models.ShippingRate).all()
 
-def create_rate(db: Session, rate: schemas.ShippingRateCreate):
-    db_rate = models.ShippingRate(**rate.dict())
+STUDENT_INDEX = 5  # position of ShippingRate.student in RATE_COLUMNS
+
+def _meta_value(key: str):
+    return select(models.RateMeta.value).where(models.RateMeta.key == key).scalar_subquery()
+
+def get_rate_rows(db: Session, card_version: int = None):
+    """Rows of one card (default: the published one)."""
+    # 🚀 Raw DBAPI tuples (no per-row Result processing); only `student` needs converting
+    card = models.RateCardRow
+    version = _meta_value(PUBLISHED_CARD_KEY) if card_version is None else card_version
+    stmt = select(*RATE_COLUMNS).where(card.card_version == version).order_by(card.rate_id)
+    result = db.connection().execute(stmt)
+    try:
+        rows = result.cursor.fetchall()
+    finally:
+        result.close()
+    s = STUDENT_INDEX
+    return [row[:s] + (None if row[s] is None else bool(row[s]),) + row[s + 1:] for row in rows]
+
+def get_meta(db: Session, key: str) -> int:
+    value = db.execute(select(models.RateMeta.value).where(models.RateMeta.key == key)).scalar()
+    return value or 0
+
+def set_meta(db: Session, key: str, value: int):
+    stmt = insert(models.RateMeta).values(key=key, value=value)
+    db.execute(stmt.on_conflict_do_update(index_elements=[models.RateMeta.key], set_={"value": value}))
+
+def get_data_version(db: Session) -> int:
+    return get_meta(db, DATA_VERSION_KEY)
+
+def get_published_state(db: Session):
+    """``(data_version, published card, its snapshot file, change feed seq)`` in one statement."""
+    published = _meta_value(PUBLISHED_CARD_KEY)
+    snapshot_file = select(models.RateCard.snapshot_file).where(models.RateCard.version == published).scalar_subquery()
+    seq = select(func.max(models.RateChange.seq)).scalar_subquery()
+    data_version, card, name, seq = db.execute(select(_meta_value(DATA_VERSION_KEY), published, snapshot_file, seq)).one()
+    return data_version or 0, card or 0, name, seq or 0
+
+def bump_data_version(db: Session, commit: bool = True) -> int:
+    stmt = insert(models.RateMeta).values(key=DATA_VERSION_KEY, value=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.RateMeta.key],
+        set_={"value": models.RateMeta.value + 1},
+    )
+    db.execute(stmt)
+    if commit:
+        db.commit()
+    return get_data_version(db)
+
+
+# 📚 Rate cards: uploads write to shipping_rates inside one transaction that
+# ends by copying it into a new card and moving the published pointer.
+def _copy_columns(table):
+    return [table.c[name] for name in CARD_COLUMNS]
+
+def publish_card(db: Session, source: str, filename: str = None, job_id: str = None) -> int:
+    """Snapshot shipping_rates as a new card, publish it and commit."""
+    db.flush()
+    card, rates = models.RateCardRow.__table__, models.ShippingRate.__table__
+    version = (db.execute(select(func.max(models.RateCard.version))).scalar() or 0) + 1
+    copied = db.execute(
+        insert(card).from_select(
+            ["card_version", "rate_id", *CARD_COLUMNS],
+            select(literal(version), rates.c.id, *_copy_columns(rates)),
+        )
+    ).rowcount
+    db.add(models.RateCard(
+        version=version, created_at=time.time(), source=source, filename=filename, job_id=job_id, rows=copied,
+    ))
+    record_changes(db, _meta_value(PUBLISHED_CARD_KEY), version)  # against the card published until now
+    set_meta(db, PUBLISHED_CARD_KEY, version)
+    set_meta(db, WORKING_CARD_KEY, version)
+    bump_data_version(db, commit=False)
+    _prune_cards(db, version)
+    db.commit()
+    return version
+
+def sync_working_table(db: Session) -> bool:
+    """After a rollback the working table is rebuilt from the published card
+    (lazily, by the next writer, inside its transaction)."""
+    meta = dict(db.execute(
+        select(models.RateMeta.key, models.RateMeta.value)
+        .where(models.RateMeta.key.in_([PUBLISHED_CARD_KEY, WORKING_CARD_KEY]))
+    ).all())
+    published = meta.get(PUBLISHED_CARD_KEY)
+    if not published or published == meta.get(WORKING_CARD_KEY):
+        return False
+    card, rates = models.RateCardRow.__table__, models.ShippingRate.__table__
+    db.execute(delete(rates))
+    db.execute(
+        insert(rates).from_select(
+            ["id", *CARD_COLUMNS],
+            select(card.c.rate_id, *_copy_columns(card)).where(card.c.card_version == published),
+        )
+    )
+    set_meta(db, WORKING_CARD_KEY, published)
+    return True
+
+def publish_existing_card(db: Session, version: int):
+    """Point readers at an older card (O(1): no rows are copied). Returns the
+    previously published version, or None if ``version`` does not exist."""
+    if db.get(models.RateCard, version) is None:
+        return None
+    previous = get_meta(db, PUBLISHED_CARD_KEY)
+    set_meta(db, PUBLISHED_CARD_KEY, version)
+    bump_data_version(db, commit=False)
+    record_changes(db, previous, version)
+    db.commit()
+    return previous
+
+def set_snapshot_file(db: Session, version: int, name: str) -> list:
+    """Record a card's binary snapshot; returns every file still referenced."""
+    db.execute(update(models.RateCard).where(models.RateCard.version == version).values(snapshot_file=name))
+    db.commit()
+    return db.execute(
+        select(models.RateCard.snapshot_file).where(models.RateCard.snapshot_file.isnot(None))
+    ).scalars().all()
+
+def get_card(db: Session, version: int):
+    return db.get(models.RateCard, version)
+
+def list_cards(db: Session, limit: int = 50):
+    stmt = select(models.RateCard).order_by(models.RateCard.version.desc()).limit(limit)
+    return db.execute(stmt).scalars().all()
+
+def _prune_cards(db: Session, published: int):
+    versions = db.execute(select(models.RateCard.version).order_by(models.RateCard.version.desc())).scalars().all()
+    old = [v for v in versions[CARD_KEEP:] if v != published]
+    if old:
+        db.execute(delete(models.RateCardRow).where(models.RateCardRow.card_version.in_(old)))
+        db.execute(delete(models.RateCard).where(models.RateCard.version.in_(old)))
+
+# 🔄 Change feed: each publish logs how its card differs from the previous
+# one (one set-based statement over the cards' primary key), deletes first
+def record_changes(db: Session, previous, version: int):
+    """``previous``: card version (or a scalar subquery of it)."""
+    card, changes = models.RateCardRow.__table__, models.RateChange.__table__
+    new, old = card.alias("new"), card.alias("old")
+    columns = ["card_version", "rate_id", "op", *FEED_COLUMNS]
+    same = and_(*(new.c[name].is_not_distinct_from(old.c[name]) for name in FEED_COLUMNS))
+    same_lane = and_(*(new.c[name].is_not_distinct_from(old.c[name]) for name in LANE_FEED_COLUMNS))
+    deletes = (
+        select(literal(version), old.c.rate_id, literal("delete"), *(old.c[name] for name in FEED_COLUMNS))
+        .where(old.c.card_version == previous)
+        .where(~exists().where(new.c.card_version == version, new.c.rate_id == old.c.rate_id))
+    )
+    # 🔀 a row that moved lane (e.g. a zones upload changed its Zone) also deletes its old lane
+    moved = (
+        select(literal(version), old.c.rate_id, literal("delete"), *(old.c[name] for name in FEED_COLUMNS))
+        .select_from(old.join(new, and_(new.c.card_version == version, new.c.rate_id == old.c.rate_id)))
+        .where(old.c.card_version == previous, not_(same_lane))
+    )
+    upserts = (
+        select(literal(version), new.c.rate_id, literal("upsert"), *(new.c[name] for name in FEED_COLUMNS))
+        .select_from(new.outerjoin(old, and_(old.c.card_version == previous, old.c.rate_id == new.c.rate_id)))
+        .where(new.c.card_version == version, or_(old.c.rate_id.is_(None), not_(same)))
+    )
+    both = union_all(deletes, moved, upserts).subquery()
+    db.execute(insert(changes).from_select(columns, select(*both.c).order_by(both.c[2], both.c[1])))
+    # 🧹 keep the newest CHANGE_KEEP rows; positions before them can only resync
+    head = select(func.max(changes.c.seq)).scalar_subquery()
+    db.execute(delete(changes).where(changes.c.seq <= head - CHANGE_KEEP))
+
+def get_change_state(db: Session):
+    """``(change feed seq, compacted up to, published card rows)`` in one statement."""
+    change = models.RateChange
+    seq = select(func.max(change.seq)).scalar_subquery()
+    oldest = select(func.min(change.seq)).scalar_subquery()
+    rows = select(models.RateCard.rows).where(models.RateCard.version == _meta_value(PUBLISHED_CARD_KEY)).scalar_subquery()
+    seq, oldest, rows = db.execute(select(seq, oldest, rows)).one()
+    return seq or 0, (oldest or 1) - 1, rows or 0
+
+def get_changes(db: Session, since: int, until: int):
+    """Changes in ``(since, until]`` as ``(rate_id, op, *FEED_COLUMNS)`` by seq:
+    every lane a rate left (one delete per rate and lane) and the current row
+    of every rate whose last change is an upsert."""
+    change = models.RateChange
+    window = (change.seq > since, change.seq <= until)
+    lanes = [getattr(change, name) for name in LANE_FEED_COLUMNS]
+    left = select(func.max(change.seq)).where(*window, change.op == "delete").group_by(change.rate_id, *lanes)
+    last = select(func.max(change.seq)).where(*window).group_by(change.rate_id)
+    stmt = (
+        select(change.rate_id, change.op, *(getattr(change, name) for name in FEED_COLUMNS))
+        .where(or_(change.seq.in_(left), and_(change.seq.in_(last), change.op == "upsert")))
+        .order_by(change.seq)
+    )
+    return db.execute(stmt).all()
+
+# 🌍 Country dimension (see countries.py)
+def get_country_names(db: Session):
+    """Canonical names and aliases in one statement: ``(name, country id, is alias)``."""
+    canonical = select(models.Country.name, models.Country.id, literal(False))
+    aliases = select(models.CountryAlias.alias, models.CountryAlias.country_id, literal(True))
+    return db.execute(union_all(canonical, aliases)).all()
+
+def add_country(db: Session, name: str) -> int:
+    country = models.Country(name=name)
+    db.add(country)
+    db.flush()
+    return country.id
+
+def set_country_alias(db: Session, alias: str, country_id: int, source: str = "manual"):
+    stmt = insert(models.CountryAlias).values(alias=alias, country_id=country_id, source=source)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[models.CountryAlias.alias], set_={"country_id": country_id, "source": source},
+    ))
+
+def country_lane_conflicts(db: Session, source_id: int, target_id: int) -> list:
+    """``(source row id, target row id)`` for every lane (type, weight,
+    student) both countries have rates for."""
+    source, target = models.ShippingRate.__table__.alias("source"), models.ShippingRate.__table__.alias("target")
+    stmt = (
+        select(source.c.id, target.c.id)
+        .join(target, and_(
+            target.c.country_id == target_id, target.c.type == source.c.type,
+            target.c.weight == source.c.weight, target.c.student == source.c.student,
+        ))
+        .where(source.c.country_id == source_id)
+        .order_by(source.c.id)
+    )
+    return db.execute(stmt).all()
+
+def merge_country(db: Session, source_id: int, target_id: int, target_name: str, dropped_ids=()) -> int:
+    """Fold one country into another: its rates move over (minus ``dropped_ids``),
+    its name and aliases become aliases of the target. Not committed."""
+    rates = models.ShippingRate
+    if dropped_ids:
+        db.execute(delete(rates).where(rates.id.in_(list(dropped_ids))))
+    moved = db.execute(
+        update(rates).where(rates.country_id == source_id)
+        .values(country=target_name, country_key=target_name, country_id=target_id)
+    ).rowcount
+    source_name = db.execute(select(models.Country.name).where(models.Country.id == source_id)).scalar()
+    db.execute(update(models.CountryAlias).where(models.CountryAlias.country_id == source_id).values(country_id=target_id))
+    db.execute(delete(models.Country).where(models.Country.id == source_id))
+    set_country_alias(db, source_name, target_id)
+    return moved
+
+def create_rate(db: Session, rate: schemas.ShippingRateCreate, commit: bool = True, country_id: int = None):
+    db_rate = models.ShippingRate(**rate.dict(), country_id=country_id)
     db.add(db_rate)
+    if not commit:  # uploads: committed together with the rate card
+        db.flush()
+        return db_rate
     db.commit()
     db.refresh(db_rate)
     return db_rate
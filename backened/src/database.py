@@ -12,20 +12,116 @@
 
 
 
-from sqlalchemy import create_engine
+import threading
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm import declarative_base
 
-Base = declarative_base() 
-# ✅ Function to create engine based on province
+Base = declarative_base()
+
+# ✅ Applied to every new pooled SQLite connection
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,       # 64 MB page cache (negative = KiB)
+    "mmap_size": 268435456,     # 256 MB memory-mapped reads
+    "temp_store": "MEMORY",
+}
+
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+
+# 📌 One engine + sessionmaker per province for the whole process
+_engines = {}
+_session_factories = {}
+_registry_lock = threading.Lock()
+
+
+def get_database_url(province: str) -> str:
+    return f"sqlite:///./shippingrates_{province}.db"
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def _get_or_create_engine(key: str, url: str):
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+
+    with _registry_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create_engine(
+                url,
+                connect_args={"check_same_thread": False},
+                pool_size=POOL_SIZE,
+                max_overflow=MAX_OVERFLOW,
+            )
+            event.listen(engine, "connect", _apply_sqlite_pragmas)
+            _engines[key] = engine
+        return engine
+
+# ✅ Lazily create (once) and return the shared engine for a province
 def get_engine(province: str):
-    db_url = f"sqlite:///./shippingrates_{province}.db"
-    return create_engine(db_url, connect_args={"check_same_thread": False})
+    return _get_or_create_engine(province, get_database_url(province))
+
+# 🧾 Shared (non-province) store for background ingestion jobs
+JOBS_DATABASE_URL = "sqlite:///./ingest_jobs.db"
+
+def get_jobs_engine():
+    return _get_or_create_engine("__jobs__", JOBS_DATABASE_URL)
+
+# 🔧 Runs once per province before its first session is handed out
+# (schema checks, see migrations.ensure_schema); re-entrant for the hook itself
+_first_use = None
+_prepared = set()
+_preparing = set()
+_prepare_lock = threading.RLock()
+
+
+def on_first_use(hook):
+    global _first_use
+    _first_use = hook
+
+
+def _prepare(province: str):
+    if province in _prepared or _first_use is None:
+        return
+    with _prepare_lock:
+        if province in _prepared or province in _preparing:
+            return
+        _preparing.add(province)
+        try:
+            _first_use(province)
+            _prepared.add(province)
+        finally:
+            _preparing.discard(province)
+
 
 # ✅ Function to get session factory
 def get_session_local(province: str):
-    engine = get_engine(province)
-    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    _prepare(province)
+    factory = _session_factories.get(province)
+    if factory is None:
+        engine = get_engine(province)
+        with _registry_lock:
+            factory = _session_factories.get(province)
+            if factory is None:
+                factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+                _session_factories[province] = factory
+    return factory
+
+# ✅ Plain session for non-dependency callers (caller must close it)
+def get_session(province: str):
+    return get_session_local(province)()
 
 # ✅ Get a DB session (used with yield/Depends)
 def get_db(province: str):
@@ -35,3 +131,14 @@ def get_db(province: str):
         yield db
     finally:
         db.close()
+
+
+# 🔧 Drop all pooled connections (tests, benchmarks, forked workers)
+def dispose_engines():
+    with _registry_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _session_factories.clear()
+    with _prepare_lock:
+        _prepared.clear()
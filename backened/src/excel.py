@@ -0,0 +1,122 @@
+"""Streaming, single-pass reader for uploaded rate workbooks.
+
+Uses openpyxl's read-only mode so only the current row is materialized;
+every ``upload_rates`` branch consumes the same iterator instead of building
+(and sometimes re-reading) a full pandas DataFrame. :class:`Workbook` opens
+a file once for ``/upload-workbook`` to resolve its manifest.
+"""
+import time
+
+from openpyxl import load_workbook
+
+
+class SheetError(ValueError):
+    pass
+
+
+def is_blank(value) -> bool:
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def cell(row, index):
+    return row[index] if index < len(row) else None
+
+
+class Sheet:
+    """One worksheet, iterated lazily; fully empty rows are skipped."""
+
+    def __init__(self, path: str, sheet_index: int):
+        started = time.perf_counter()
+        self._workbook = load_workbook(path, read_only=True, data_only=True)
+        worksheets = self._workbook.worksheets
+        if not 0 <= sheet_index < len(worksheets):
+            self.close()
+            raise SheetError(f"Worksheet index {sheet_index} is invalid, {len(worksheets)} worksheets found")
+
+        worksheet = worksheets[sheet_index]
+        self.name = worksheet.title
+        self.estimated_rows = worksheet.max_row  # from the file's dimension tag; may be None
+        worksheet.reset_dimensions()  # don't trust the dimension tag for iteration
+        self._rows = worksheet.iter_rows(values_only=True)
+        self.read_seconds = time.perf_counter() - started  # ⏱️ opening + time spent inside openpyxl
+
+    def __iter__(self):
+        while True:
+            started = time.perf_counter()
+            row = next(self._rows, None)
+            self.read_seconds += time.perf_counter() - started
+            if row is None:
+                return
+            if all(is_blank(value) for value in row):
+                continue
+            yield row
+
+    def next_row(self):
+        return next(iter(self), None)
+
+    def header(self) -> list:
+        row = self.next_row()
+        return list(row) if row is not None else []
+
+    def close(self):
+        self._workbook.close()
+
+
+class LoadedSheet(Sheet):
+    """A worksheet already read into memory, consumed like :class:`Sheet`."""
+
+    def __init__(self, name: str, rows: list):
+        self.name = name
+        self.estimated_rows = len(rows)
+        self._rows = iter(rows)
+
+    def __iter__(self):
+        yield from self._rows
+
+    def close(self):
+        pass
+
+
+class Workbook:
+    """One read-only workbook; sheets are addressed by name or 1-based position."""
+
+    def __init__(self, path: str):
+        self._workbook = load_workbook(path, read_only=True, data_only=True)
+        self.sheet_names = list(self._workbook.sheetnames)
+
+    def index(self, ref) -> int:
+        if isinstance(ref, str) and ref in self.sheet_names:
+            return self.sheet_names.index(ref)
+        try:
+            position = int(ref)
+        except (TypeError, ValueError):
+            raise SheetError(f"Worksheet '{ref}' not found, sheets are: {', '.join(self.sheet_names)}")
+        if not 1 <= position <= len(self.sheet_names):
+            raise SheetError(f"Worksheet index {position} is invalid, {len(self.sheet_names)} worksheets found")
+        return position - 1
+
+    def close(self):
+        self._workbook.close()
+
+
+def melt(sheet: Sheet, header: list, id_index: int):
+    """Wide → long without a DataFrame: yields ``(id_value, column_label, value)``
+    for every non-empty value cell, row by row."""
+    labels = [(i, label) for i, label in enumerate(header) if i != id_index]
+    for row in sheet:
+        id_value = cell(row, id_index)
+        for i, label in labels:
+            value = cell(row, i)
+            if not is_blank(value):
+                yield id_value, label, value
+
+
+def melt_columns(sheet: Sheet, header: list, id_index: int) -> tuple:
+    """Same as :func:`melt` but gathered into three parallel column lists,
+    which is what ``pandas.DataFrame`` wants without an intermediate list of tuples."""
+    ids, labels, values = [], [], []
+    for id_value, label, value in melt(sheet, header, id_index):
+        ids.append(id_value)
+        labels.append(label)
+        values.append(value)
+    return ids, labels, values
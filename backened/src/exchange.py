@@ -0,0 +1,236 @@
+"""USD exchange rates for quoting in local currency (``?currency=PKR``).
+
+Rates come from a pluggable provider (``EXCHANGE_RATE_PROVIDER``):
+
+* ``apilayer`` (default): the exchangerates_data API with ``EXCHANGE_RATE_API_KEY``,
+  the same source the frontend's ``/api/dollar-rate`` route called on every page load;
+* ``static``: a local stand-in with fixed rates from ``EXCHANGE_RATE_STATIC``
+  (e.g. ``PKR=279.5``), for tests, benchmarks and offline development;
+* ``package.module:factory``: any object with ``fetch(base, symbol) -> float``.
+
+Each rate is cached in memory and in a small JSON file (``EXCHANGE_RATE_CACHE_FILE``,
+shared by the gunicorn workers and kept across restarts). It is fresh for
+``EXCHANGE_RATE_TTL`` seconds. After that it is still served for up to
+``EXCHANGE_RATE_STALE`` seconds while one background fetch refreshes it
+(stale-while-revalidate). Concurrent misses share a single in-flight fetch,
+and a failed fetch falls back to the last known rate, marked ``stale``.
+"""
+import asyncio
+import importlib
+import json
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import NamedTuple, Optional
+
+from . import metrics
+
+BASE = "USD"
+SYMBOLS = tuple(s.strip().upper() for s in os.environ.get("EXCHANGE_RATE_SYMBOLS", "PKR").split(",") if s.strip())
+TTL = float(os.environ.get("EXCHANGE_RATE_TTL", "3600"))
+STALE = float(os.environ.get("EXCHANGE_RATE_STALE", "86400"))
+RETRY_AFTER = float(os.environ.get("EXCHANGE_RATE_RETRY_AFTER", "60"))  # after a failed fetch
+CACHE_FILE = os.environ.get("EXCHANGE_RATE_CACHE_FILE", "./exchange_rates.json")
+
+
+class ExchangeRateError(RuntimeError):
+    pass
+
+
+class Rate(NamedTuple):
+    symbol: str
+    rate: float
+    fetched_at: float  # unix time
+    source: str
+    stale: bool = False
+
+    def payload(self) -> dict:
+        return {"base": BASE, "currency": self.symbol, "rate": self.rate, "fetched_at": self.fetched_at,
+                "source": self.source, "stale": self.stale}
+
+
+# 🔌 Providers
+class ApiLayerProvider:
+    name = "apilayer"
+    URL = "https://api.apilayer.com/exchangerates_data/latest?"
+
+    def __init__(self, api_key: str, timeout: float = 5.0):
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def fetch(self, base: str, symbol: str) -> float:
+        url = self.URL + urllib.parse.urlencode({"base": base, "symbols": symbol})
+        request = urllib.request.Request(url, headers={"apikey": self.api_key})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = json.load(response)
+        try:
+            return float(data["rates"][symbol])
+        except (KeyError, TypeError, ValueError):
+            raise ExchangeRateError(f"No {base}→{symbol} rate in provider response")
+
+
+class StaticProvider:
+    """Local stand-in: fixed rates, optional latency; counts its calls."""
+    name = "static"
+
+    def __init__(self, rates: dict, delay: float = 0.0):
+        self.rates = {symbol.upper(): float(rate) for symbol, rate in rates.items()}
+        self.delay = delay
+        self.calls = 0
+
+    def fetch(self, base: str, symbol: str) -> float:
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if symbol not in self.rates:
+            raise ExchangeRateError(f"No {base}→{symbol} rate configured")
+        return self.rates[symbol]
+
+
+def provider_from_env():
+    name = os.environ.get("EXCHANGE_RATE_PROVIDER", "apilayer")
+    if name == "apilayer":
+        return ApiLayerProvider(os.environ.get("EXCHANGE_RATE_API_KEY", ""))
+    if name == "static":
+        pairs = (pair.partition("=") for pair in os.environ.get("EXCHANGE_RATE_STATIC", "PKR=280").split(","))
+        return StaticProvider({symbol.strip(): rate for symbol, _, rate in pairs if rate.strip()})
+    module, _, attr = name.partition(":")
+    return getattr(importlib.import_module(module), attr)()
+
+
+class ExchangeRates:
+    def __init__(self, provider, ttl: float = TTL, stale: float = STALE, path: Optional[str] = CACHE_FILE):
+        self.provider = provider
+        self.ttl = ttl
+        self.stale = stale
+        self.path = path
+        self._rates = {}
+        self._failed = {}  # symbol → time of the last failed fetch
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="exchange")
+
+    def peek(self, symbol: str) -> Optional[Rate]:
+        """The cached rate if it can be served now (fresh, or stale with a
+        refresh started); never waits for the provider."""
+        cached = self._cached(symbol)
+        if cached is None:
+            return None
+        age = time.time() - cached.fetched_at
+        if age < self.ttl:
+            metrics.cache_lookups.inc(cache="exchange_rate", result="hit")
+            return cached
+        failed = self._recently_failed(symbol)
+        if age < self.ttl + self.stale or failed:
+            metrics.cache_lookups.inc(cache="exchange_rate", result="stale")
+            if not failed:  # don't retry a failing provider on every request
+                self.refresh(symbol)
+            return cached._replace(stale=True)
+        return None
+
+    def get(self, symbol: str) -> Rate:
+        return self.peek(symbol) or self.refresh(symbol).result()
+
+    async def get_async(self, symbol: str) -> Rate:
+        # waiting callers hold no thread: they await the one in-flight fetch
+        return self.peek(symbol) or await asyncio.wrap_future(self.refresh(symbol))
+
+    def refresh(self, symbol: str) -> Future:
+        """The in-flight fetch of ``symbol``, started if there is none."""
+        with self._lock:
+            future = self._inflight.get(symbol)
+            if future is None:
+                metrics.cache_lookups.inc(cache="exchange_rate", result="miss")
+                future = self._inflight[symbol] = self._executor.submit(self._fetch, symbol)
+            return future
+
+    def _fetch(self, symbol: str) -> Rate:
+        try:
+            try:
+                rate = Rate(symbol, float(self.provider.fetch(BASE, symbol)), time.time(), self.provider.name)
+            except Exception as e:
+                metrics.exchange_rate_fetches.inc(currency=symbol, status="error")
+                self._failed[symbol] = time.time()
+                last = self._cached(symbol)
+                if last is None:
+                    raise ExchangeRateError(f"Exchange rate {BASE}→{symbol} unavailable: {e}")
+                return last._replace(stale=True)  # stale-if-error
+            metrics.exchange_rate_fetches.inc(currency=symbol, status="ok")
+            self._failed.pop(symbol, None)
+            self._rates[symbol] = rate
+            self._save()
+            return rate
+        finally:
+            with self._lock:
+                self._inflight.pop(symbol, None)
+
+    def _recently_failed(self, symbol: str) -> bool:
+        return time.time() - self._failed.get(symbol, float("-inf")) < RETRY_AFTER
+
+    def _cached(self, symbol: str) -> Optional[Rate]:
+        # 💾 another worker (or the previous process) may hold a newer rate on disk
+        cached = self._rates.get(symbol)
+        if cached is not None and time.time() - cached.fetched_at < self.ttl:
+            return cached
+        stored = self._load().get(symbol)
+        if stored is not None and (cached is None or stored.fetched_at > cached.fetched_at):
+            self._rates[symbol] = cached = stored
+        return cached
+
+    def _load(self) -> dict:
+        if not self.path:
+            return {}
+        try:
+            with open(self.path) as handle:
+                data = json.load(handle)
+            return {symbol: Rate(symbol, float(v["rate"]), float(v["fetched_at"]), v.get("source", "")) for symbol, v in data.items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return {}
+
+    def _save(self):
+        if not self.path:
+            return
+        data = {symbol: {"rate": r.rate, "fetched_at": r.fetched_at, "source": r.source} for symbol, r in self._rates.items()}
+        temp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp, "w") as handle:
+                json.dump(data, handle)
+            os.replace(temp, self.path)  # atomic: readers never see half a file
+        except OSError:
+            pass  # memory cache still works
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> ExchangeRates:
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = ExchangeRates(provider_from_env())
+    return _service
+
+
+def set_provider(provider, **options) -> ExchangeRates:
+    """Swap the provider (tests, benchmarks); starts from an empty memory cache."""
+    global _service
+    with _service_lock:
+        _service = ExchangeRates(provider, **options)
+    return _service
+
+
+def require(currency: str) -> str:
+    symbol = currency.strip().upper()
+    if symbol not in SYMBOLS:
+        raise ValueError(f"Unknown currency '{currency}'. Use one of: {', '.join(SYMBOLS)}.")
+    return symbol
+
+
+def convert(amounts: dict, rate: Rate, fields) -> dict:
+    """``{field: amount × rate}`` rounded to paisa; None stays None."""
+    return {field: None if amounts.get(field) is None else round(amounts[field] * rate.rate, 2) for field in fields}
@@ -0,0 +1,367 @@
+"""Set-based ingestion for the upload paths.
+
+Instead of two lookups + one commit per sheet cell, the existing keys for a
+province are loaded with one query, diffed against the melted sheet in
+memory and written back with executemany inside a single transaction.
+Zone sheets are first joined to the zone → countries map (also one query).
+Country names arrive already resolved to the country dimension
+(``countries.py``), so every new row carries its ``country_id``.
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from . import models, reports
+
+KEY = ["country_key", "weight", "type"]
+CHUNK_ROWS = 10_000  # sheet rows diffed between two hand-offs to the report
+
+
+def _cell(order):
+    return order[0] if isinstance(order, tuple) else order
+
+
+class UpsertResult:
+    """Counts and pending writes of one upload. Changes are noted in any
+    order and handed to ``report`` (a ``reports.ChangeReport``) in sheet
+    order by :meth:`flush`, chunk by chunk, so only the chunk being diffed
+    is held here; without a report they are collected in ``changes``."""
+
+    def __init__(self, report=None):
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.report = report
+        self.changes = []   # (cell, action, code, key), only without a report
+        self._pending = []  # (order, action, code, key) not handed over yet
+        self.inserts = []
+        self.updates = []
+
+    def note(self, order, action, code, **key):
+        self._pending.append((order, action, code, key))
+
+    def skip(self, order, code, **key):
+        self.skipped += 1
+        self.note(order, "skip", code, **key)
+
+    def flush(self, until=None):
+        """Hands over every change of a sheet cell before ``until`` (all by default)."""
+        self._pending.sort(key=lambda item: item[0])
+        count = len(self._pending)
+        if until is not None:
+            count = next((i for i, item in enumerate(self._pending) if _cell(item[0]) >= until), count)
+        ready = [(_cell(order), action, code, key) for order, action, code, key in self._pending[:count]]
+        del self._pending[:count]
+        if self.report is not None:
+            self.report.extend(ready)
+        else:
+            self.changes.extend(ready)
+
+
+def load_existing_rates(db, types) -> pd.DataFrame:
+    rate = models.ShippingRate
+    stmt = (
+        select(
+            rate.id, rate.country_key, rate.weight, rate.type, rate.student,
+            rate.original_rate, rate.discount_rate, rate.zone,
+        )
+        .where(rate.type.in_(list(types)))
+        .order_by(rate.id)
+    )
+    existing = pd.DataFrame(
+        db.execute(stmt).all(),
+        columns=["id", "country_key", "weight", "type", "student", "original_rate", "discount_rate", "zone"],
+    )
+    existing["weight"] = existing["weight"].astype(float)
+    return existing
+
+
+def diff_country_weight_rates(long_df: pd.DataFrame, existing: pd.DataFrame, file_type: str, result: UpsertResult = None) -> UpsertResult:
+    """Classify every (Country, Weight, Type, Retail Rate) row as insert,
+    update or skip exactly like the old row-by-row loop did."""
+    student = file_type == "student"
+    result = result or UpsertResult()
+
+    rows = long_df[["Country", "Weight", "Type", "Retail Rate", "Source", "Country ID"]].copy()
+    rows.columns = ["country", "weight", "type", "rate", "source", "country_id"]
+    rows["country_key"] = rows["country"].map(models.country_key)
+    rows["order"] = range(len(rows))
+
+    # 🔹 zone comes from the first row with the same (country, weight, type)
+    zones = existing.drop_duplicates(KEY, keep="first")[KEY + ["zone"]]
+    matches = existing[existing["student"] == student].drop_duplicates(KEY, keep="first")
+    matches = matches[KEY + ["id", "original_rate", "discount_rate"]]
+
+    duplicated = rows.duplicated(KEY, keep=False)
+    unique = rows[~duplicated]
+
+    # left merges keep the sheet order of `unique`
+    merged = unique.merge(zones, on=KEY, how="left").merge(matches, on=KEY, how="left")
+    found = merged["id"].notna()
+    merged["outcome"] = np.where(
+        found & (merged["original_rate"] == merged["rate"]) & merged["discount_rate"].isna(), "skip",
+        np.where(found, "update", "insert"),
+    )
+    repeated = rows[duplicated]
+    state = _sequential_state(zones, matches) if len(repeated) else None
+
+    # 📝 Chunks of sheet rows: diffed, then handed to the report in order
+    bounds = merged["order"].to_numpy(), repeated["order"].to_numpy()
+    for start in range(0, len(rows), CHUNK_ROWS):
+        end = start + CHUNK_ROWS
+        lo, hi = np.searchsorted(bounds[0], [start, end])
+        _diff_unique(merged.iloc[lo:hi], student, result)
+        if state is not None:
+            lo, hi = np.searchsorted(bounds[1], [start, end])
+            _diff_sequential(repeated.iloc[lo:hi], state, student, result)
+        result.flush(until=end)
+
+    return _in_sheet_order(result)
+
+
+def _diff_unique(merged, student, result):
+    for row in merged.itertuples(index=False):
+        key = {"country": row.country, "weight": row.weight, "type": row.type}
+        if row.outcome == "skip":
+            result.skip(row.order, reports.UNCHANGED, **key)
+        elif row.outcome == "update":
+            result.updates.append(_update_mapping(int(row.id), row.rate, row.discount_rate))
+            result.updated += 1
+            result.note(row.order, "update", reports.CHANGED, **key)
+        else:
+            result.inserts.append((row.order, _insert_mapping(row.country, row.weight, row.type, row.rate, row.source, student, row.zone, row.country_id)))
+            result.inserted += 1
+            result.note(row.order, "insert", reports.NEW, **key)
+
+
+def _in_sheet_order(result: UpsertResult) -> UpsertResult:
+    # keep sheet order for the report and for the ids of new rows
+    result.flush()
+    result.inserts = [mapping for _, mapping in sorted(result.inserts, key=lambda item: item[0])]
+    return result
+
+
+def _sequential_state(zones, matches) -> tuple:
+    zone_by_key = {tuple(k): z for *k, z in zones.itertuples(index=False)}
+    state = {
+        (c, w, t): {"id": int(i), "original_rate": o, "discount_rate": d}
+        for c, w, t, i, o, d in matches.itertuples(index=False)
+    }
+    return zone_by_key, state
+
+
+def _diff_sequential(rows, sequential_state, student, result):
+    # ⚠️ Same key repeated inside the sheet: later cells must see earlier ones,
+    # so resolve these few rows one by one against an in-memory state.
+    zone_by_key, state = sequential_state
+
+    for row in rows.itertuples(index=False):
+        key = (row.country_key, row.weight, row.type)
+        current = state.get(key)
+        if current is None:
+            mapping = _insert_mapping(row.country, row.weight, row.type, row.rate, row.source, student, zone_by_key.get(key), row.country_id)
+            result.inserts.append((row.order, mapping))
+            result.inserted += 1
+            result.note(row.order, "insert", reports.NEW, country=row.country, weight=row.weight, type=row.type)
+            state[key] = mapping
+            zone_by_key.setdefault(key, mapping["zone"])
+            continue
+
+        if current["original_rate"] == row.rate and _is_missing(current["discount_rate"]):
+            result.skip(row.order, reports.UNCHANGED, country=row.country, weight=row.weight, type=row.type)
+            continue
+
+        if "id" in current:
+            update = _update_mapping(current["id"], row.rate, current["discount_rate"])
+            result.updates.append(update)
+            state[key] = dict(update, id=current["id"])
+        else:  # still a pending insert from this sheet
+            current["discount_rate"] = str(float(row.rate)) if _is_missing(current["discount_rate"]) else current["discount_rate"]
+            current["original_rate"] = float(row.rate)
+        result.updated += 1
+        result.note(row.order, "update", reports.CHANGED, country=row.country, weight=row.weight, type=row.type)
+
+
+def _is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _insert_mapping(country, weight, type_, rate, source, student, zone, country_id):
+    return {
+        "country": country,
+        "weight": float(weight),
+        "type": type_,
+        "original_rate": float(rate),
+        "discount_rate": None,
+        "source": source,
+        "student": student,
+        "zone": None if _is_missing(zone) else zone,
+        "country_key": models.country_key(country),
+        "zone_key": models.zone_key(None if _is_missing(zone) else zone),
+        "country_id": int(country_id),
+    }
+
+
+def _update_mapping(id_, rate, discount_rate):
+    mapping = {"id": id_, "original_rate": float(rate)}
+    mapping["discount_rate"] = str(float(rate)) if _is_missing(discount_rate) else discount_rate
+    return mapping
+
+
+def apply_upsert(db, result: UpsertResult):
+    # ✅ executemany for both inserts and updates; committed with the rate card (crud.publish_card)
+    if result.inserts:
+        db.bulk_insert_mappings(models.ShippingRate, result.inserts)
+    if result.updates:
+        db.bulk_update_mappings(models.ShippingRate, result.updates)
+
+
+# 🌍 Zone sheets: rates are given per zone and fanned out to every country in it
+ZONE_LANE = ["country_key", "type", "weight", "zone_key"]
+
+
+def load_zone_countries(db) -> pd.DataFrame:
+    """Every (zone_key, country) pair that exists today, from one query;
+    names are the canonical ones of the country dimension."""
+    rate, country = models.ShippingRate, models.Country
+    stmt = (
+        select(rate.zone_key, country.name, country.id)
+        .join(country, country.id == rate.country_id)
+        .where(rate.zone_key != "")
+        .distinct()
+        .order_by(rate.zone_key, country.name)
+    )
+    zones = pd.DataFrame(db.execute(stmt).all(), columns=["zone_key", "country", "country_id"])
+    zones["country_key"] = zones["country"]  # canonical names are keys already
+    return zones
+
+
+def load_zone_lanes(db, type_: str, student=None) -> pd.DataFrame:
+    rate = models.ShippingRate
+    stmt = (
+        select(
+            rate.id, rate.country_key, rate.type, rate.weight, rate.zone_key,
+            rate.original_rate, rate.discount_rate, rate.addkg,
+        )
+        .where(rate.type == type_)
+        .order_by(rate.id)
+    )
+    if student is not None:
+        stmt = stmt.where(rate.student == student)
+    lanes = pd.DataFrame(
+        db.execute(stmt).all(),
+        columns=["id", "country_key", "type", "weight", "zone_key", "original_rate", "discount_rate", "addkg"],
+    )
+    lanes["weight"] = lanes["weight"].astype(float)
+    return lanes.drop_duplicates(ZONE_LANE, keep="first")
+
+
+def expand_zones(cells: pd.DataFrame, zones: pd.DataFrame, type_: str):
+    """Join zone cells (order, weight, zone_key, value) to the countries of
+    each zone; returns (country rows in sheet order, cells with no countries)."""
+    rows = cells.merge(zones, on="zone_key", how="inner")
+    rows = rows.sort_values(["order", "country"], kind="stable")
+    rows["order"] = list(zip(rows["order"], range(len(rows))))
+    rows["type"] = type_
+    missing = cells[~cells["zone_key"].isin(zones["zone_key"])]
+    return rows, missing
+
+
+def _diff_zone_lanes(rows, lanes, result, field, changes, make_insert):
+    """Lanes that already hold ``value`` in ``field`` are skipped, others are
+    updated with ``changes(value)``; later cells see the effect of earlier ones."""
+    merged = rows.merge(lanes, on=ZONE_LANE, how="left", sort=False)
+    state = {}
+    for i, row in enumerate(merged.itertuples(index=False)):
+        if i and not i % CHUNK_ROWS:
+            result.flush(until=row.order[0])  # 📝 earlier cells are final
+        key = (row.country_key, row.type, row.weight, row.zone_key)
+        lane = {"country": row.country, "weight": row.weight, "type": row.type, "zone": row.zone_key}
+        current = state.get(key)
+        if current is None and not _is_missing(row.id):
+            current = {"id": int(row.id), field: getattr(row, field), "discount_rate": row.discount_rate}
+
+        if current is None:
+            mapping = make_insert(row)
+            result.inserts.append((row.order, mapping))
+            result.inserted += 1
+            result.note(row.order, "insert", reports.NEW, **lane)
+            state[key] = mapping
+            continue
+
+        state[key] = current
+        if current[field] == row.value and (field != "original_rate" or _is_missing(current["discount_rate"])):
+            result.skip(row.order, reports.UNCHANGED, **lane)
+            continue
+
+        update = changes(row.value)
+        if "id" in current:
+            result.updates.append(dict(update, id=current["id"]))
+        current.update(update)  # a pending insert is patched in place
+        result.updated += 1
+        result.note(row.order, "update", reports.CHANGED, **lane)
+
+
+def upsert_zone_rates(db, cells: pd.DataFrame, file_type: str, result: UpsertResult = None, progress=None, dry_run=False) -> UpsertResult:
+    """``zones_docs`` / ``zones_pkg``: cells are (order, weight, zone_key, value)."""
+    progress = progress or (lambda **fields: None)
+    result = result or UpsertResult()
+    type_ = "docs" if file_type == "zones_docs" else "non-docs"
+
+    progress(phase="diff", rows_total=len(cells))
+    rows, missing = expand_zones(cells, load_zone_countries(db), type_)
+    for cell in missing.itertuples(index=False):
+        # reported, but not counted as skipped (as before)
+        result.note((cell.order, -1), "skip", reports.ZONE_NOT_FOUND, weight=cell.weight, zone=cell.zone_key)
+
+    _diff_zone_lanes(
+        rows, load_zone_lanes(db, type_, student=False), result, "original_rate",
+        changes=lambda value: {"original_rate": value, "discount_rate": "0"},
+        make_insert=lambda row: dict(
+            _insert_mapping(row.country, row.weight, type_, row.value, file_type, False, row.zone_key, row.country_id),
+            discount_rate="0",
+        ),
+    )
+    return _write(db, _in_sheet_order(result), progress, len(cells), dry_run)
+
+
+def upsert_zone_addkg(db, cells: pd.DataFrame, result: UpsertResult = None, progress=None, dry_run=False) -> UpsertResult:
+    """``zoneaddkg``: cells are (order, weight=0, zone_key, value)."""
+    progress = progress or (lambda **fields: None)
+    result = result or UpsertResult()
+
+    progress(phase="diff", rows_total=len(cells))
+    rows, missing = expand_zones(cells, load_zone_countries(db), "add-kg")
+    for cell in missing.itertuples(index=False):
+        result.skip((cell.order, -1), reports.ZONE_NOT_FOUND, zone=cell.zone_key)
+
+    _diff_zone_lanes(
+        rows, load_zone_lanes(db, "add-kg"), result, "addkg",
+        changes=lambda value: {"addkg": value},
+        make_insert=lambda row: dict(
+            _insert_mapping(row.country, 0, "add-kg", 0, "zoneaddkg", False, row.zone_key, row.country_id),
+            discount_rate="0", addkg=float(row.value),
+        ),
+    )
+    return _write(db, _in_sheet_order(result), progress, len(cells), dry_run)
+
+
+def _write(db, result: UpsertResult, progress, rows_processed: int, dry_run=False) -> UpsertResult:
+    progress(phase="write", **_counts(result))
+    if not dry_run:  # 🧪 dry run: the change set is computed, nothing is written
+        apply_upsert(db, result)
+    progress(rows_processed=rows_processed, **_counts(result))
+    return result
+
+
+def _counts(result: UpsertResult) -> dict:
+    return {"inserted": result.inserted, "updated": result.updated, "skipped": result.skipped}
+
+
+def upsert_country_weight_rates(db, long_df: pd.DataFrame, file_type: str, progress=None, dry_run=False, report=None) -> UpsertResult:
+    progress = progress or (lambda **fields: None)
+
+    progress(phase="diff", rows_total=len(long_df))
+    existing = load_existing_rates(db, long_df["Type"].unique())
+    result = diff_country_weight_rates(long_df, existing, file_type, UpsertResult(report))
+    return _write(db, result, progress, len(long_df), dry_run)
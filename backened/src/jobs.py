@@ -0,0 +1,218 @@
+"""Background ingestion jobs for ``/upload-rates``.
+
+Uploads are queued and processed by a small bounded thread pool; the
+request returns a job id straight away and clients poll ``/jobs/{id}``.
+Job state lives in a local SQLite file (``ingest_jobs.db``) so every
+gunicorn worker can answer a poll, and jobs for the same province run one
+at a time (per-process queue + a lock file shared across workers).
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from fastapi import HTTPException
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text, insert, select, update
+
+from . import metrics, provinces
+from .database import get_jobs_engine
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows dev machines
+    fcntl = None
+
+MAX_WORKERS = int(os.environ.get("INGEST_MAX_WORKERS", "2"))
+FLUSH_INTERVAL = 0.5  # seconds between progress writes
+
+metadata = MetaData()
+
+ingest_jobs = Table(
+    "ingest_jobs",
+    metadata,
+    Column("id", String, primary_key=True),
+    Column("province", String, index=True),
+    Column("file_type", String),
+    Column("filename", String),
+    Column("status", String, nullable=False),  # queued | running | done | failed
+    Column("phase", String, nullable=True),    # parse | diff | write
+    Column("rows_total", Integer, default=0),
+    Column("rows_processed", Integer, default=0),
+    Column("inserted", Integer, default=0),
+    Column("updated", Integer, default=0),
+    Column("skipped", Integer, default=0),
+    Column("result", Text, nullable=True),
+    Column("error", Text, nullable=True),
+    Column("status_code", Integer, nullable=True),
+    Column("created_at", Float),
+    Column("updated_at", Float),
+)
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def _engine():
+    global _schema_ready
+    engine = get_jobs_engine()
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                metadata.create_all(bind=engine)
+                _schema_ready = True
+    return engine
+
+
+class Job:
+    def __init__(self, id: str, province: str, file_type: str = ""):
+        self.id = id
+        self.province = province
+        self.file_type = file_type
+        self.state = {}
+        self._last_flush = 0.0
+        self._started = self._phase_started = time.perf_counter()
+
+    def start(self):
+        # queue wait is not part of the ingestion timings
+        self._started = self._phase_started = time.perf_counter()
+        self.update(force=True, status="running")
+
+    def update(self, force: bool = False, **fields):
+        """Record progress; written to the store at most every FLUSH_INTERVAL."""
+        new_phase = "phase" in fields and fields["phase"] != self.state.get("phase")
+        if new_phase:
+            self._end_phase()
+        self.state.update(fields)
+        now = time.time()
+        if force or new_phase or now - self._last_flush >= FLUSH_INTERVAL:
+            self._write(**self.state)
+            self._last_flush = now
+
+    def _end_phase(self):
+        # ⏱️ time spent in the phase that is ending → ingest_phase_duration_seconds
+        now = time.perf_counter()
+        phase = self.state.get("phase")
+        if phase:
+            metrics.ingest_phase.observe(now - self._phase_started, file_type=self.file_type, phase=phase)
+        self._phase_started = now
+
+    def record_phase(self, phase: str, seconds: float):
+        """Report ``seconds`` of the current phase that ran elsewhere (the parse
+        workers) as ``phase``; they are not counted again in the current one."""
+        metrics.ingest_phase.observe(seconds, file_type=self.file_type, phase=phase)
+        self._phase_started = min(self._phase_started + seconds, time.perf_counter())
+
+    def finish(self, status: str, **fields):
+        self.update(force=True, status=status, phase=None, **fields)
+        elapsed = time.perf_counter() - self._started
+        rows = self.state.get("rows_processed") or 0
+        metrics.ingest_jobs.inc(file_type=self.file_type, status=status)
+        if status == "done":
+            metrics.ingest_rows.inc(rows, file_type=self.file_type)
+            metrics.ingest_rows_per_second.set(rows / elapsed if elapsed > 0 else 0.0, file_type=self.file_type)
+
+    def _write(self, **fields):
+        fields["updated_at"] = time.time()
+        with _engine().begin() as conn:
+            conn.execute(update(ingest_jobs).where(ingest_jobs.c.id == self.id).values(**fields))
+
+
+def create_job(province: str, file_type: str, filename: str) -> Job:
+    now = time.time()
+    job = Job(uuid.uuid4().hex, province, file_type)
+    with _engine().begin() as conn:
+        conn.execute(insert(ingest_jobs).values(
+            id=job.id, province=province, file_type=file_type, filename=filename,
+            status="queued", created_at=now, updated_at=now,
+        ))
+    return job
+
+
+def get_job(job_id: str):
+    with _engine().connect() as conn:
+        row = conn.execute(select(ingest_jobs).where(ingest_jobs.c.id == job_id)).mappings().first()
+    if row is None:
+        return None
+    job = dict(row)
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+# 🔒 Exclusive lock shared by every process on this machine (not re-entrant:
+# a second `with` on the same path blocks, even in the same thread)
+@contextmanager
+def file_lock(path: str):
+    if fcntl is None:
+        yield
+        return
+    with open(path, "w") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+# 🔒 One job per province at a time (threads here, lock file across workers)
+def province_lock(province: str):
+    # 📌 the path is only ever built from a configured province name (404 otherwise)
+    return file_lock(f"./.ingest_{provinces.require(province)}.lock")
+
+
+_executor = None
+_pending = {}
+_busy = set()
+_queue_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _queue_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="ingest")
+    return _executor
+
+
+def submit(job: Job, fn, *args):
+    """Queue ``fn(job, *args)``; its return value becomes the job result."""
+    executor = _get_executor()
+    with _queue_lock:
+        if job.province in _busy:
+            _pending.setdefault(job.province, deque()).append((job, fn, args))
+            return
+        _busy.add(job.province)
+    executor.submit(_run, job, fn, args)
+
+
+def _run(job: Job, fn, args):
+    try:
+        with province_lock(job.province):
+            job.start()
+            try:
+                result = fn(job, *args)
+            except HTTPException as e:
+                job.finish("failed", error=str(e.detail), status_code=e.status_code)
+            except Exception as e:
+                job.finish("failed", error=str(e), status_code=500)
+            else:
+                job.finish("done", status_code=200, result=json.dumps(result, ensure_ascii=False, default=str))
+    except Exception as e:
+        # the lock itself failed (unknown province, unwritable lock file): fail the job instead of leaving it queued
+        job.finish("failed", error=str(getattr(e, "detail", e)), status_code=getattr(e, "status_code", 500))
+    finally:
+        _next(job.province)
+
+
+def _next(province: str):
+    with _queue_lock:
+        queue = _pending.get(province)
+        if not queue:
+            _busy.discard(province)
+            return
+        job, fn, args = queue.popleft()
+    _get_executor().submit(_run, job, fn, args)
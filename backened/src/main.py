@@ -1,20 +1,26 @@
 from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Form
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
-from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
+import logging
 import os
 import re
-from sqlalchemy import func ,cast, String  # Add this import at the top
-from . import crud, models, schemas
-from .models import Base
+import shutil
+import tempfile
+import time
+from sqlalchemy import func  # Add this import at the top
+from sqlalchemy.exc import OperationalError
+from . import batch, changes, countries, crud, database, exchange, jobs, metrics, migrations, models, pricing, provinces, readers, reports, responses, schemas, snapshot_files, snapshots, workbook
+from .database import get_db, get_session
+from .provinces import PROVINCES
 from fastapi import Query
 from fastapi import Request
+from typing import Optional
 
 
 # FastAPI App
 app = FastAPI()
+logger = logging.getLogger(__name__)
 
 
 
@@ -27,151 +33,500 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 📌 Get session based on province
-def get_session(province: str):
-    db_path = f"sqlite:///./shippingrates_{province}.db"
-    engine = create_engine(db_path, connect_args={"check_same_thread": False})
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    return SessionLocal()
-
-
-def get_db(province: str):
-    db_path = f"sqlite:///./shippingrates_{province}.db"
-    engine = create_engine(db_path, connect_args={"check_same_thread": False})
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# 📊 Per-route latency + SQL statement counts for /metrics
+app.add_middleware(metrics.MetricsMiddleware, provinces=PROVINCES)
+metrics.install_sql_counter()
 
 def normalize_zone(zone_str: str) -> str:
     zone_float = float(zone_str)
     return str(int(zone_float)) if zone_float.is_integer() else str(zone_float)
 
-def ensure_table_exists_for(province: str):
-    db_path = f"sqlite:///./shippingrates_{province}.db"
-    engine = create_engine(db_path, connect_args={"check_same_thread": False})
-    from .models import Base
-    Base.metadata.create_all(bind=engine)
-
-
-for province in ["sindh", "punjab", "balochistan"]:
-    ensure_table_exists_for(province)
+# 🐢→🚀 Nothing touches the DBs at import: each province is checked / migrated
+# the first time a session is opened on it (once per process)
+database.on_first_use(migrations.ensure_schema)
 
 # Dependency
 
+# ⚡ Read endpoints are async: fresh snapshots and cached bodies are served on
+# the event loop, blocking reads go to the reader pool (src/readers.py)
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/")
 async def read_root():
     return {"message": "Hello from API"}
 
-# ✅ Common function to reuse
-def get_province_rates(province: str):
-    db = get_session(province)
-    rates = crud.get_all_rates(db)
+# 📦 ETag/304 + gzip/br for the rate tables; ?format=columnar for compact arrays
+async def province_rates_response(request: Request, province: str, format: str):
+    if format not in responses.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}'. Use one of: {', '.join(responses.FORMATS)}.")
+    snapshot = await snapshots.get_snapshot_async(province)
+    tag = f"{province}-v{snapshot.version}-{format}"
+    return await responses.versioned_response_async(request, tag, lambda: snapshot.payload(format))
+
+# 📍 /<province>-rates for every configured province
+def province_rates_route(province: str):
+    async def get_province_rates(request: Request, format: str = Query("rows")):
+        return await province_rates_response(request, province, format)
+    return get_province_rates
+
+# 🔄 /<province>-rates/changes?since=<seq>: only the rows published after seq
+def province_changes_route(province: str):
+    async def get_province_changes(since: int = Query(..., ge=0)):
+        snapshot = await snapshots.get_snapshot_async(province)
+        if snapshot.seq == since:
+            return changes.up_to_date(province, since)  # polling client, nothing new: no query
+        return await readers.run(changes.changes_since, province, since)
+    return get_province_changes
+
+for province in PROVINCES:
+    app.add_api_route(f"/{province}-rates", province_rates_route(province), methods=["GET"], name=f"get_{province}_rates")
+    app.add_api_route(
+        f"/{province}-rates/changes", province_changes_route(province), methods=["GET"], name=f"get_{province}_rate_changes"
+    )
+
+
+@app.get("/all-rates")
+async def get_all_rates(request: Request, format: str = Query("rows")):
+    if format not in responses.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}'. Use one of: {', '.join(responses.FORMATS)}.")
+    province_snapshots = await snapshots.get_snapshots_async(PROVINCES)
+    versions = ".".join(str(snap.version) for snap in province_snapshots)
+    tag = f"all-v{versions}-{format}"
+    return await responses.versioned_response_async(
+        request, tag, lambda: {"rates": [snap.payload(format) for snap in province_snapshots]}
+    )
+
+
+# 💱 USD → local currency (cached; one provider call per TTL, shared by all requests)
+async def exchange_rate(currency: str) -> exchange.Rate:
+    try:
+        return await exchange.get_service().get_async(exchange.require(currency))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except exchange.ExchangeRateError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def converted(amounts: dict, rate: exchange.Rate) -> dict:
+    return {
+        "currency": rate.symbol,
+        "rate": rate.rate,
+        "fetched_at": rate.fetched_at,
+        "stale": rate.stale,
+        **exchange.convert(amounts, rate, batch.PRICE_FIELDS),
+    }
+
+
+@app.get("/exchange-rate")
+async def get_exchange_rate(currency: str = Query(exchange.SYMBOLS[0] if exchange.SYMBOLS else "PKR")):
+    rate = await exchange_rate(currency)
+    return rate.payload()
+
+
+# 💲 Quote from the snapshot's pricing index (no rate SQL per request)
+@app.get("/quote", response_model=schemas.QuoteOut)
+async def get_quote(
+    province: str = Query(...),
+    country: str = Query(...),
+    weight: float = Query(..., gt=0),
+    type: str = Query("pkg"),
+    student: bool = Query(False),
+    currency: Optional[str] = Query(None),
+):
+    rate = await exchange_rate(currency) if currency else None
+    index = await snapshots.get_rate_index_async(province)
+    try:
+        result = index.quote(country, weight, type, student)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except pricing.QuoteError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    if rate is not None:
+        result["converted"] = converted(result, rate)
     return {
         "province": province,
-        "data": [
-            {
-                "Country": r.country,
-                "Weight": r.weight,
-                "Type": r.type,
-                "Retail Rate": r.original_rate,
-                "Discount Rate": r.discount_rate,
-                "Student": r.student,
-                "Zone": r.zone,
-                "Addkg": r.addkg,
-                "Surcharges": r.surcharges
-            } for r in rates
-        ]
+        "country": index.canonical(country),
+        "weight": weight,
+        "type": type,
+        "student": student,
+        **result,
     }
 
-# 📍 Sindh
-@app.get("/sindh-rates")
-def get_sindh_rates():
-    return get_province_rates("sindh")
 
-# 📍 Punjab
-@app.get("/punjab-rates")
-def get_punjab_rates():
-    return get_province_rates("punjab")
+# 🔎 Country autocomplete: prefix range over the snapshot's sorted names + aliases
+@app.get("/countries", response_model=schemas.CountrySearchOut)
+async def search_countries(
+    province: str = Query(...),
+    prefix: str = Query(""),
+    limit: int = Query(20, ge=1, le=500),
+):
+    index = await snapshots.get_country_index_async(province)
+    return {
+        "province": province,
+        "version": index.version,
+        "prefix": prefix,
+        "countries": [
+            {"country": info.name, "match": key, "zone": info.zone, "types": list(info.types)}
+            for key, info in index.search(prefix, limit)
+        ],
+    }
 
-# 📍 Balochistan
-@app.get("/balochistan-rates")
-def get_balochistan_rates():
-    return get_province_rates("balochistan")
 
+# 📏 Which bracket a weight is billed at (next bracket up, or the 25kg add-kg regime)
+@app.get("/brackets", response_model=schemas.BracketOut)
+async def get_brackets(
+    province: str = Query(...),
+    country: str = Query(...),
+    weight: Optional[float] = Query(None, gt=0),
+    type: str = Query("pkg"),
+    student: bool = Query(False),
+):
+    index = await snapshots.get_rate_index_async(province)
+    try:
+        if weight is None:
+            resolution = {"brackets": index.brackets(country, type, student)}
+        else:
+            resolution = index.resolve(country, weight, type, student)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except pricing.QuoteError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    return {
+        "province": province,
+        "country": index.canonical(country),
+        "type": type,
+        "student": student,
+        "version": index.version,
+        "weight": weight,
+        **resolution,
+    }
 
-@app.get("/all-rates")
-def get_all_rates():
-    all_data = []
-    for province in ["sindh", "punjab", "balochistan"]:
-        session = get_session(province)
-        rates = crud.get_all_rates(session)
-        all_data.append({
-            "province": province,
-            "data": [
-                {
-                    "Country": r.country,
-                    "Weight": r.weight,
-                    "Type": r.type,
-                    "Retail Rate": r.original_rate,
-                    "Discount Rate": r.discount_rate,
-                    "Student": r.student,
-                    "Zone": r.zone,
-                    "Addkg": r.addkg,
-                    "Surcharges": r.surcharges
-                } for r in rates
-            ]
-        })
-    return {"rates": all_data}
 
+# ⚖️ One lane priced in every province (indexes loaded concurrently)
+@app.get("/compare-rates", response_model=schemas.CompareOut)
+async def compare_rates(
+    country: str = Query(...),
+    weight: float = Query(..., gt=0),
+    type: str = Query("pkg"),
+    student: bool = Query(False),
+    currency: Optional[str] = Query(None),
+):
+    if type not in pricing.QUOTE_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown type '{type}'. Use 'docs' or 'pkg'.")
+    rate = await exchange_rate(currency) if currency else None
+
+    indexes = await snapshots.get_rate_indexes_async(PROVINCES)
+    rates, known = [], []
+    for province, index in zip(PROVINCES, indexes):
+        # 🌍 each province resolves the name with its own country table
+        match = index.countries.resolve(country) if index.countries is not None else None
+        name = match.name if match is not None else index.canonical(country)
+        if match is not None:
+            known.append(name)
+        try:
+            quote = index.quote(country, weight, type, student)
+            if rate is not None:
+                quote["converted"] = converted(quote, rate)
+            rates.append({"province": province, "available": True, "country": name, **quote})
+        except ValueError as e:  # bad or overflowing weight: wrong in every province
+            raise HTTPException(status_code=400, detail=str(e))
+        except pricing.QuoteError as e:
+            rates.append({"province": province, "available": False, "country": name, "detail": str(e)})
+
+    available = [rate for rate in rates if rate["available"]]
+    return {
+        # a province that priced the lane, else one that knows the name
+        "country": available[0]["country"] if available else (known or [indexes[0].canonical(country)])[0],
+        "weight": weight,
+        "type": type,
+        "student": student,
+        "cheapest": min(available, key=lambda rate: rate["original"])["province"] if available else None,
+        "rates": rates,
+    }
 
-def get_db_for_upload(province: str = Form(...)):
-    return next(get_db(province))
 
-@app.post("/upload-rates")
-def upload_rates(
+# 📦 Bulk quotes: JSON / CSV / NDJSON in, priced in vectorized chunks, streamed out
+@app.post("/quotes")
+async def post_quotes(
     request: Request,
+    province: Optional[str] = Query(None),
+    format: Optional[str] = Query(None),
+    currency: Optional[str] = Query(None),
+):
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+    input_format = batch.INPUT_FORMATS.get(content_type)
+    if input_format is None:
+        raise HTTPException(status_code=415, detail=f"Unsupported content type '{content_type}'. Send JSON, CSV or NDJSON.")
+    output_format = format or input_format
+    if output_format not in batch.MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}'. Use one of: {', '.join(batch.MEDIA_TYPES)}.")
+
+    # one snapshot per province (and one exchange rate) for the whole request
+    rate = await exchange_rate(currency) if currency else None
+    tables = await snapshots.get_price_tables_async(PROVINCES)
+    parser = batch.row_parser(input_format)
+    spool = batch.QuoteSpool(batch.QuoteEncoder(tables, output_format, province, rate))
+    try:
+        # 📥 rows are parsed as the body arrives and priced a chunk at a time on the reader pool
+        async for data in request.stream():
+            if spool.add(parser.feed(data)):
+                await readers.run(spool.write)
+        spool.add(parser.close())
+        await readers.run(spool.write, True)
+    except BaseException as e:
+        spool.close()
+        if isinstance(e, batch.BatchError):
+            raise HTTPException(status_code=400, detail=str(e))
+        raise
+    return StreamingResponse(spool, media_type=batch.MEDIA_TYPES[output_format])
+
+
+# 🔁 Every write path ends in one transaction that publishes a new rate card
+# (bumps the data version: ETags, pricing index)
+def publish_rates(db: Session, province: str, source: str, filename: str = None, job_id: str = None) -> int:
+    version = crud.publish_card(db, source, filename=filename, job_id=job_id)
+    snapshots.invalidate(province)
+    try:
+        snapshots.persist_card(province, version)  # 📦 binary snapshot for fast worker / client bootstrap
+    except Exception:
+        # the card is already live: readers fall back to the rate query, so the publish still succeeded
+        logger.exception("Could not write the binary snapshot of %s rate card %s", province, version)
+    return version
+
+
+def save_upload(file: UploadFile, file_type: str) -> str:
+    suffix = os.path.splitext(file.filename)[1]
+    started = time.perf_counter()
+    with tempfile.NamedTemporaryFile(prefix="upload_", suffix=suffix, delete=False) as f:
+        shutil.copyfileobj(file.file, f)
+        temp_path = f.name
+    metrics.ingest_phase.observe(time.perf_counter() - started, file_type=file_type, phase="receive")
+    return temp_path
+
+
+# ⏳ Uploads are queued as background jobs; poll /jobs/{job_id} for progress
+@app.post("/upload-rates", status_code=202)
+def upload_rates(
     file: UploadFile = File(...),
     province: str = Form(...),
     file_type: str = Form(...),
     student: bool = Form(False),
     sheet: int = Form(1),
-    db: Session = Depends(get_db_for_upload)
+    dry_run: bool = Form(False),
 ):
-    # db = next(get_db(province)) 
     if not file.filename.endswith((".xlsx", ".xls")):
         raise HTTPException(status_code=400, detail="Invalid file type. Please upload an Excel file.")
 
     if file_type == "student" and not student:
         raise HTTPException(status_code=400, detail="Student file upload is not allowed unless checkbox is checked.")
 
+    provinces.require(province)  # 404 now, not a failing job after the upload is stored
+    temp_path = save_upload(file, file_type)
+    job = jobs.create_job(province, file_type, file.filename)
+    jobs.submit(job, run_upload_job, temp_path, province, file_type, sheet, dry_run, file.filename)
+    return {
+        "job_id": job.id,
+        "status": "queued",
+        "dry_run": dry_run,
+        "message": f"⏳ {file_type.replace('_', ' ').title()} file queued for {'a dry run' if dry_run else 'processing'}."
+    }
+
+
+# 📚 Every sheet of a workbook in one job: {"<sheet name or 1-based index>": "<file_type>", ...}
+@app.post("/upload-workbook", status_code=202)
+def upload_workbook(
+    file: UploadFile = File(...),
+    province: str = Form(...),
+    manifest: str = Form(...),
+    student: bool = Form(False),
+    dry_run: bool = Form(False),
+):
+    if not file.filename.endswith((".xlsx", ".xls")):
+        raise HTTPException(status_code=400, detail="Invalid file type. Please upload an Excel file.")
+
     try:
-        temp_path = f"temp_{file.filename}"
-        with open(temp_path, "wb") as f:
-            f.write(file.file.read())
-            sheet_index = sheet - 1  # because pandas uses 0-based index
-            df = pd.read_excel(temp_path, sheet_name=sheet_index, engine="openpyxl")
-        # os.remove(temp_path)
+        sheets = workbook.parse_manifest(manifest)
+    except workbook.ManifestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if any(file_type == "student" for _, file_type in sheets) and not student:
+        raise HTTPException(status_code=400, detail="Student file upload is not allowed unless checkbox is checked.")
+
+    provinces.require(province)  # 404 now, not a failing job after the upload is stored
+    temp_path = save_upload(file, "workbook")
+    job = jobs.create_job(province, "workbook", file.filename)
+    jobs.submit(job, run_workbook_job, temp_path, province, sheets, dry_run, file.filename)
+    return {
+        "job_id": job.id,
+        "status": "queued",
+        "dry_run": dry_run,
+        "sheets": len(sheets),
+        "message": f"⏳ Workbook ({len(sheets)} sheets) queued for {'a dry run' if dry_run else 'processing'}."
+    }
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+# 📄 Full change report of a job (NDJSON, streamed from disk)
+@app.get("/jobs/{job_id}/report")
+def get_job_report(job_id: str):
+    path = reports.report_path(job_id)
+    if not re.fullmatch(r"[0-9a-f]+", job_id) or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Report not found")
+    return FileResponse(path, media_type="application/x-ndjson", filename=f"upload-{job_id}.ndjson")
+
+
+def run_upload_job(job, temp_path: str, province: str, file_type: str, sheet: int, dry_run: bool = False, filename: str = None):
+    db = get_session(province)
+    report = reports.ChangeReport(job.id, dry_run)
+    try:
+        # ⚛️ Everything below is one transaction: readers keep the published card
+        # until publish_rates swaps the pointer; a failure or crash leaves no trace
+        crud.sync_working_table(db)
+        names = countries.UploadCountries(db)
+        job.update(phase="parse")
+        [rows] = parse_sheets(job, temp_path, [(sheet - 1, file_type)])
+        result = process_upload(db, job, rows, file_type, report, names)
+        result["countries"] = names.summary()  # 🌍 names that matched no known country (+ close-match warnings)
+        if not dry_run:  # 🧪 a dry run is simply rolled back
+            result["version"] = publish_rates(db, province, file_type, filename=filename, job_id=job.id)
+        return result
+    finally:
+        report.close()
+        db.rollback()
+        db.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def run_workbook_job(job, temp_path: str, province: str, manifest: list, dry_run: bool = False, filename: str = None):
+    from . import excel
+
+    db = get_session(province)
+    report = reports.ChangeReport(job.id, dry_run)
+    book = None
+    try:
+        job.update(phase="parse")
+        try:
+            book = excel.Workbook(temp_path)
+            entries = workbook.plan(book, manifest)
+        except (excel.SheetError, workbook.ManifestError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"❌ Failed to process file: {str(e)}")
+        parsed = parse_sheets(job, temp_path, [(entry.index, entry.file_type) for entry in entries])
+
+        # ⚛️ One transaction for the whole workbook, sheets in dependency order
+        crud.sync_working_table(db)
+        names = countries.UploadCountries(db)
+        sheets = []
+        for entry, rows in zip(entries, parsed):
+            report.sheet = entry.name
+            before = {action: report.total(action) for action in reports.ACTIONS}
+            started = time.perf_counter()
+            result = process_upload(db, job, rows, entry.file_type, report, names)
+            sheets.append({
+                "sheet": entry.name,
+                "file_type": entry.file_type,
+                "message": result["message"],
+                "totals": {action: report.total(action) - before[action] for action in reports.ACTIONS},
+                "timings": {
+                    "parse": round(rows.seconds, 4),
+                    "melt": round(rows.melt_seconds, 4),
+                    "write": round(time.perf_counter() - started, 4),
+                },
+            })
+        report.sheet = None
+
+        result = upload_result(report, f"✅ Workbook processed: {len(sheets)} sheets.")
+        result["sheets"] = sheets
+        result["countries"] = names.summary()
+        if not dry_run:
+            result["version"] = publish_rates(db, province, "workbook", filename=filename, job_id=job.id)
+        return result
+    finally:
+        if book is not None:
+            book.close()
+        report.close()
+        db.rollback()
+        db.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def upload_result(report: reports.ChangeReport, message: str) -> dict:
+    # ✅ counts + capped samples; everything else is in the NDJSON report
+    if report.dry_run:
+        message = "🧪 Dry run (nothing written): " + message.lstrip("✅ ")
+    return {
+        "message": message,
+        "skipped_rows": report.skipped_lines(),
+        "report": report.summary(),
+    }
+
+
+def parse_sheets(job, temp_path: str, sheets: list) -> list:
+    # 🧮 Parsed in the parse processes (src/parsing.py), off this worker's GIL
+    from . import excel, parsing
+
+    try:
+        parsed = parsing.parse_many(temp_path, sheets)
+    except excel.SheetError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"❌ Failed to process file: {str(e)}")
+    # ⏱️ the wide layouts are melted in the worker: that share of "parse" is the melt phase
+    for rows in parsed:
+        if rows.melt_seconds:
+            job.record_phase("melt", rows.melt_seconds)
+    return parsed
 
+
+def process_upload(db: Session, job, rows, file_type: str, report: reports.ChangeReport, names: countries.UploadCountries):
+    # 📥 pandas / openpyxl are only needed here, so worker start-up doesn't pay for them
+    import numpy as np
+    import pandas as pd
+    from . import excel, ingest
+
+    dry_run = report.dry_run
+    try:
         # 🔹 ZONES FILE
         if file_type == "zones":
-            if "COUNTRIES" not in df.columns or "ZONE" not in df.columns:
+            header = rows.header()
+            if "COUNTRIES" not in header or "ZONE" not in header:
                 raise HTTPException(status_code=400, detail="Zones file must include 'COUNTRIES' and 'ZONE' columns.")
+            country_index, zone_index = header.index("COUNTRIES"), header.index("ZONE")
+
+            inserted = updated = skipped = processed = 0
+            job.update(phase="write", rows_total=rows.estimated_rows)
+            for row in rows:
+                job.update(rows_processed=processed, inserted=inserted, updated=updated, skipped=skipped)
+                processed += 1
+                zone = str(excel.cell(row, zone_index)).strip()
+                match = names.resolve(excel.cell(row, country_index))
+                if match is None:
+                    skipped += 1
+                    report.add("skip", reports.INVALID_VALUE, cell=processed, country=None, zone=zone)
+                    continue
+                country = match.name
 
-            inserted = updated = skipped = 0
-            skipped_rows = []
-            for _, row in df.iterrows():
-                country = str(row["COUNTRIES"]).strip().lower()
-                zone = str(row["ZONE"]).strip()
-
-                rates = db.query(models.ShippingRate).filter(func.lower(models.ShippingRate.country) == country).all()
+                rates = db.query(models.ShippingRate).filter(models.ShippingRate.country_id == match.id).all()
                 if not rates:
                     rate = schemas.ShippingRateCreate(
                         country=country,
@@ -183,138 +538,70 @@ def upload_rates(
                         student=False,
                         zone=zone
                     )
-                    crud.create_rate(db, rate)
+                    crud.create_rate(db, rate, commit=False, country_id=match.id)
                     inserted += 1
+                    report.add("insert", reports.NEW, cell=processed, country=country, zone=zone)
                 else:
+                    # lanes already held by a row in the target zone
+                    taken = {(r.type, r.weight, bool(r.student)) for r in rates if r.zone == zone}
                     for r in rates:
                         if r.zone == zone:
                             skipped += 1
-                            skipped_rows.append(f"{country} - {r.weight}kg - {r.type} (zone matched)")
+                            report.add("skip", reports.UNCHANGED, cell=processed, country=country, weight=r.weight, type=r.type, zone=zone)
                             continue
+                        lane = (r.type, r.weight, False)
+                        if lane in taken:
+                            # ⚠️ would duplicate a lane under the unique index → the row stays in its zone
+                            skipped += 1
+                            report.add("skip", reports.LANE_CONFLICT, cell=processed, country=country, weight=r.weight, type=r.type, zone=r.zone)
+                            continue
+                        taken.add(lane)
                         r.zone = zone
                         r.student = False
-                        db.commit()
+                        db.flush()
                         updated += 1
+                        report.add("update", reports.CHANGED, cell=processed, country=country, weight=r.weight, type=r.type, zone=zone)
 
-            return {
-                "message": f"✅ Zones file processed. Inserted: {inserted}, Updated: {updated}, Skipped: {skipped}.",
-                "skipped_rows": skipped_rows
-            }
+            job.update(rows_processed=processed, inserted=inserted, updated=updated, skipped=skipped)
+            return upload_result(
+                report, f"✅ Zones file processed. Inserted: {inserted}, Updated: {updated}, Skipped: {skipped}."
+            )
 
         # 🔹 ZONES_DOCS or ZONES_PKG FILES (wide format supported)
         if file_type in ["zones_docs", "zones_pkg"]:
-            if "WEIGHT" not in df.columns:
-                raise HTTPException(status_code=400, detail="Excel must contain 'WEIGHT' column as first column.")
-
-            df = pd.melt(df, id_vars=["WEIGHT"], var_name="ZONE", value_name="RETAIL RATE")
-            df.dropna(subset=["RETAIL RATE"], inplace=True)
+            # ✅ header check, melt and zone normalization were done by the parse worker
+            result = ingest.UpsertResult(report)  # 📝 changes go to the report as the diff runs
+            for order, code, key in rows.skips:
+                result.skip((order, -1), code, **key)
 
-            inserted = updated = skipped = 0
-            skipped_rows = []
-
-            for _, row in df.iterrows():
-                try:
-                    zone_raw = str(row["ZONE"]).strip()
+            # ✅ Zone → countries map built once, joined to the cells, one bulk write
+            cells = pd.DataFrame({name: rows.column(name) for name in ["order", "weight", "zone_key", "value"]})
+            result = ingest.upsert_zone_rates(db, cells, file_type, result, progress=job.update, dry_run=dry_run)
 
-                    # ✅ STRICT: Must start with "Zone" (case-insensitive)
-                    if not zone_raw.lower().startswith("zone"):
-                        raise ValueError(f"Zone format invalid: '{zone_raw}'")
-                    
-
-
-                    zone_str = re.sub(r"(?i)zone", "", zone_raw).strip()
-
-                    # ✅ STRICT: Must be numeric
-                    if not re.fullmatch(r"\d+(\.\d+)?", zone_str):
-                        raise ValueError(f"Zone value not numeric: '{zone_str}'")
-
-                    zone_float = float(zone_str)
-                    zone = str(int(zone_float)) if zone_float.is_integer() else str(zone_float)  # ✅ Converts 1.0 → "1"       # Cleaned zone string
-
-
-                    weight = float(row["WEIGHT"])
-                    retail_rate = float(row["RETAIL RATE"])
-                    discount_rate = 0
-                except Exception as e:
-                    skipped += 1
-                    skipped_rows.append(f"⛔ Skipped row due to error: {e} | Row: {row}")
-                    continue
-       
-                countries = db.query(models.ShippingRate.country).filter(
-                    cast(models.ShippingRate.zone, String) == zone
-                ).distinct().all()
-
-
-                if not countries:
-                    skipped_rows.append(f"⚠️ No countries found for zone {zone}")
-                    continue
-
-                for country_tuple in countries:
-                    country = str(country_tuple[0]).strip().lower()
-                    type_ = "docs" if file_type == "zones_docs" else "non-docs"
-
-                    existing = db.query(models.ShippingRate).filter(
-                        func.lower(models.ShippingRate.country) == country,
-                        models.ShippingRate.weight == weight,
-                        models.ShippingRate.type == type_,
-                        cast(models.ShippingRate.zone, String) == zone,
-                        models.ShippingRate.student == False
-                    ).first()
-
-                    if existing:
-                        if (
-                            existing.original_rate == retail_rate and
-                            (existing.discount_rate == discount_rate or (existing.discount_rate is None and discount_rate == 0))
-                        ):
-                            skipped += 1
-                            skipped_rows.append(f"{country} - {weight}kg - {type_} (unchanged)")
-                            continue
-
-                        existing.original_rate = retail_rate
-                        existing.discount_rate = str(discount_rate)
-                        db.commit()
-                        updated += 1
-                    else:
-                        rate = schemas.ShippingRateCreate(
-                            country=country,
-                            weight=weight,
-                            type=type_,
-                            original_rate=retail_rate,
-                            discount_rate=str(discount_rate),
-                            source=file_type,
-                            student=False,
-                            zone=zone
-                        )
-                        crud.create_rate(db, rate)
-                        inserted += 1
-
-            return {
-                "message": f"✅ {file_type.replace('_', ' ').title()} file processed. Inserted: {inserted}, Updated: {updated}, Skipped: {skipped}.",
-                "skipped_rows": skipped_rows
-            }
+            return upload_result(
+                report,
+                f"✅ {file_type.replace('_', ' ').title()} file processed. Inserted: {result.inserted}, Updated: {result.updated}, Skipped: {result.skipped}.",
+            )
 
 
         if file_type == "pkg_discount":
             inserted = updated = skipped = 0
-            skipped_rows = []
 
             # ✅ Enforce strict structure
             required_first_column = "COUNTRIES"
-            if df.columns[0].strip().upper() != required_first_column:
+            header = rows.header()
+            if not header or str(header[0]).strip().upper() != required_first_column:
                 raise HTTPException(
                     status_code=400,
                     detail=f"'pkg_discount' must start with '{required_first_column}' column."
                 )
 
-            # ✅ Rename 'COUNTRIES' to standard internal column
-            df = df.rename(columns={df.columns[0]: "Country"})
-
             # ✅ Ensure weight columns follow pattern (e.g., "1 KG")
-            weight_columns = [col for col in df.columns if col != "Country"]
+            weight_columns = [(i, str(col)) for i, col in enumerate(header) if i > 0 and not excel.is_blank(col)]
             if not weight_columns:
                 raise HTTPException(status_code=400, detail="No weight columns found in 'pkg_discount' file.")
 
-            for col in weight_columns:
+            for _, col in weight_columns:
                 match = re.fullmatch(r"^\s*\d+(\.\d+)?\s*KG\s*$", col, re.IGNORECASE)
                 if not match:
                     raise HTTPException(
@@ -322,68 +609,74 @@ def upload_rates(
                         detail=f"Invalid weight column name: '{col}'. Must be like '1 KG', '0.5 KG', etc."
                     )
 
-            for _, row in df.iterrows():
-                country = str(row["Country"]).strip().lower()
+            processed = 0
+            job.update(phase="write", rows_total=rows.estimated_rows)
+            for row in rows:
+                job.update(rows_processed=processed, updated=updated, skipped=skipped)
+                processed += 1
+                match = names.resolve(excel.cell(row, 0), create=False)  # only updates existing lanes
+                country = match.name if match else models.country_key(excel.cell(row, 0))
 
-                for col in weight_columns:
+                for i, col in weight_columns:
                     try:
                         weight_val = float(col.strip().upper().replace("KG", "").strip())
-                        discount_rate = float(row[col])
+                        discount_rate = float(excel.cell(row, i))
                     except Exception:
                         skipped += 1
-                        skipped_rows.append(f"⛔ Invalid row: {row['Country']} → {col}")
+                        report.add("skip", reports.INVALID_VALUE, cell=processed, country=country, weight=col, value=str(excel.cell(row, i)))
                         continue
 
-                    existing = db.query(models.ShippingRate).filter(
-                        func.lower(models.ShippingRate.country) == country,
-                        models.ShippingRate.weight == weight_val,
+                    existing = match and db.query(models.ShippingRate).filter(
+                        models.ShippingRate.country_id == match.id,
                         models.ShippingRate.type == "non-docs",
+                        models.ShippingRate.weight == weight_val,
                         models.ShippingRate.student == False
                     ).first()
 
                     if existing:
                         existing.discount_rate = str(discount_rate)
-                        db.commit()
+                        db.flush()
                         updated += 1
+                        report.add("update", reports.CHANGED, cell=processed, country=country, weight=weight_val, type="non-docs")
                     else:
                         skipped += 1
-                        skipped_rows.append(f"{country} - {weight_val}kg - non-docs (not found)")
+                        report.add("skip", reports.NOT_FOUND, cell=processed, country=country, weight=weight_val, type="non-docs")
 
-            return {
-                "message": f"✅ Strictly pkg_discount processed. Updated: {updated}, Skipped: {skipped}.",
-                "skipped_rows": skipped_rows
-            }
+            job.update(rows_processed=processed, updated=updated, skipped=skipped)
+            return upload_result(report, f"✅ Strictly pkg_discount processed. Updated: {updated}, Skipped: {skipped}.")
 
         if file_type == "addkg":
-            # 🔹 Re-read only for ADD KG file to support 2-row horizontal layout
-            df_addkg = pd.read_excel(temp_path, sheet_name=sheet_index, engine="openpyxl", header=None)
-
-            if df_addkg.shape[0] < 2:
+            # 🔹 ADD KG file uses a 2-row horizontal layout (no header row)
+            header = rows.next_row()  # First row
+            second_row = rows.next_row()
+            if header is None or second_row is None:
                 raise HTTPException(status_code=400, detail="ADD KG file must have at least 2 rows: 'COUNTRIES' and 'ADD KG'.")
 
-            header = df_addkg.iloc[0].tolist()  # First row
             if str(header[0]).strip().upper() != "COUNTRIES":
                 raise HTTPException(status_code=400, detail="First cell must be 'COUNTRIES'.")
 
-            second_row = df_addkg.iloc[1].tolist()
             if str(second_row[0]).strip().upper() != "ADD KG":
                 raise HTTPException(status_code=400, detail="Second row must start with 'ADD KG' label.")
 
-            countries = header[1:]
-            addkg_values = second_row[1:]
+            country_names = list(header[1:])
+            addkg_values = [excel.cell(second_row, i) for i in range(1, len(header))]
 
 
             inserted = updated = skipped = 0
-            skipped_rows = []
 
-            for i, country_col in enumerate(countries):
-                if pd.isna(country_col):
+            job.update(phase="write", rows_total=len(country_names))
+            for i, country_col in enumerate(country_names):
+                job.update(rows_processed=i, inserted=inserted, updated=updated, skipped=skipped)
+                if excel.is_blank(country_col):
                    continue  # ✅ Skip blank country columns
 
                 addkg_val = addkg_values[i]
-                if pd.isna(addkg_val):
+                if excel.is_blank(addkg_val):
                     continue  # ✅ Skip blank ADD KG cells
-                country = str(country_col).strip().lower()
+                match = names.resolve(country_col)
+                if match is None:
+                    continue
+                country = match.name
                 addkg_val = addkg_values[i]
 
 
@@ -391,23 +684,24 @@ def upload_rates(
                     addkg = float(addkg_val)
                 except:
                     skipped += 1
-                    skipped_rows.append(f"⛔ Invalid ADD KG value for {country}")
+                    report.add("skip", reports.INVALID_VALUE, cell=i, country=country, type="add-kg", value=str(addkg_val))
                     continue
 
                 zone = None  
                 existing_addkg = db.query(models.ShippingRate).filter(
-                    func.lower(models.ShippingRate.country) == country,
+                    models.ShippingRate.country_id == match.id,
                     models.ShippingRate.type == "add-kg"
                 ).first()
 
                 if existing_addkg:
                     if existing_addkg.addkg == addkg:
                         skipped += 1
-                        skipped_rows.append(f"{country} (same addkg)")
+                        report.add("skip", reports.UNCHANGED, cell=i, country=country, type="add-kg")
                     else:
                         existing_addkg.addkg = addkg
-                        db.commit()
+                        db.flush()
                         updated += 1
+                        report.add("update", reports.CHANGED, cell=i, country=country, type="add-kg")
                 else:
                     rate = schemas.ShippingRateCreate(
                         country=country,
@@ -420,144 +714,109 @@ def upload_rates(
                         zone=zone,
                         addkg=addkg  
                     )
-                    crud.create_rate(db, rate)
+                    crud.create_rate(db, rate, commit=False, country_id=match.id)
                     inserted += 1
+                    report.add("insert", reports.NEW, cell=i, country=country, type="add-kg")
 
-            return {
-                "message": f"✅ ADD KG file processed. Inserted: {inserted}, Updated: {updated}, Skipped: {skipped}.",
-                "skipped_rows": skipped_rows
-            }
+            job.update(rows_processed=len(country_names), inserted=inserted, updated=updated, skipped=skipped)
+            return upload_result(
+                report, f"✅ ADD KG file processed. Inserted: {inserted}, Updated: {updated}, Skipped: {skipped}."
+            )
 
         if file_type == "zoneaddkg":
-            df_zoneadd = pd.read_excel(temp_path, sheet_name=sheet_index, engine="openpyxl", header=None)
-
-            if df_zoneadd.shape[0] < 2:
+            header = rows.next_row()
+            second_row = rows.next_row()
+            if header is None or second_row is None:
                 raise HTTPException(status_code=400, detail="zoneaddkg file must have at least 2 rows.")
 
-            header = df_zoneadd.iloc[0].tolist()
             if str(header[0]).strip().upper() != "COUNTRIES":
                 raise HTTPException(status_code=400, detail="First cell must be 'COUNTRIES'.")
 
-            second_row = df_zoneadd.iloc[1].tolist()
             if str(second_row[0]).strip().upper() != "ADD KG":
                 raise HTTPException(status_code=400, detail="Second row must start with 'ADD KG'.")
 
-            zone_labels = header[1:]
-            addkg_values = second_row[1:]
+            zone_labels = list(header[1:])
+            addkg_values = [excel.cell(second_row, i) for i in range(1, len(header))]
 
-            inserted = updated = skipped = 0
-            skipped_rows = []
+            result = ingest.UpsertResult(report)
+            cells = []
 
             for i, zone_col in enumerate(zone_labels):
-                if pd.isna(zone_col):
+                if excel.is_blank(zone_col):
                     continue
 
                 raw_zone = str(zone_col).strip()
                 zone_match = re.search(r"\d+", raw_zone)
                 if not zone_match:
-                    skipped += 1
-                    skipped_rows.append(f"⚠️ Invalid zone label: {raw_zone}")
+                    result.skip((i, -1), reports.INVALID_ZONE, zone=raw_zone)
                     continue
 
                 zone = zone_match.group()
                 addkg_val = addkg_values[i]
-                if pd.isna(addkg_val):
+                if excel.is_blank(addkg_val):
                     continue
 
                 try:
                     addkg = float(addkg_val)
                 except:
-                    skipped += 1
-                    skipped_rows.append(f"⛔ Invalid ADD KG value for Zone {zone}")
-                    continue
-
-                # 🔍 Get all countries in that zone
-                countries = db.query(models.ShippingRate.country).filter(
-                    cast(models.ShippingRate.zone, String) == zone
-                ).distinct().all()
-
-                if not countries:
-                    skipped += 1
-                    skipped_rows.append(f"⚠️ No countries found for Zone {zone}")
+                    result.skip((i, -1), reports.INVALID_VALUE, zone=zone, value=str(addkg_val))
                     continue
+                cells.append((i, 0.0, zone, addkg))
 
-                for country_tuple in countries:
-                    country = str(country_tuple[0]).strip().lower()
+            # 🔍 Countries of every zone come from one query, see ingest.upsert_zone_addkg
+            cells = pd.DataFrame(cells, columns=["order", "weight", "zone_key", "value"])
+            result = ingest.upsert_zone_addkg(db, cells, result, progress=job.update, dry_run=dry_run)
 
-
-
-                    existing_addkg = db.query(models.ShippingRate).filter(
-                        func.lower(models.ShippingRate.country) == country,
-                        models.ShippingRate.type == "add-kg",
-                        cast(models.ShippingRate.zone, String) == zone
-                    ).first()
-
-                    if existing_addkg:
-                        if existing_addkg.addkg == addkg:
-                            skipped += 1
-                            skipped_rows.append(f"{country} (same addkg)")
-                        else:
-                            existing_addkg.addkg = addkg
-                            db.commit()
-                            updated += 1
-                    else:
-                        rate = schemas.ShippingRateCreate(
-                            country=country,
-                            weight=0,
-                            type="add-kg",
-                            original_rate=0,
-                            discount_rate="0",
-                            source="zoneaddkg",
-                            student=False,
-                            zone=zone,
-                            addkg=addkg
-                        )
-                        crud.create_rate(db, rate)
-                        inserted += 1
-
-            return {
-                "message": f"✅ ZONE ADD KG file processed. Inserted: {inserted}, Updated: {updated}, Skipped: {skipped}.",
-                "skipped_rows": skipped_rows
-            }
+            return upload_result(
+                report,
+                f"✅ ZONE ADD KG file processed. Inserted: {result.inserted}, Updated: {result.updated}, Skipped: {result.skipped}.",
+            )
 
         if file_type == "surcharges":
-            df_surcharge = pd.read_excel(temp_path, sheet_name=sheet_index, engine="openpyxl")
-
-            df_surcharge.columns = [col.strip().upper() for col in df_surcharge.columns]
+            header = [str(col).strip().upper() for col in rows.header()]
 
             required_columns = ["COUNTRIES", "SURCHARGES"]
-            missing = [col for col in required_columns if col not in df_surcharge.columns]
+            missing = [col for col in required_columns if col not in header]
             if missing:
                 raise HTTPException(status_code=400, detail=f"Missing columns in surcharges file: {', '.join(missing)}")
+            country_index, surcharge_index = header.index("COUNTRIES"), header.index("SURCHARGES")
 
-            inserted = updated = skipped = 0
-            skipped_rows = []
+            inserted = updated = skipped = processed = 0
 
-            for index, row in df_surcharge.iterrows():
-                country_raw = str(row["COUNTRIES"]).strip()
-                country_normalized = str(re.sub(r'\s+', ' ', country_raw)).strip().lower()
+            job.update(phase="write", rows_total=rows.estimated_rows)
+            for row in rows:
+                job.update(rows_processed=processed, inserted=inserted, updated=updated, skipped=skipped)
+                processed += 1
+                country_raw = excel.cell(row, country_index)
 
-                surcharge_value_raw = str(row["SURCHARGES"]).strip()
+                surcharge_value_raw = str(excel.cell(row, surcharge_index)).strip()
                 surcharge_value_clean = surcharge_value_raw.replace("$", "").strip()
 
                 try:
                     surcharge_value = float(surcharge_value_clean)
                 except:
                     skipped += 1
-                    skipped_rows.append(f"⛔ Invalid surcharge value for {country_normalized}: {surcharge_value_raw}")
+                    report.add("skip", reports.INVALID_VALUE, cell=processed, country=models.country_key(country_raw), type="sur-charges", value=surcharge_value_raw)
+                    continue
+
+                match = names.resolve(country_raw)
+                if match is None:
+                    skipped += 1
+                    report.add("skip", reports.INVALID_VALUE, cell=processed, country=None, type="sur-charges")
                     continue
+                country_normalized = match.name
 
                 existing_zone_record = db.query(models.ShippingRate).filter(
-                    func.lower(func.trim(models.ShippingRate.country)) == country_normalized,
+                    models.ShippingRate.country_id == match.id,
                     models.ShippingRate.zone.isnot(None)
                 ).first()
 
                 zone = existing_zone_record.zone if existing_zone_record else None
 
                 existing = db.query(models.ShippingRate).filter(
-                    func.lower(func.trim(models.ShippingRate.country)) == country_normalized,
-                    models.ShippingRate.weight == 0.0,
+                    models.ShippingRate.country_id == match.id,
                     models.ShippingRate.type == "sur-charges",
+                    models.ShippingRate.weight == 0.0,
                     func.coalesce(models.ShippingRate.original_rate, 0) == 0.0,
                     func.coalesce(models.ShippingRate.addkg, 0) == 0.0
                 ).first()
@@ -565,11 +824,12 @@ def upload_rates(
                 if existing:
                     if abs(existing.surcharges - surcharge_value) < 0.001:
                         skipped += 1
-                        skipped_rows.append(f"{country_normalized} (no change)")
+                        report.add("skip", reports.UNCHANGED, cell=processed, country=country_normalized, type="sur-charges")
                     else:
                         existing.surcharges = surcharge_value
-                        db.commit()
+                        db.flush()
                         updated += 1
+                        report.add("update", reports.CHANGED, cell=processed, country=country_normalized, type="sur-charges")
                 else:
                     rate = schemas.ShippingRateCreate(
                         country=country_normalized,
@@ -583,29 +843,30 @@ def upload_rates(
                         addkg=0,
                         surcharges=surcharge_value
                     )
-                    crud.create_rate(db, rate)
+                    crud.create_rate(db, rate, commit=False, country_id=match.id)
                     inserted += 1
+                    report.add("insert", reports.NEW, cell=processed, country=country_normalized, type="sur-charges")
 
-            return {
-                "message": f"✅ Surcharges file processed. Inserted: {inserted}, Updated: {updated}, Skipped: {skipped}.",
-                "skipped_rows": skipped_rows
-            }
+            job.update(rows_processed=processed, inserted=inserted, updated=updated, skipped=skipped)
+            return upload_result(
+                report, f"✅ Surcharges file processed. Inserted: {inserted}, Updated: {updated}, Skipped: {skipped}."
+            )
 
         # 🔹 COUNTRY-WEIGHT-RATE FILES - Only New Format
-        if "WEIGHT" not in df.columns:
-            raise HTTPException(status_code=400, detail="Excel must contain a 'WEIGHT' column in the first column.")
-
-        long_df = df.melt(id_vars=["WEIGHT"], var_name="Country", value_name="Retail Rate")
-        long_df.rename(columns={"WEIGHT": "Weight"}, inplace=True)
-
-        long_df["Country"] = long_df["Country"].astype(str).str.strip().str.lower()
-        long_df["Weight"] = long_df["Weight"].apply(lambda w: float(str(w).replace("KG", "").strip()))
-        long_df["Retail Rate"] = pd.to_numeric(long_df["Retail Rate"], errors="coerce")
+        # 📌 Melted by the parse worker: weights / rates as float arrays, countries coded
+
+        # 🌍 Each distinct sheet name resolved once to its canonical country
+        sheet_names = rows.dictionaries["Country"]
+        resolved = names.resolve_many(sheet_names)
+        codes = rows.columns["Country"]
+        long_df = pd.DataFrame({
+            "Weight": rows.columns["Weight"],
+            "Country": np.array([resolved[name].name if resolved[name] else None for name in sheet_names], dtype=object)[codes],
+            "Retail Rate": rows.columns["Retail Rate"],
+            "Country ID": np.array([resolved[name].id if resolved[name] else np.nan for name in sheet_names], dtype=float)[codes],
+        })
         long_df["Source"] = file_type
-        long_df.dropna(subset=["Weight", "Retail Rate"], inplace=True)
-
-        inserted = updated = skipped = 0
-        skipped_rows = []
+        long_df.dropna(subset=["Weight", "Retail Rate", "Country ID"], inplace=True)
 
         long_df["Type"] = (
             "non-docs" if file_type in ["pkg_discount", "retail", "student"]
@@ -613,63 +874,24 @@ def upload_rates(
             else "zone"
         )
 
-        for _, row in long_df.iterrows():
-            zone = None
-            z_record = db.query(models.ShippingRate).filter(
-                func.lower(models.ShippingRate.country) == row["Country"],
-                models.ShippingRate.weight == row["Weight"],
-                models.ShippingRate.type == row["Type"]
-            ).first()
-            if z_record:
-                zone = z_record.zone
-
-            existing = db.query(models.ShippingRate).filter(
-                func.lower(models.ShippingRate.country) == row["Country"],
-                models.ShippingRate.weight == row["Weight"],
-                models.ShippingRate.type == row["Type"],
-                models.ShippingRate.student == (file_type == "student")
-            ).first()
-
-            if existing:
-                if existing.original_rate == row["Retail Rate"] and (
-                    existing.discount_rate == row["Retail Rate"] or existing.discount_rate is None
-                ):
-                    skipped += 1
-                    skipped_rows.append(f"{row['Country']} - {row['Weight']}kg - {row['Type']}")
-                    continue
-                existing.original_rate = row["Retail Rate"]
-                if existing.discount_rate is None:
-                    existing.discount_rate = row["Retail Rate"]
-                db.commit()
-                updated += 1
-            else:
-                rate = schemas.ShippingRateCreate(
-                    country=row["Country"],
-                    weight=row["Weight"],
-                    type=row["Type"],
-                    original_rate=row["Retail Rate"],
-                    discount_rate=None,
-                    source=row["Source"],
-                    student=(file_type == "student"),
-                    zone=zone
-                )
-                crud.create_rate(db, rate)
-                inserted += 1
+        # ✅ One key query + in-memory diff + one bulk transaction
+        result = ingest.upsert_country_weight_rates(db, long_df, file_type, progress=job.update, dry_run=dry_run, report=report)
 
-        return {
-            "message": f"✅ {file_type.replace('_', ' ').title()} file processed. Inserted: {inserted}, Updated: {updated}, Skipped: {skipped}.",
-            "skipped_rows": skipped_rows
-        }
+        return upload_result(
+            report,
+            f"✅ {file_type.replace('_', ' ').title()} file processed. Inserted: {result.inserted}, Updated: {result.updated}, Skipped: {result.skipped}.",
+        )
 
+    except HTTPException:
+        raise  # a 400 for a bad header stays a 400
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"❌ Failed to process file: {str(e)}")
     finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        rows.close()
 
 
 def get_db_with_query_param(province: str = Query(...)):
-    return next(get_db(province))
+    yield from get_db(province)
 
 @app.delete("/clear-database")
 def clear_database(
@@ -677,13 +899,161 @@ def clear_database(
     db: Session = Depends(get_db_with_query_param)
 ):
     try:
-        num_deleted = db.query(models.ShippingRate).delete()
-        db.commit()
-        return {"message": f"{num_deleted} lines removed from {province} database"}  # ✅ fixed
+        with jobs.province_lock(province):  # 🔒 waits for a running upload of this province
+            crud.sync_working_table(db)
+            num_deleted = db.query(models.ShippingRate).delete()
+            version = publish_rates(db, province, "clear")  # ↩️ can be rolled back like any upload
+        return {"message": f"{num_deleted} lines removed from {province} database", "version": version}  # ✅ fixed
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"❌ Failed to clear database: {str(e)}")
 
 
+# 📦 Binary snapshot of the published card: pointer (revalidated) → immutable content-addressed file
+@app.get("/rate-snapshots/{province}")
+def get_rate_snapshot(request: Request, province: str):
+    provinces.require(province)
+    snapshot = snapshots.get_snapshot(province)
+    if snapshot.file is None:  # card published before binary snapshots existed
+        snapshot.file = snapshots.persist_card(province, snapshot.card)
+    name = snapshot.file
+    return responses.versioned_response(request, f"{province}-v{snapshot.version}-snapshot", lambda: {
+        "province": province,
+        "version": snapshot.version,
+        "card": snapshot.card,
+        "seq": snapshot.seq,
+        "rows": snapshot.count,
+        "file": name,
+        "url": f"/rate-snapshots/files/{name}",
+    })
+
+
+@app.get("/rate-snapshots/files/{name}")
+def get_rate_snapshot_file(name: str):
+    if not snapshot_files.is_file_name(name) or not os.path.exists(snapshot_files.file_path(name)):
+        raise HTTPException(status_code=404, detail="Snapshot file not found")
+    return FileResponse(
+        snapshot_files.file_path(name),
+        media_type="application/octet-stream",
+        headers={"Cache-Control": "public, max-age=31536000, immutable", "ETag": f'"{name[:-4]}"'},
+    )
+
+
+# 📚 Published rate cards (one per upload / clear), newest first
+@app.get("/rate-cards", response_model=schemas.RateCardsOut)
+def list_rate_cards(
+    province: str = Query(...),
+    limit: int = Query(50, gt=0, le=500),
+    db: Session = Depends(get_db_with_query_param),
+):
+    published = crud.get_meta(db, crud.PUBLISHED_CARD_KEY)
+    cards = [
+        {**{c.name: getattr(card, c.name) for c in models.RateCard.__table__.columns}, "published": card.version == published}
+        for card in crud.list_cards(db, limit)
+    ]
+    return {"province": province, "published": published, "cards": cards}
+
+
+# ↩️ Re-publish an earlier card: a pointer swap, no Excel re-upload (default: the card before the current one)
+@app.post("/rate-cards/rollback")
+def rollback_rate_card(
+    province: str = Query(...),
+    version: Optional[int] = Query(None, gt=0),
+    db: Session = Depends(get_db_with_query_param),
+):
+    with jobs.province_lock(province):
+        published = crud.get_meta(db, crud.PUBLISHED_CARD_KEY)
+        if version is None:
+            older = [card.version for card in crud.list_cards(db, limit=500) if card.version < published]
+            if not older:
+                raise HTTPException(status_code=404, detail=f"No card older than version {published} to roll back to.")
+            version = older[0]
+        previous = crud.publish_existing_card(db, version)
+    if previous is None:
+        raise HTTPException(status_code=404, detail=f"Rate card version {version} not found.")
+    snapshots.invalidate(province)
+    return {
+        "province": province,
+        "published": version,
+        "previous": previous,
+        "message": f"↩️ {province.title()} rates now served from card v{version} (was v{previous}).",
+    }
+
+
+# 🌍 Country dimension: canonical names and their aliases
+@app.get("/country-aliases")
+def list_country_aliases(province: str = Query(...), db: Session = Depends(get_db_with_query_param)):
+    resolver = countries.load_resolver(db)
+    aliases = {}
+    for key, country_id in resolver.ids.items():
+        if resolver.names[country_id] != key:
+            aliases.setdefault(country_id, []).append(key)
+    return {
+        "province": province,
+        "countries": [
+            {"id": id_, "name": name, "aliases": sorted(aliases.get(id_, []))} for id_, name in resolver.names.items()
+        ],
+    }
+
+
+# 🔀 An alias that is a country of its own (an upload typo, or a spelling the
+# migration kept) is merged into the target: its rates move over and a new
+# card is published. Lanes both countries have need conflicts=keep (the
+# target's rates stay) or conflicts=replace (the merged country's rates win).
+@app.post("/country-aliases")
+def add_country_alias(
+    province: str = Query(...),
+    alias: str = Query(..., min_length=1),
+    country: str = Query(..., min_length=1),
+    conflicts: Optional[str] = Query(None, pattern="^(keep|replace)$"),
+    db: Session = Depends(get_db_with_query_param),
+):
+    provinces.require(province)
+    merged = None
+    try:
+        with jobs.province_lock(province):  # 🔒 an upload keeps the write transaction open until it publishes
+            resolver = countries.load_resolver(db)
+            target = resolver.resolve(country)
+            if target is None or target.how == countries.FUZZY:
+                raise HTTPException(status_code=404, detail=f"Unknown country '{country}'.")
+            key = models.country_key(alias)
+            existing = resolver.ids.get(key)
+            if existing == target.id:
+                raise HTTPException(status_code=400, detail=f"'{alias}' already resolves to '{target.name}'.")
+            if existing is not None and resolver.names[existing] == key:
+                merged = merge_country(db, province, existing, target, conflicts)
+            else:
+                crud.set_country_alias(db, key, target.id)
+                crud.bump_data_version(db)  # quotes resolve through the snapshot's aliases
+    except OperationalError:  # ⏳ another writer (e.g. a migration) still holds the DB
+        db.rollback()
+        raise HTTPException(
+            status_code=503, detail=f"{province.title()} rates are being written, try again shortly.",
+            headers={"Retry-After": "5"},
+        )
+    snapshots.invalidate(province)
+    result = {"province": province, "alias": key, "country": target.name, "country_id": target.id}
+    if merged is not None:
+        result["merged"] = merged
+    return result
+
+
+def merge_country(db: Session, province: str, source_id: int, target, conflicts: Optional[str]) -> dict:
+    crud.sync_working_table(db)
+    lanes = crud.country_lane_conflicts(db, source_id, target.id)
+    if lanes and conflicts is None:
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail=f"Both countries have rates for {len(lanes)} lane(s); pass conflicts=keep to keep the rates "
+                   f"of '{target.name}' or conflicts=replace to take those of the merged country.",
+        )
+    dropped = {source if conflicts == "keep" else kept for source, kept in lanes}
+    moved = crud.merge_country(db, source_id, target.id, target.name, dropped)
+    version = publish_rates(db, province, "country-merge")
+    return {"country_id": source_id, "moved": moved, "dropped": len(dropped), "version": version}
+
+
 
 
 # @app.post("/upload-rates")
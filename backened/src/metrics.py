@@ -0,0 +1,207 @@
+"""In-process metrics rendered in the Prometheus text format (``/metrics``).
+
+No client library: counters, gauges and histograms are plain dicts keyed by
+label values, guarded by one lock. Values are per process, so with several
+gunicorn workers each scrape sees the worker that answered it.
+
+SQL statements are counted per request through a context variable that the
+ASGI middleware sets and a ``before_cursor_execute`` listener increments
+(Starlette copies the context into the threadpool, so sync routes count too).
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000, 10000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_lock = threading.Lock()
+_metrics = []
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        _metrics.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def _label_text(self, key: tuple, extra: str = "") -> str:
+        parts = [f'{name}="{_escape(value)}"' for name, value in zip(self.labels, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self.values.items()):
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value) -> list:
+        return [f"{self.name}{self._label_text(key)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with _lock:
+            self.values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with _lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [[0] * len(self.buckets), 0, 0.0]  # per-bucket, count, sum
+            i = bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                state[0][i] += 1
+            state[1] += 1
+            state[2] += value
+
+    def _samples(self, key, state) -> list:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, state[0]):
+            cumulative += count
+            le = 'le="%s"' % _number(bound)
+            lines.append(f"{self.name}_bucket{self._label_text(key, le)} {cumulative}")
+        inf = 'le="+Inf"'
+        lines.append(f"{self.name}_bucket{self._label_text(key, inf)} {state[1]}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {state[1]}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {_number(state[2])}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render() -> bytes:
+    with _lock:
+        lines = [line for metric in _metrics for line in metric.render()]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+# 🌐 HTTP
+http_requests = Counter("http_requests_total", "HTTP requests.", ("method", "route", "province", "status"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route", "province"))
+http_sql = Histogram(
+    "http_request_sql_statements", "SQL statements executed per HTTP request.", ("method", "route"), COUNT_BUCKETS
+)
+
+# 📥 Ingestion
+ingest_phase = Histogram(
+    "ingest_phase_duration_seconds",
+    "Upload time per phase (receive, parse, melt, diff, write).",
+    ("file_type", "phase"),
+)
+ingest_jobs = Counter("ingest_jobs_total", "Finished upload jobs.", ("file_type", "status"))
+ingest_rows = Counter("ingest_rows_total", "Rows processed by upload jobs.", ("file_type",))
+ingest_rows_per_second = Gauge(
+    "ingest_rows_per_second", "Rows per second of the last finished upload job.", ("file_type",)
+)
+
+# 🗃️ Caches
+cache_lookups = Counter("cache_lookups_total", "Cache lookups by cache and result (hit / miss).", ("cache", "province", "result"))
+
+# 💱 Exchange rates
+exchange_rate_fetches = Counter("exchange_rate_fetches_total", "Exchange-rate provider calls.", ("currency", "status"))
+
+
+# 🔢 SQL statements of the current request
+_sql_count = contextvars.ContextVar("sql_count", default=None)
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = _sql_count.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def install_sql_counter():
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    if not event.contains(Engine, "before_cursor_execute", _count_statement):
+        event.listen(Engine, "before_cursor_execute", _count_statement)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: latency (until the last body chunk, so streamed
+    responses count in full), status and SQL statements per route."""
+
+    def __init__(self, app, provinces=()):
+        self.app = app
+        self.provinces = set(provinces)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        token = _sql_count.set([0])
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            statements = _sql_count.get()[0]
+            _sql_count.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            province = self._province(scope)
+            method = scope["method"]
+            http_requests.inc(method=method, route=route, province=province, status=status[0])
+            http_latency.observe(elapsed, method=method, route=route, province=province)
+            http_sql.observe(statements, method=method, route=route)
+
+    def _province(self, scope) -> str:
+        name = scope["path"].strip("/").split("-")[0]
+        if name in self.provinces:
+            return name
+        for pair in scope.get("query_string", b"").decode("latin-1").split("&"):
+            key, _, value = pair.partition("=")
+            if key == "province" and value.lower() in self.provinces:
+                return value.lower()
+        return ""
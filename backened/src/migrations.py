@@ -0,0 +1,156 @@
+"""In-place schema upgrades for existing ``shippingrates_*.db`` files.
+
+Safe to run repeatedly; it is applied lazily, the first time a process
+opens a session on a province (:func:`ensure_schema`), and can be run by
+hand with ``python -m src.migrations`` from ``backened/``. Every run holds a
+per-province lock file, so workers starting together migrate one at a time,
+and records ``SCHEMA_VERSION`` in ``rate_meta`` so the later ones skip it.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from . import countries, crud, jobs, models, provinces
+from .database import Base, get_engine
+
+LANE_COLUMNS = ("country_key", "type", "weight", "student", "zone_key")
+SCHEMA_VERSION_KEY = "schema_version"
+SCHEMA_VERSION = 1  # ⬆️ bump whenever migrate() learns a new step
+
+
+def _add_key_columns(conn, columns):
+    for name in ("country_key", "zone_key"):
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE shipping_rates ADD COLUMN {name} VARCHAR NOT NULL DEFAULT ''"))
+
+
+def _add_card_columns(conn):
+    columns = {c["name"] for c in inspect(conn).get_columns("rate_cards")}
+    if "snapshot_file" not in columns:
+        conn.execute(text("ALTER TABLE rate_cards ADD COLUMN snapshot_file VARCHAR"))
+
+
+def _add_country_columns(conn):
+    for table in ("shipping_rates", "rate_card_rows"):
+        if "country_id" not in {c["name"] for c in inspect(conn).get_columns(table)}:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN country_id INTEGER"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_shipping_rates_country_lane ON shipping_rates (country_id, type, weight)"
+    ))
+
+
+def _backfill_countries(conn):
+    # 🌍 Every stored country key becomes a country (nothing is merged), then
+    # the built-in aliases whose target exists are added
+    conn.execute(text(
+        "INSERT INTO countries (name) SELECT DISTINCT country_key FROM "
+        "(SELECT country_key FROM shipping_rates UNION SELECT country_key FROM rate_card_rows) "
+        "WHERE country_key != '' AND country_key NOT IN (SELECT name FROM countries) ORDER BY country_key"
+    ))
+    ids = dict(conn.execute(text("SELECT name, id FROM countries")).all())
+    aliases = [
+        {"alias": alias, "country_id": ids[name]}
+        for alias, name in countries.BUILTIN_ALIASES.items()
+        if name in ids and alias not in ids
+    ]
+    if aliases:
+        conn.execute(text(
+            "INSERT OR IGNORE INTO country_aliases (alias, country_id, source) VALUES (:alias, :country_id, 'builtin')"
+        ), aliases)
+    filled = 0
+    for table in ("shipping_rates", "rate_card_rows"):
+        filled += conn.execute(text(
+            f"UPDATE {table} SET country_id = (SELECT id FROM countries WHERE name = {table}.country_key) "
+            f"WHERE country_id IS NULL AND country_key != ''"
+        )).rowcount
+    return filled
+
+
+def _backfill_keys(conn):
+    rows = conn.execute(text("SELECT id, country, zone, country_key, zone_key FROM shipping_rates")).all()
+    changed = [
+        {"id": id_, "country_key": models.country_key(country), "zone_key": models.zone_key(zone)}
+        for id_, country, zone, ckey, zkey in rows
+        if ckey != models.country_key(country) or zkey != models.zone_key(zone)
+    ]
+    if changed:
+        conn.execute(
+            text("UPDATE shipping_rates SET country_key = :country_key, zone_key = :zone_key WHERE id = :id"),
+            changed,
+        )
+    conn.execute(text("UPDATE shipping_rates SET student = 0 WHERE student IS NULL"))
+    return len(changed)
+
+
+def _drop_duplicate_lanes(conn):
+    # The newest row per lane is the one every reader already shows
+    lane = ", ".join(LANE_COLUMNS)
+    result = conn.execute(text(
+        f"DELETE FROM shipping_rates WHERE id NOT IN "
+        f"(SELECT MAX(id) FROM shipping_rates GROUP BY {lane})"
+    ))
+    return result.rowcount
+
+
+def schema_version(province: str) -> int:
+    try:
+        with get_engine(province).connect() as conn:
+            value = conn.execute(
+                text("SELECT value FROM rate_meta WHERE key = :key"), {"key": SCHEMA_VERSION_KEY}
+            ).scalar()
+    except OperationalError:  # new DB file, no rate_meta yet
+        return 0
+    return value or 0
+
+
+def migrate(province: str) -> dict:
+    # 🔒 Separate from the ingest lock: an upload holding that one may be
+    # what opens the first session of this process
+    with jobs.file_lock(f"./.migrate_{province}.lock"):
+        return _migrate(province)
+
+
+def _migrate(province: str) -> dict:
+    engine = get_engine(province)
+    Base.metadata.create_all(bind=engine)
+
+    report = {"province": province, "backfilled": 0, "duplicates_removed": 0, "country_ids": 0, "baseline_card": None}
+    with engine.begin() as conn:
+        _add_card_columns(conn)
+        columns = {c["name"] for c in inspect(conn).get_columns("shipping_rates")}
+        indexes = {i["name"] for i in inspect(conn).get_indexes("shipping_rates")}
+        if "uq_shipping_rates_lane" not in indexes or not {"country_key", "zone_key"} <= columns:
+            _add_key_columns(conn, columns)
+            report["backfilled"] = _backfill_keys(conn)
+            report["duplicates_removed"] = _drop_duplicate_lanes(conn)
+            conn.execute(text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS uq_shipping_rates_lane "
+                f"ON shipping_rates ({', '.join(LANE_COLUMNS)})"
+            ))
+        _add_country_columns(conn)
+        report["country_ids"] = _backfill_countries(conn)
+
+    # 📚 Readers serve the published rate card; existing rows become card 1
+    # (plain Session: get_session would run the first-use hook, i.e. us, again)
+    with Session(engine) as db:
+        if not crud.get_meta(db, crud.PUBLISHED_CARD_KEY):
+            report["baseline_card"] = crud.publish_card(db, "baseline")
+        crud.set_meta(db, SCHEMA_VERSION_KEY, SCHEMA_VERSION)
+        db.commit()
+    return report
+
+
+def ensure_schema(province: str):
+    """``database.on_first_use`` hook: unknown provinces get a 404 instead of
+    a new empty DB file; known ones are migrated once, by the first process."""
+    provinces.require(province)
+    if schema_version(province) >= SCHEMA_VERSION:
+        return
+    with jobs.file_lock(f"./.migrate_{province}.lock"):
+        if schema_version(province) < SCHEMA_VERSION:  # 🔄 another worker may have just done it
+            _migrate(province)
+
+
+if __name__ == "__main__":
+    for province in provinces.PROVINCES:
+        print(migrate(province))
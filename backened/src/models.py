@@ -1,18 +1,141 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean
+from sqlalchemy import Column, Integer, String, Float, Boolean, Index
+from sqlalchemy.orm import validates
 from .database import Base
 
+
+# ✅ Normalized lookup keys (stored, so lookups hit the composite index)
+def country_key(country) -> str:
+    return " ".join(str(country or "").split()).lower()
+
+
+def zone_key(zone) -> str:
+    if zone is None:
+        return ""
+    zone_str = str(zone).strip()
+    try:
+        zone_float = float(zone_str)
+    except ValueError:
+        return zone_str.lower()
+    return str(int(zone_float)) if zone_float.is_integer() else str(zone_float)
+
+
+def _default_country_key(context):
+    return country_key(context.get_current_parameters().get("country"))
+
+
+def _default_zone_key(context):
+    return zone_key(context.get_current_parameters().get("zone"))
+
+
 class ShippingRate(Base):
     __tablename__ = "shipping_rates"
+    __table_args__ = (
+        Index("uq_shipping_rates_lane", "country_key", "type", "weight", "student", "zone_key", unique=True),
+        Index("ix_shipping_rates_country_lane", "country_id", "type", "weight"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     country = Column(String, index=True)
     weight = Column(Float, index=True)
-    type = Column(String, index=True)  
+    type = Column(String, index=True)
+    original_rate = Column(Float)
+    discount_rate = Column(String, nullable=True)
+    source = Column(String, index=True)
+    student = Column(Boolean, default=False)
+    zone = Column(String, nullable=True)
+    addkg = Column(Float, nullable=True)
+    surcharges = Column(Float, nullable=True)
+    country_key = Column(String, nullable=False, default=_default_country_key, server_default="")
+    zone_key = Column(String, nullable=False, default=_default_zone_key, server_default="")
+    country_id = Column(Integer, nullable=True)  # countries.id, set by the upload paths
+
+    # 🔁 Keep the stored keys in sync on ORM writes (bulk inserts use the defaults above)
+    @validates("country")
+    def _sync_country_key(self, _, value):
+        self.country_key = country_key(value)
+        return value
+
+    @validates("zone")
+    def _sync_zone_key(self, _, value):
+        self.zone_key = zone_key(value)
+        return value
+
+
+# 🌍 Country dimension: one canonical name per id, plus alternative spellings
+class Country(Base):
+    __tablename__ = "countries"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)  # country_key of the canonical spelling
+
+
+class CountryAlias(Base):
+    __tablename__ = "country_aliases"
+
+    alias = Column(String, primary_key=True)  # country_key of the alternative spelling
+    country_id = Column(Integer, nullable=False, index=True)
+    source = Column(String, nullable=False, default="manual")  # "builtin" or "manual"
+
+
+# 🏷️ Small key/value table; "data_version" is bumped by every write path
+class RateMeta(Base):
+    __tablename__ = "rate_meta"
+
+    key = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+# 📚 Published rate cards: immutable copies of shipping_rates, one per upload.
+# Readers only see the card rate_meta["published_card"] points at.
+class RateCard(Base):
+    __tablename__ = "rate_cards"
+
+    version = Column(Integer, primary_key=True)
+    created_at = Column(Float, nullable=False)
+    source = Column(String, nullable=False)  # file_type, "clear" or "baseline"
+    filename = Column(String, nullable=True)
+    job_id = Column(String, nullable=True)
+    rows = Column(Integer, nullable=False, default=0)
+    snapshot_file = Column(String, nullable=True)  # content-addressed .npz, see snapshot_files
+
+
+class RateCardRow(Base):
+    __tablename__ = "rate_card_rows"
+
+    # (card_version, rate_id) PK doubles as the read index: one range scan per card
+    card_version = Column(Integer, primary_key=True)
+    rate_id = Column(Integer, primary_key=True)  # shipping_rates.id when published
+    country = Column(String)
+    weight = Column(Float)
+    type = Column(String)
     original_rate = Column(Float)
-    discount_rate = Column(String, nullable=True)  
-    source = Column(String, index=True)          
-    student = Column(Boolean, default=False)     
-    zone = Column(String, nullable=True)         
-    addkg = Column(Float, nullable=True)  
-    surcharges = Column(Float, nullable=True)  
+    discount_rate = Column(String, nullable=True)
+    source = Column(String)
+    student = Column(Boolean, default=False)
+    zone = Column(String, nullable=True)
+    addkg = Column(Float, nullable=True)
+    surcharges = Column(Float, nullable=True)
+    country_key = Column(String, nullable=False, server_default="")
+    zone_key = Column(String, nullable=False, server_default="")
+    country_id = Column(Integer, nullable=True)
 
+
+# 🔄 Change feed: rows a publish added, changed or removed, relative to the
+# card published before it (seq never goes backwards, even after compaction)
+class RateChange(Base):
+    __tablename__ = "rate_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True)
+    card_version = Column(Integer, nullable=False)  # the card this change published
+    rate_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)  # "upsert" or "delete"
+    country = Column(String)
+    weight = Column(Float)
+    type = Column(String)
+    original_rate = Column(Float)
+    discount_rate = Column(String, nullable=True)
+    student = Column(Boolean, default=False)
+    zone = Column(String, nullable=True)
+    addkg = Column(Float, nullable=True)
+    surcharges = Column(Float, nullable=True)
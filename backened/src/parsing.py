@@ -0,0 +1,229 @@
+"""Excel parsing in a bounded process pool.
+
+Reading a worksheet with openpyxl is pure-Python XML work that holds the
+GIL; done on an ingest thread it stalls every other request of the worker
+(``/health`` included). Uploads therefore hand the file path to a small
+pool of parse processes (``EXCEL_PARSE_PROCESSES``, default up to 2; 0
+parses in the calling thread). A worker streams the sheet (:class:`excel.Sheet`)
+and, for the wide layouts, checks the header, melts and normalizes weights /
+zones row by row into typed arrays, so the worker holds one row plus the
+compact columns, never the sheet. It sends back a :class:`ParsedSheet`: numpy
+columns, with text columns as integer codes plus a dictionary. The narrow
+row layouts (a row per country, or two rows) come back as rows.
+
+The pool uses the ``spawn`` start method (safe in a threaded server), so a
+script that triggers uploads needs the usual ``if __name__ == "__main__"``
+guard.
+"""
+import math
+import multiprocessing
+import os
+import re
+import threading
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from . import excel, reports
+
+PARSE_PROCESSES = int(os.environ.get("EXCEL_PARSE_PROCESSES", str(min(2, os.cpu_count() or 1))))
+
+# 📐 Sheets melted in the worker; every other layout comes back as rows
+ZONE_RATE_LAYOUTS = {"zones_docs", "zones_pkg"}
+ROW_LAYOUTS = {"zones", "pkg_discount", "addkg", "zoneaddkg", "surcharges"}
+
+
+class ParsedSheet(excel.LoadedSheet):
+    """A parsed worksheet: ``rows`` for the row-by-row layouts, or melted
+    ``columns`` (+ ``dictionaries`` for coded text columns) and ``skips``
+    (``(order, code, key)`` of cells rejected while normalizing)."""
+
+    def __init__(self, name: str, rows=(), columns=None, dictionaries=None, skips=(),
+                 read_seconds: float = 0.0, melt_seconds: float = 0.0):
+        super().__init__(name, list(rows))
+        self.columns = columns or {}
+        self.dictionaries = dictionaries or {}
+        self.skips = list(skips)
+        # ⏱️ worker time: reading the sheet / header check, melt and normalization
+        self.read_seconds = read_seconds
+        self.melt_seconds = melt_seconds
+
+    @property
+    def seconds(self) -> float:
+        return self.read_seconds + self.melt_seconds
+
+    def column(self, name: str) -> np.ndarray:
+        values = self.columns[name]
+        if name in self.dictionaries:
+            return np.asarray(self.dictionaries[name], dtype=object)[values]
+        return values
+
+
+class _Codes:
+    """A text column encoded while streaming: int32 codes + the dictionary."""
+
+    def __init__(self):
+        self.codes = array("i")
+        self._index = {}
+
+    def append(self, value):
+        self.codes.append(self._index.setdefault(value, len(self._index)))
+
+    def column(self) -> tuple:
+        return np.frombuffer(self.codes, dtype=np.int32), list(self._index)
+
+
+def _number(value) -> float:
+    # same outcome as pandas.to_numeric(errors="coerce") for spreadsheet cells
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _zone_of(label):
+    """``"Zone 3"`` → ``"3"``; None unless the label starts with "Zone" and is numeric."""
+    zone_raw = str(label).strip()
+    zone_str = re.sub(r"(?i)zone", "", zone_raw).strip()
+    # ✅ STRICT: Must start with "Zone" (case-insensitive) and be numeric
+    if not zone_raw.lower().startswith("zone") or not re.fullmatch(r"\d+(\.\d+)?", zone_str):
+        return None
+    zone_float = float(zone_str)
+    return str(int(zone_float)) if zone_float.is_integer() else str(zone_float)  # ✅ Converts 1.0 → "1"
+
+
+def _melt_zone_rates(sheet) -> tuple:
+    header = sheet.header()
+    if "WEIGHT" not in header:
+        raise excel.SheetError("Excel must contain 'WEIGHT' column as first column.")
+
+    zones = {}  # one regex per column label, not per cell
+    orders, weights, values, skips = array("q"), array("d"), array("d"), []
+    zone_keys = _Codes()
+    for order, (weight_raw, zone_label, rate_raw) in enumerate(excel.melt(sheet, header, header.index("WEIGHT"))):
+        if zone_label not in zones:
+            zones[zone_label] = _zone_of(zone_label)
+        zone = zones[zone_label]
+        if zone is None:
+            skips.append((order, reports.INVALID_ZONE, {"weight": str(weight_raw), "zone": str(zone_label).strip()}))
+            continue
+        try:
+            weight = float(weight_raw)
+            retail_rate = float(rate_raw)
+        except Exception:
+            skips.append((order, reports.INVALID_VALUE, {"weight": str(weight_raw), "zone": zone, "value": str(rate_raw)}))
+            continue
+        orders.append(order)
+        weights.append(weight)
+        zone_keys.append(zone)
+        values.append(retail_rate)
+
+    codes, dictionary = zone_keys.column()
+    columns = {
+        "order": np.frombuffer(orders, dtype=np.int64),
+        "weight": np.frombuffer(weights, dtype=np.float64),
+        "zone_key": codes,
+        "value": np.frombuffer(values, dtype=np.float64),
+    }
+    return columns, {"zone_key": dictionary}, skips
+
+
+def _melt_country_weights(sheet) -> tuple:
+    header = sheet.header()
+    if "WEIGHT" not in header:
+        raise excel.SheetError("Excel must contain a 'WEIGHT' column in the first column.")
+
+    # 📌 Melted while streaming; only the non-empty cells are kept, as typed arrays
+    weights, retail_rates, countries = array("d"), array("d"), _Codes()
+    last_raw, weight = None, math.nan
+    for weight_raw, country, rate_raw in excel.melt(sheet, header, header.index("WEIGHT")):
+        if weight_raw is not last_raw:  # once per row, not per cell
+            last_raw = weight_raw
+            weight = math.nan if excel.is_blank(weight_raw) else float(str(weight_raw).replace("KG", "").strip())
+        weights.append(weight)
+        countries.append(str(country))
+        retail_rates.append(_number(rate_raw))
+    codes, dictionary = countries.column()
+    columns = {
+        "Weight": np.frombuffer(weights, dtype=np.float64),
+        "Country": codes,
+        "Retail Rate": np.frombuffer(retail_rates, dtype=np.float64),
+    }
+    return columns, {"Country": dictionary}, []
+
+
+def parse_sheet(path: str, index: int, file_type: str) -> ParsedSheet:
+    """Worker entry point: sheet ``index`` (0-based) of ``path`` parsed for ``file_type``."""
+    started = time.perf_counter()
+    sheet = excel.Sheet(path, index)
+    try:
+        if file_type in ROW_LAYOUTS:
+            return ParsedSheet(sheet.name, list(sheet), read_seconds=time.perf_counter() - started)
+        melt = _melt_zone_rates if file_type in ZONE_RATE_LAYOUTS else _melt_country_weights
+        columns, dictionaries, skips = melt(sheet)
+    finally:
+        sheet.close()
+    melt_seconds = time.perf_counter() - started - sheet.read_seconds
+    return ParsedSheet(sheet.name, (), columns, dictionaries, skips, sheet.read_seconds, melt_seconds)
+
+
+def _watch_parent(parent: int):
+    # 🧹 a worker whose server was killed (or exited without joining the pool) must not linger
+    def watch():
+        while os.getppid() == parent:
+            time.sleep(1)
+        os._exit(0)
+
+    threading.Thread(target=watch, name="parent-watch", daemon=True).start()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=PARSE_PROCESSES, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_watch_parent, initargs=(os.getpid(),),
+                )
+    return _pool
+
+
+def _reset_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def warm_up():
+    """Start a parse worker and load the parser in it (the first upload otherwise pays for it)."""
+    if PARSE_PROCESSES > 0:
+        get_pool().submit(_number, "0").result()
+
+
+def parse_many(path: str, sheets: list) -> list:
+    """``[ParsedSheet]`` for ``[(index, file_type)]``; sheets are parsed in
+    parallel across the pool and returned in order."""
+    if PARSE_PROCESSES <= 0:
+        return [parse_sheet(path, index, file_type) for index, file_type in sheets]
+    pool = get_pool()
+    try:
+        futures = [pool.submit(parse_sheet, path, index, file_type) for index, file_type in sheets]
+        return [future.result() for future in futures]
+    except BrokenProcessPool:
+        _reset_pool(pool)  # a worker died (OOM, killed): the next upload gets a fresh pool
+        raise
+
+
+def parse(path: str, index: int, file_type: str) -> ParsedSheet:
+    return parse_many(path, [(index, file_type)])[0]
+
@@ -0,0 +1,373 @@
+"""Server-side quote engine.
+
+Mirrors the pricing rules in ``ShippingRates.tsx``:
+
+* docs above 2 kg → no base rate, surcharge only
+* above 25 kg → the 25 kg rate plus ``addkg`` per extra full kg (+ half kg)
+* the country surcharge is always added to the retail (original) price
+
+Any other weight resolves to the lane's next bracket up (3.3 kg is priced
+at the 3.5 kg rate), found by bisecting the lane's sorted weights.
+
+Lookups are served from a :class:`RateIndex` built once per province
+snapshot (see ``snapshots.py``), so a quote never touches SQL. Country
+names go through the snapshot's :class:`countries.CountryResolver` first,
+so aliases and near-misses find the canonical lane. Bulk
+pricing (``POST /quotes``) uses :class:`PriceTable`, a NumPy copy of the
+same index that applies these rules to whole arrays at once.
+"""
+import math
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import models
+
+DOCS_MAX_WEIGHT = 2.0
+ADDKG_BASE_WEIGHT = 25.0
+
+# ✅ Public type names → stored ShippingRate.type
+QUOTE_TYPES = {"docs": "docs", "pkg": "non-docs", "non-docs": "non-docs"}
+
+
+class QuoteError(LookupError):
+    pass
+
+
+def normalize_country(country) -> str:
+    return models.country_key(country)
+
+
+def _discounted_value(original, discount_rate) -> float:
+    # Same as the frontend: "No discount available" falls back to retail,
+    # anything unparsable counts as 0.
+    if discount_rate == "No discount available":
+        return float(original or 0)
+    try:
+        value = float(discount_rate)
+    except (TypeError, ValueError):
+        return 0.0
+    return value if value == value else 0.0  # NaN → 0
+
+
+@dataclass
+class Lane:
+    weights: List[float] = field(default_factory=list)
+    original: List[float] = field(default_factory=list)
+    discounted: List[float] = field(default_factory=list)
+
+    def find(self, weight: float) -> Optional[int]:
+        i = bisect_left(self.weights, weight)
+        if i < len(self.weights) and self.weights[i] == weight:
+            return i
+        return None
+
+    def bracket(self, weight: float) -> Optional[int]:
+        """Index of the first bracket at or above ``weight``."""
+        i = bisect_left(self.weights, weight)
+        return i if i < len(self.weights) else None
+
+
+@dataclass
+class RateIndex:
+    version: int = 0
+    lanes: Dict[Tuple[str, str, bool], Lane] = field(default_factory=dict)
+    addkg: Dict[str, float] = field(default_factory=dict)
+    surcharges: Dict[str, float] = field(default_factory=dict)
+    countries: Optional[object] = None  # countries.CountryResolver
+
+    @classmethod
+    def from_rows(cls, rows, version: int = 0, countries=None) -> "RateIndex":
+        """``rows`` are ``crud.RATE_COLUMNS`` tuples in insertion (id) order."""
+        index = cls(version=version, countries=countries)
+        points: Dict[Tuple[str, str, bool], Dict[float, Tuple[float, float]]] = {}
+
+        for country, weight, type_, original, discount, student, _zone, addkg, surcharge in rows:
+            country = normalize_country(country)
+            if type_ in ("docs", "non-docs"):
+                lane = (country, type_, bool(student))
+                # later rows win, like the frontend's keyed object
+                points.setdefault(lane, {})[float(weight or 0)] = (
+                    float(original or 0),
+                    _discounted_value(original, discount),
+                )
+            elif type_ == "add-kg":
+                index.addkg[country] = float(addkg or 0)
+            elif type_ == "sur-charges":
+                if surcharge and surcharge > 0:
+                    index.surcharges[country] = float(surcharge)
+
+        for key, by_weight in points.items():
+            weights = sorted(by_weight)
+            index.lanes[key] = Lane(
+                weights=weights,
+                original=[by_weight[w][0] for w in weights],
+                discounted=[by_weight[w][1] for w in weights],
+            )
+        return index
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, version: int = 0, countries=None) -> "RateIndex":
+        """Same index as :meth:`from_rows`, built from the columns of a binary
+        snapshot (``snapshot_files.load``) without turning them into rows."""
+        index = cls(version=version, countries=countries)
+        names, country = dictionary_codes(arrays, "country", normalize_country)
+        types, type_ = dictionary_codes(arrays, "type")
+        type_code = {name: code for code, name in enumerate(types)}
+        weight = _or_zero(arrays["weight"])
+        original = _or_zero(arrays["original_rate"])
+        student = arrays["student"] > 0
+
+        # "No discount available" falls back to retail; each distinct text is parsed once
+        entries = arrays["discount_rate_dict"].tolist() + [None]
+        fallback = np.array([entry == "No discount available" for entry in entries])[arrays["discount_rate"]]
+        parsed = np.array([_discounted_value(0.0, entry) for entry in entries], dtype=float)[arrays["discount_rate"]]
+        discounted = np.where(fallback, original, parsed)
+
+        # ⚡ lane code = country * 4 + docs * 2 + student; the last row per (lane, weight) wins
+        docs = type_ == type_code.get("docs", -1)
+        rated = np.flatnonzero(docs | (type_ == type_code.get("non-docs", -1)))
+        lane = country[rated] * 4 + docs[rated] * 2 + student[rated]
+        order = np.lexsort((weight[rated], lane))  # stable: equal keys stay in row order
+        lane_sorted, weight_sorted = lane[order], weight[rated][order]
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = (lane_sorted[1:] != lane_sorted[:-1]) | (weight_sorted[1:] != weight_sorted[:-1])
+        kept, kept_lane = rated[order[last]], lane_sorted[last]
+        starts = np.flatnonzero(np.r_[True, kept_lane[1:] != kept_lane[:-1]]) if len(kept) else np.zeros(0, dtype=int)
+        ends = np.r_[starts[1:], len(kept)]
+
+        codes, first = np.unique(lane, return_index=True)  # sorted like the groups
+        for group in np.argsort(first, kind="stable").tolist():  # lanes in order of first appearance
+            rows, code = kept[starts[group]:ends[group]], int(codes[group])
+            key = (names[code // 4], "docs" if code & 2 else "non-docs", bool(code & 1))
+            index.lanes[key] = Lane(
+                weights=weight[rows].tolist(), original=original[rows].tolist(), discounted=discounted[rows].tolist(),
+            )
+
+        # add-kg and surcharge rows are one per country: plain loops over those few rows
+        addkg = _or_zero(arrays["addkg"])
+        for i in np.flatnonzero(type_ == type_code.get("add-kg", -1)).tolist():
+            index.addkg[names[country[i]]] = float(addkg[i])
+        surcharges = arrays["surcharges"]
+        for i in np.flatnonzero((type_ == type_code.get("sur-charges", -1)) & (surcharges > 0)).tolist():
+            index.surcharges[names[country[i]]] = float(surcharges[i])
+        return index
+
+    @staticmethod
+    def _rate_type(type_: str, weight: float = None, check_weight: bool = True) -> str:
+        rate_type = QUOTE_TYPES.get(type_)
+        if rate_type is None:
+            raise ValueError(f"Unknown type '{type_}'. Use 'docs' or 'pkg'.")
+        if check_weight and (weight is None or not math.isfinite(weight) or weight <= 0):
+            raise ValueError("Weight must be greater than 0.")
+        return rate_type
+
+    def canonical(self, country) -> str:
+        if self.countries is None:
+            return normalize_country(country)
+        return self.countries.canonical(country)
+
+    def _lane(self, country: str, rate_type: str, type_: str, student: bool) -> Tuple[str, Lane]:
+        country = self.canonical(country)
+        lane = self.lanes.get((country, rate_type, bool(student)))
+        if lane is None:
+            raise QuoteError(f"No {type_} rates found for '{country}'.")
+        return country, lane
+
+    def brackets(self, country: str, type_: str = "pkg", student: bool = False) -> List[float]:
+        _, lane = self._lane(country, self._rate_type(type_, check_weight=False), type_, student)
+        return list(lane.weights)
+
+    def _resolve(self, country: str, rate_type: str, lane: Lane, weight: float, type_: str) -> Tuple[str, Optional[int]]:
+        """``(regime, bracket index)``; regime is ``surcharge``, ``addkg`` or ``table``."""
+        # 🔒 DOCS above 2kg → rates are 0, only the surcharge applies
+        if rate_type == "docs" and weight > DOCS_MAX_WEIGHT:
+            return "surcharge", None
+
+        if rate_type == "non-docs" and weight > ADDKG_BASE_WEIGHT:
+            base = lane.find(ADDKG_BASE_WEIGHT)
+            if base is None:
+                raise QuoteError(f"No {type_} rate for '{country}' at {ADDKG_BASE_WEIGHT}kg to add kilos to.")
+            return "addkg", base
+
+        i = lane.bracket(weight)
+        if i is None:
+            raise QuoteError(f"No {type_} rate for '{country}' at {weight}kg (heaviest bracket is {lane.weights[-1]}kg).")
+        return "table", i
+
+    def resolve(self, country: str, weight: float, type_: str = "pkg", student: bool = False) -> dict:
+        rate_type = self._rate_type(type_, weight)
+        country, lane = self._lane(country, rate_type, type_, student)
+        regime, i = self._resolve(country, rate_type, lane, weight, type_)
+        return {
+            "regime": regime,
+            "bracket": lane.weights[i] if i is not None else None,
+            "exact": i is not None and lane.weights[i] == weight,
+            "extra_units": extra_units(weight) if regime == "addkg" else 0.0,
+            "brackets": list(lane.weights),
+        }
+
+    def quote(self, country: str, weight: float, type_: str = "pkg", student: bool = False) -> dict:
+        rate_type = self._rate_type(type_, weight)
+        country, lane = self._lane(country, rate_type, type_, student)
+        regime, i = self._resolve(country, rate_type, lane, weight, type_)
+        surcharge = self.surcharges.get(country, 0.0)
+
+        if regime == "surcharge":
+            return _result(0.0, 0.0, surcharge)
+
+        original = lane.original[i]
+        discounted = lane.discounted[i]
+        # 📦 AddKG applies only to pkg; the discount still needs an exact entry
+        if regime == "addkg":
+            original += extra_units(weight) * (self.addkg.get(country) or 0.0)
+            exact = lane.find(weight)
+            discounted = lane.discounted[exact] if exact is not None else 0.0
+            if not math.isfinite(original + surcharge):
+                raise ValueError(f"Weight {weight}kg is too large to price.")
+
+        return _result(original + surcharge, discounted, surcharge)
+
+
+def _or_zero(values: np.ndarray) -> np.ndarray:
+    # null (NaN) → 0 like ``value or 0``; unlike np.nan_to_num, infinities stay
+    return np.where(np.isnan(values), 0.0, values)
+
+
+def dictionary_codes(arrays: dict, name: str, convert=None) -> Tuple[list, np.ndarray]:
+    """``(values, codes)`` of a dictionary-encoded snapshot column, with
+    ``convert`` applied to each dictionary entry once (equal results share a
+    code); the null code -1 becomes the code of ``convert(None)``."""
+    values, remap = {}, []
+    for entry in arrays[f"{name}_dict"].tolist() + [None]:
+        remap.append(values.setdefault(convert(entry) if convert else entry, len(values)))
+    return list(values), np.asarray(remap, dtype=np.int64)[arrays[name]]
+
+
+def extra_units(weight: float) -> float:
+    # Full kilos over 25kg, plus half a kilo for any remainder
+    diff = weight - ADDKG_BASE_WEIGHT
+    full = int(diff)
+    return full + (0.5 if diff != full else 0.0)
+
+
+def _result(original: float, discounted: float, surcharge: float) -> dict:
+    return {
+        "original": original,
+        "discounted": discounted,
+        "discount_dollar": original - discounted,
+        "surcharge": surcharge,
+    }
+
+
+# 📊 Vectorized pricing; per-row outcome codes
+PRICED, NO_LANE, NO_RATE = 0, 1, 2
+
+
+class PriceTable:
+    """Column-oriented copy of a :class:`RateIndex`.
+
+    Every (lane, weight) entry gets an integer key ``lane * len(weights) +
+    weight position`` so exact-weight lookups for a whole batch are one
+    ``searchsorted`` over a sorted int64 array.
+    """
+
+    def __init__(self, index: RateIndex):
+        self.index = index
+        self.version = index.version
+        self.weights = np.array(sorted({w for lane in index.lanes.values() for w in lane.weights}), dtype=float)
+        weight_pos = {w: i for i, w in enumerate(self.weights.tolist())}
+        width = max(len(self.weights), 1)
+
+        self.lane_ids = {}
+        keys, original, discounted = [], [], []
+        for lane_id, (key, lane) in enumerate(index.lanes.items()):
+            self.lane_ids[key] = lane_id
+            keys.extend(lane_id * width + weight_pos[w] for w in lane.weights)
+            original.extend(lane.original)
+            discounted.extend(lane.discounted)
+
+        self.width = width
+        self.keys = np.array(keys, dtype=np.int64)  # lanes in order, weights sorted within each
+        self.original = np.array(original, dtype=float)
+        self.discounted = np.array(discounted, dtype=float)
+        self.addkg = dict(index.addkg)
+        self.surcharges = dict(index.surcharges)
+
+    def _find(self, lanes: np.ndarray, weights: np.ndarray, up: bool = False) -> np.ndarray:
+        """Entry position of each exact (lane, weight), or with ``up`` of the
+        lane's first bracket at or above the weight; -1 when there is none."""
+        found = np.full(len(lanes), -1, dtype=np.int64)
+        if not len(self.keys):
+            return found
+        pos = np.searchsorted(self.weights, weights)
+        wanted = lanes * self.width + pos
+        entry = np.minimum(np.searchsorted(self.keys, wanted), len(self.keys) - 1)
+        if up:
+            # first key at/after `wanted` that still belongs to the same lane
+            hit = (lanes >= 0) & (self.keys[entry] >= wanted) & (self.keys[entry] < (lanes + 1) * self.width)
+        else:
+            clipped = np.minimum(pos, len(self.weights) - 1)
+            hit = (lanes >= 0) & (self.weights[clipped] == weights) & (self.keys[entry] == wanted)
+        found[hit] = entry[hit]
+        return found
+
+    def price(self, countries, weights, rate_types, students) -> dict:
+        """Price parallel columns; ``rate_types`` must be stored types
+        (``docs`` / ``non-docs``). Countries are resolved once per distinct name."""
+        weights = np.asarray(weights, dtype=float)
+        docs = np.asarray(rate_types, dtype=object) == "docs"
+        student = np.asarray(students, dtype=bool)
+
+        # per-country lookups run once per distinct country, then fan out by code
+        first = {}
+        codes = np.fromiter((first.setdefault(c, len(first)) for c in countries), dtype=np.int64, count=len(weights))
+        uniques = [self.index.canonical(c) for c in first]
+        lane_table = np.array(
+            [[[self.lane_ids.get((c, t, s), -1) for s in (False, True)] for t in ("non-docs", "docs")] for c in uniques],
+            dtype=np.int64,
+        ).reshape(len(uniques), 2, 2)
+        lanes = lane_table[codes, docs.astype(int), student.astype(int)]
+        surcharge = np.array([self.surcharges.get(c, 0.0) for c in uniques], dtype=float)[codes]
+        addkg = np.array([self.addkg.get(c) or 0.0 for c in uniques], dtype=float)[codes]
+
+        # ⚖️ Next bracket up; above 25kg (pkg) the 25kg rate, discount only on an exact entry
+        heavy = (weights > ADDKG_BASE_WEIGHT) & ~docs
+        bracket = self._find(lanes, weights, up=True)
+        base = np.where(heavy, self._find(lanes, np.full(len(weights), ADDKG_BASE_WEIGHT)), bracket)
+        discount_at = np.where(heavy, self._find(lanes, weights), bracket)
+
+        original = np.where(base >= 0, self.original[np.maximum(base, 0)] if len(self.keys) else 0.0, 0.0)
+        discounted = np.where(discount_at >= 0, self.discounted[np.maximum(discount_at, 0)] if len(self.keys) else 0.0, 0.0)
+
+        # 📦 AddKG applies only to pkg: full kilos over 25kg, plus half a kilo for any remainder
+        diff = weights - ADDKG_BASE_WEIGHT
+        full = np.floor(diff)
+        units = full + np.where(diff != full, 0.5, 0.0)
+        with np.errstate(over="ignore"):  # huge weights price to inf; callers report those rows
+            original = original + np.where(heavy, units * addkg, 0.0)
+            original = original + surcharge
+
+        # 🔒 DOCS above 2kg → rates are 0, only the surcharge applies
+        docs_over = docs & (weights > DOCS_MAX_WEIGHT)
+        original = np.where(docs_over, 0.0, original)
+        discounted = np.where(docs_over, 0.0, discounted)
+
+        status = np.where(lanes < 0, NO_LANE, np.where(docs_over | (base >= 0), PRICED, NO_RATE))
+        return {
+            "status": status,
+            "original": original,
+            "discounted": discounted,
+            "discount_dollar": original - discounted,
+            "surcharge": surcharge,
+        }
+
+    def error(self, country: str, weight: float, type_: str, student: bool) -> str:
+        """Message for a row :meth:`price` could not price (same text as ``quote``)."""
+        try:
+            self.index.quote(country, weight, type_, student)
+        except (ValueError, QuoteError) as e:
+            return str(e)
+        return "Could not price this row."
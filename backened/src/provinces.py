@@ -0,0 +1,33 @@
+"""Configured provinces, one SQLite DB (``shippingrates_<name>.db``) each.
+
+The list comes from the ``PROVINCES`` environment variable (comma
+separated, e.g. ``PROVINCES=sindh,punjab,balochistan,kpk``); its order is
+the order of ``/all-rates`` and ``/compare-rates``. The ``/<name>-rates``
+routes are registered from it, and a province's schema is checked the
+first time one of its sessions is opened (``migrations.ensure_schema``).
+"""
+import os
+import re
+
+from fastapi import HTTPException
+
+DEFAULT_PROVINCES = "sindh,punjab,balochistan"
+NAME = re.compile(r"[a-z0-9_]+")  # used in file names and route paths
+
+
+def _configured() -> tuple:
+    names = [name.strip().lower() for name in os.environ.get("PROVINCES", DEFAULT_PROVINCES).split(",")]
+    names = tuple(dict.fromkeys(name for name in names if name))
+    invalid = [name for name in names if not NAME.fullmatch(name)]
+    if invalid or not names:
+        raise ValueError(f"PROVINCES must be comma-separated names of [a-z0-9_]; got {os.environ.get('PROVINCES')!r}")
+    return names
+
+
+PROVINCES = _configured()
+
+
+def require(province: str) -> str:
+    if province not in PROVINCES:
+        raise HTTPException(status_code=404, detail=f"Unknown province '{province}'. Use one of: {', '.join(PROVINCES)}.")
+    return province
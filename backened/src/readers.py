@@ -0,0 +1,37 @@
+"""Dedicated executor for the async read path.
+
+The rate and quote endpoints are ``async def``: a fresh cached snapshot and
+an already encoded body are served straight from the event loop, and only
+blocking work (the snapshot version check, a snapshot rebuild, building and
+compressing a new body) is sent to this small pool. Slow reads therefore
+queue here instead of taking Starlette's shared threadpool, which keeps
+serving ``/health``, uploads and the other sync endpoints.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+READER_WORKERS = int(os.environ.get("READER_WORKERS", "4"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=READER_WORKERS, thread_name_prefix="reader")
+    return _executor
+
+
+async def run(fn, *args, **kwargs):
+    """``fn(*args, **kwargs)`` on the reader pool; context variables (the
+    per-request SQL counter of ``metrics``) are carried over."""
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), call)
@@ -0,0 +1,115 @@
+"""Structured change reports for ``/upload-rates``.
+
+Every change an upload makes (or would make, with ``dry_run``) is one
+record ``{"action", "code", "key", "cell"}``. The job result keeps only
+per-action/per-code counts and the first ``REPORT_SAMPLES`` records of each
+code; the full list is spooled to ``<REPORT_DIR>/<job_id>.ndjson`` while the
+upload runs and streamed back by ``GET /jobs/{job_id}/report``.
+"""
+import os
+import time
+
+from . import responses
+
+REPORT_DIR = os.environ.get("UPLOAD_REPORT_DIR", "./upload_reports")
+REPORT_SAMPLES = int(os.environ.get("UPLOAD_REPORT_SAMPLES", "20"))
+REPORT_TTL = int(os.environ.get("UPLOAD_REPORT_TTL", str(7 * 24 * 3600)))  # seconds
+FLUSH_RECORDS = 1000
+
+ACTIONS = ("insert", "update", "skip")
+
+# skip codes
+UNCHANGED = "unchanged"
+NOT_FOUND = "not_found"              # pkg_discount lane that does not exist
+ZONE_NOT_FOUND = "zone_not_found"    # zone with no countries mapped to it
+INVALID_ZONE = "invalid_zone"
+INVALID_VALUE = "invalid_value"
+LANE_CONFLICT = "lane_conflict"      # zones file: lane already held in the target zone, row left in its zone
+# insert / update codes
+NEW = "new"
+CHANGED = "changed"
+
+
+def report_path(job_id: str) -> str:
+    return os.path.join(REPORT_DIR, f"{job_id}.ndjson")
+
+
+def _prune():
+    cutoff = time.time() - REPORT_TTL
+    for name in os.listdir(REPORT_DIR):
+        path = os.path.join(REPORT_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+class ChangeReport:
+    def __init__(self, job_id: str, dry_run: bool = False):
+        self.job_id = job_id
+        self.dry_run = dry_run
+        self.counts = {action: {} for action in ACTIONS}
+        self.samples = {action: {} for action in ACTIONS}
+        self.sheet = None  # 📚 workbook uploads: the sheet records come from
+        self._pending = []
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        _prune()
+        self._handle = open(report_path(job_id), "wb")
+
+    def add(self, action: str, code: str, cell=None, value=None, **key):
+        record = {"action": action, "code": code, "key": key}
+        if self.sheet is not None:
+            record["sheet"] = self.sheet
+        if cell is not None:
+            record["cell"] = cell
+        if value is not None:
+            record["value"] = value
+
+        counts = self.counts[action]
+        counts[code] = counts.get(code, 0) + 1
+        samples = self.samples[action].setdefault(code, [])
+        if len(samples) < REPORT_SAMPLES:
+            samples.append(record)
+
+        self._pending.append(record)
+        if len(self._pending) >= FLUSH_RECORDS:
+            self.flush()
+
+    def extend(self, records):
+        """``(cell, action, code, key)`` tuples, e.g. a diffed chunk of ``ingest.UpsertResult``."""
+        for cell, action, code, key in records:
+            self.add(action, code, cell=cell, **key)
+
+    def flush(self):
+        if self._pending and self._handle is not None:
+            self._handle.write(responses.dumps_lines(self._pending))
+        self._pending = []
+
+    def close(self):
+        if self._handle is not None:
+            self.flush()
+            self._handle.close()
+            self._handle = None
+
+    def total(self, action: str) -> int:
+        return sum(self.counts[action].values())
+
+    def skipped_lines(self) -> list:
+        # 📌 short lines for the upload panel (capped like the samples)
+        lines = []
+        for code, samples in self.samples["skip"].items():
+            for record in samples:
+                key = " - ".join(str(v) for v in record["key"].values() if v is not None)
+                lines.append(f"{code}: {key}" + (f" ({record['value']})" if "value" in record else ""))
+        return lines
+
+    def summary(self) -> dict:
+        return {
+            "dry_run": self.dry_run,
+            "totals": {action: self.total(action) for action in ACTIONS},
+            "counts": self.counts,
+            "samples": self.samples,
+            "truncated": any(n > REPORT_SAMPLES for codes in self.counts.values() for n in codes.values()),
+            "detail": f"/jobs/{self.job_id}/report",
+        }
@@ -0,0 +1,167 @@
+"""Rate table serialization: row/columnar payloads, compression and ETags."""
+import gzip
+import json
+import threading
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+from . import metrics, readers
+
+try:  # ⚡ optional fast paths
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Order matches crud.RATE_COLUMNS
+FIELDS = ["Country", "Weight", "Type", "Retail Rate", "Discount Rate", "Student", "Zone", "Addkg", "Surcharges"]
+# Low-cardinality columns sent as a dictionary + integer codes
+DICTIONARY_FIELDS = {"Country", "Type", "Zone"}
+
+FORMATS = ("rows", "columnar")
+
+# 🗜️ Encoded bodies keyed by (tag, encoding); tags embed the data version
+BODY_CACHE_SIZE = 16
+_bodies = OrderedDict()
+_bodies_lock = threading.Lock()
+
+
+def rows_payload(rows) -> list:
+    return [dict(zip(FIELDS, row)) for row in rows]
+
+
+def columnar_payload(rows) -> dict:
+    columns = list(zip(*rows)) if rows else [()] * len(FIELDS)
+    out = {"count": len(rows), "dictionaries": {}, "columns": {}}
+    for name, values in zip(FIELDS, columns):
+        if name in DICTIONARY_FIELDS:
+            codes = {}
+            out["columns"][name] = [codes.setdefault(v, len(codes)) for v in values]
+            out["dictionaries"][name] = list(codes)
+        else:
+            out["columns"][name] = list(values)
+    return out
+
+
+def dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_lines(payloads) -> bytes:
+    """NDJSON: one compact JSON document per line."""
+    # appended one by one: b"".join would keep every per-line buffer alive at once
+    out = bytearray()
+    for payload in payloads:
+        if orjson is not None:
+            out += orjson.dumps(payload, option=orjson.OPT_APPEND_NEWLINE)
+        else:
+            out += dumps(payload) + b"\n"
+    return bytes(out)
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if token:
+            accepted[token.lower()] = quality
+
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return "identity"
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
+def versioned_response(request: Request, tag: str, build) -> Response:
+    """Serve ``build()`` as JSON with a strong ETag of ``tag`` + encoding.
+
+    ``tag`` must change whenever the underlying data version changes, so an
+    unchanged table is answered with 304 before anything is serialized.
+    """
+    encoding, headers = _versioned_headers(request, tag)
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return _body_response(_encoded_body(tag, encoding, build), encoding, headers)
+
+
+async def versioned_response_async(request: Request, tag: str, build) -> Response:
+    """:func:`versioned_response` for async handlers: a 304 or a cached body
+    never leaves the event loop, a new body is built on the reader pool."""
+    encoding, headers = _versioned_headers(request, tag)
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    body = _cached_body(tag, encoding)
+    if body is None:
+        body = await readers.run(_encoded_body, tag, encoding, build)
+    return _body_response(body, encoding, headers)
+
+
+def _versioned_headers(request: Request, tag: str):
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    etag = f'"{tag}-{encoding}"'
+    return encoding, {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+
+
+def _body_response(body: bytes, encoding: str, headers: dict) -> Response:
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _cached_body(tag: str, encoding: str):
+    key = (tag, encoding)
+    with _bodies_lock:
+        body = _bodies.get(key)
+        if body is not None:
+            _bodies.move_to_end(key)
+    if body is not None:
+        metrics.cache_lookups.inc(cache="body", result="hit")
+    return body
+
+
+def _encoded_body(tag: str, encoding: str, build) -> bytes:
+    body = _cached_body(tag, encoding)
+    if body is not None:
+        return body
+    metrics.cache_lookups.inc(cache="body", result="miss")
+
+    key = (tag, encoding)
+    body = dumps(build())
+    if encoding == "br":
+        body = brotli.compress(body, quality=5)
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=6)
+
+    with _bodies_lock:
+        _bodies[key] = body
+        while len(_bodies) > BODY_CACHE_SIZE:
+            _bodies.popitem(last=False)
+    return body
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
 
 class ShippingRateBase(BaseModel):
@@ -22,3 +22,93 @@ class ShippingRateOut(ShippingRateBase):
 
     class Config:
         orm_mode = True
+
+
+class ConvertedAmounts(BaseModel):
+    # 💱 amounts × rate in a local currency (?currency=PKR)
+    currency: str
+    rate: float
+    fetched_at: float
+    stale: bool
+    original: Optional[float] = None
+    discounted: Optional[float] = None
+    discount_dollar: Optional[float] = None
+    surcharge: Optional[float] = None
+
+
+class QuoteOut(BaseModel):
+    province: str
+    country: str
+    weight: float
+    type: str
+    student: bool
+    original: float
+    discounted: float
+    discount_dollar: float
+    surcharge: float
+    converted: Optional[ConvertedAmounts] = None
+
+
+class ProvinceRate(BaseModel):
+    province: str
+    available: bool
+    country: Optional[str] = None  # the name in this province's country table
+    original: Optional[float] = None
+    discounted: Optional[float] = None
+    discount_dollar: Optional[float] = None
+    surcharge: Optional[float] = None
+    detail: Optional[str] = None
+    converted: Optional[ConvertedAmounts] = None
+
+
+class CompareOut(BaseModel):
+    country: str
+    weight: float
+    type: str
+    student: bool
+    cheapest: Optional[str] = None
+    rates: List[ProvinceRate]
+
+
+class CountryMatch(BaseModel):
+    country: str
+    match: str  # the name or alias the prefix matched
+    zone: Optional[str] = None
+    types: List[str]
+
+
+class CountrySearchOut(BaseModel):
+    province: str
+    version: int
+    prefix: str
+    countries: List[CountryMatch]
+
+
+class BracketOut(BaseModel):
+    province: str
+    country: str
+    type: str
+    student: bool
+    version: int
+    brackets: List[float]
+    weight: Optional[float] = None
+    regime: Optional[str] = None  # table | addkg | surcharge
+    bracket: Optional[float] = None
+    exact: Optional[bool] = None
+    extra_units: Optional[float] = None
+
+
+class RateCardOut(BaseModel):
+    version: int
+    created_at: float
+    source: str
+    filename: Optional[str] = None
+    job_id: Optional[str] = None
+    rows: int
+    published: bool = False
+
+
+class RateCardsOut(BaseModel):
+    province: str
+    published: int
+    cards: List[RateCardOut]
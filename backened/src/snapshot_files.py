@@ -0,0 +1,151 @@
+"""Content-addressed binary rate snapshots (``.npz``, memory-mapped on load).
+
+A province snapshot is written once per rate card as an uncompressed
+NumPy ``.npz``: numeric columns as float64 (NaN = null), text columns
+dictionary-encoded (int32 codes, -1 = null, plus a fixed-width unicode
+dictionary). The file is named by the SHA-256 of its bytes, so it never
+changes and can be served with immutable cache headers; ``np.load`` reads
+it on any client.
+
+Each file belongs to one published rate card (``rate_cards.snapshot_file``),
+so a worker that starts later, or a rollback to an older card, maps the file
+instead of querying the rate table. The pricing and country indexes are
+built straight from the mapped columns; :func:`decode` turns them into the
+row tuples the query returns only for the endpoints that list rates.
+"""
+import hashlib
+import mmap
+import os
+import re
+import struct
+import tempfile
+import zipfile
+
+import numpy as np
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "./rate_snapshots")
+FORMAT_VERSION = 1
+
+# Order matches crud.RATE_COLUMNS
+FLOAT_COLUMNS = {1: "weight", 3: "original_rate", 7: "addkg", 8: "surcharges"}
+TEXT_COLUMNS = {0: "country", 2: "type", 4: "discount_rate", 6: "zone"}
+STUDENT_COLUMN = 5
+COLUMN_COUNT = 9
+
+FILE_NAME = re.compile(r"[a-z0-9_]+-[0-9a-f]{32}\.npz")
+
+
+def file_path(name: str) -> str:
+    return os.path.join(SNAPSHOT_DIR, name)
+
+
+def is_file_name(name: str) -> bool:
+    return FILE_NAME.fullmatch(name) is not None
+
+
+# 📦 rows → arrays → .npz
+def encode(rows) -> dict:
+    columns = list(zip(*rows)) if rows else [()] * COLUMN_COUNT
+    arrays = {"format": np.array([FORMAT_VERSION], dtype=np.int32)}
+    for i, name in FLOAT_COLUMNS.items():
+        arrays[name] = np.array([np.nan if v is None else v for v in columns[i]], dtype=np.float64)
+    for i, name in TEXT_COLUMNS.items():
+        codes = {}
+        arrays[name] = np.array(
+            [-1 if v is None else codes.setdefault(v, len(codes)) for v in columns[i]], dtype=np.int32
+        )
+        arrays[f"{name}_dict"] = np.array(list(codes), dtype=str) if codes else np.array([], dtype="<U1")
+    arrays["student"] = np.array([-1 if v is None else int(v) for v in columns[STUDENT_COLUMN]], dtype=np.int8)
+    return arrays
+
+
+def write(province: str, rows) -> str:
+    """Write the snapshot file (if that content does not exist yet); returns its name."""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(prefix=f".{province}-", suffix=".npz", dir=SNAPSHOT_DIR)
+    try:
+        with os.fdopen(handle, "wb") as out:
+            np.savez(out, **encode(rows))
+        digest = hashlib.sha256()
+        with open(temp_path, "rb") as data:
+            for block in iter(lambda: data.read(1 << 20), b""):
+                digest.update(block)
+        name = f"{province}-{digest.hexdigest()[:32]}.npz"
+        if os.path.exists(file_path(name)):
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, file_path(name))
+        return name
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def prune(province: str, keep):
+    """Remove this province's files that no rate card references any more."""
+    keep = set(keep)
+    for name in os.listdir(SNAPSHOT_DIR) if os.path.isdir(SNAPSHOT_DIR) else ():
+        if name.startswith(f"{province}-") and is_file_name(name) and name not in keep:
+            try:
+                os.remove(file_path(name))
+            except OSError:
+                pass
+
+
+# 🚀 .npz → arrays backed by one mmap (members are stored uncompressed)
+def load(name: str) -> dict:
+    path = file_path(name)
+    with open(path, "rb") as handle:
+        buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    arrays = {}
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{name}: member {info.filename} is compressed")
+            name_length, extra_length = struct.unpack("<HH", buffer[info.header_offset + 26:info.header_offset + 30])
+            start = info.header_offset + 30 + name_length + extra_length
+            arrays[info.filename[:-4]] = _array_at(buffer, start)
+    if int(arrays["format"][0]) != FORMAT_VERSION:
+        raise ValueError(f"{name}: unsupported snapshot format {int(arrays['format'][0])}")
+    return arrays
+
+
+def _array_at(buffer, start: int):
+    view = _BufferReader(buffer, start)
+    major, minor = np.lib.format.read_magic(view)
+    if (major, minor) == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(view)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(view)
+    count = int(np.prod(shape))
+    return np.frombuffer(buffer, dtype=dtype, count=count, offset=view.position).reshape(
+        shape, order="F" if fortran_order else "C"
+    )
+
+
+class _BufferReader:
+    """Minimal file-like reader over the mmap for numpy's header parser."""
+
+    def __init__(self, buffer, position: int):
+        self.buffer = buffer
+        self.position = position
+
+    def read(self, size: int) -> bytes:
+        data = self.buffer[self.position:self.position + size]
+        self.position += size
+        return data
+
+
+# 🔁 arrays → crud.RATE_COLUMNS tuples
+def decode(arrays: dict) -> list:
+    columns = [None] * COLUMN_COUNT
+    for i, name in FLOAT_COLUMNS.items():
+        values = arrays[name]
+        nulls = np.isnan(values)
+        columns[i] = np.where(nulls, None, values).tolist() if nulls.any() else values.tolist()
+    for i, name in TEXT_COLUMNS.items():
+        dictionary = arrays[f"{name}_dict"].tolist() + [None]  # code -1 → None
+        columns[i] = [dictionary[code] for code in arrays[name].tolist()]
+    columns[STUDENT_COLUMN] = [None if v < 0 else bool(v) for v in arrays["student"].tolist()]
+    return list(zip(*columns))
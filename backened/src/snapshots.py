@@ -0,0 +1,264 @@
+"""Versioned in-memory rate snapshots shared by every read endpoint.
+
+Each province keeps one immutable :class:`RateSnapshot` (plain tuples, no
+ORM instances) tagged with the ``data_version`` stored in that province's
+DB. Readers compare the cached version with the stored one (a primary-key
+lookup) and rebuild only when a write path has bumped it, which also keeps
+separate gunicorn workers in sync. A card with a binary snapshot file
+(:mod:`snapshot_files`, written when the card is published) is mapped from
+disk instead of queried; the pricing and country indexes are built from the
+mapped columns, and row tuples only when a rate-table endpoint asks.
+
+Cross-province reads (``/all-rates``, ``/compare-rates``) fan out over a
+small shared thread pool instead of walking the provinces one by one.
+
+A version check that matched is trusted for ``SNAPSHOT_RECHECK_INTERVAL``
+seconds (default 0.5; 0 checks on every read). Writes in this process
+invalidate immediately, so the interval only bounds how long another
+worker's publish can go unseen. The ``*_async`` helpers serve such a
+recently confirmed snapshot without leaving the event loop and hand
+everything else to :mod:`readers`.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+
+from . import countries, crud, metrics, readers, responses, snapshot_files
+from .country_search import CountryIndex
+from .database import get_session
+from .pricing import PriceTable, RateIndex
+
+
+class RateSnapshot:
+    def __init__(self, province: str, version: int, rows=None, card: int = 0, file: str = None, seq: int = 0, arrays: dict = None):
+        """Either ``rows`` (from the rate query) or ``arrays`` (a mapped
+        binary snapshot, see :func:`snapshot_files.load`)."""
+        self.province = province
+        self.version = version
+        self.arrays = arrays
+        if rows is not None or arrays is None:
+            self.rows = tuple(rows or ())
+        self.card = card  # published rate card the rows come from
+        self.file = file  # its binary snapshot (snapshot_files), once written
+        self.seq = seq    # change feed position the rows are current to (/{province}-rates/changes)
+
+    # 🔹 Views are derived lazily, once per snapshot; a mapped snapshot only
+    # decodes its rows for the endpoints that return them
+    @cached_property
+    def rows(self) -> tuple:
+        return tuple(snapshot_files.decode(self.arrays))
+
+    @property
+    def count(self) -> int:
+        return len(self.arrays["weight"]) if self.arrays is not None else len(self.rows)
+
+    @cached_property
+    def rows_payload(self) -> list:
+        return responses.rows_payload(self.rows)
+
+    @cached_property
+    def columnar_payload(self) -> dict:
+        return responses.columnar_payload(self.rows)
+
+    @cached_property
+    def countries(self) -> countries.CountryResolver:
+        # 🌍 only the quote paths need it; aliases change with data_version, like the rows
+        with get_session(self.province) as db:
+            return countries.load_resolver(db)
+
+    @cached_property
+    def pricing_index(self) -> RateIndex:
+        if self.arrays is not None:
+            return RateIndex.from_arrays(self.arrays, version=self.version, countries=self.countries)
+        return RateIndex.from_rows(self.rows, version=self.version, countries=self.countries)
+
+    @cached_property
+    def country_index(self) -> CountryIndex:
+        if self.arrays is not None:
+            return CountryIndex.from_arrays(self.arrays, self.countries, version=self.version)
+        return CountryIndex.from_rows(self.rows, self.countries, version=self.version)
+
+    @cached_property
+    def price_table(self) -> PriceTable:
+        return PriceTable(self.pricing_index)
+
+    def payload(self, format: str) -> dict:
+        if format == "columnar":
+            return {"province": self.province, "version": self.version, "seq": self.seq, "format": format, **self.columnar_payload}
+        return {"province": self.province, "version": self.version, "seq": self.seq, "data": self.rows_payload}
+
+
+RECHECK_INTERVAL = float(os.environ.get("SNAPSHOT_RECHECK_INTERVAL", "0.5"))
+
+_snapshots = {}
+_checked = {}  # province → monotonic time its version last matched the DB
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(province: str) -> threading.Lock:
+    lock = _locks.get(province)
+    if lock is None:
+        with _locks_guard:
+            lock = _locks.setdefault(province, threading.Lock())
+    return lock
+
+
+def load_snapshot(province: str) -> RateSnapshot:
+    # version, card + rows come from the same read transaction
+    with get_session(province) as db:
+        version, card, name, seq = crud.get_published_state(db)
+        if name:
+            try:  # 🚀 mapped binary snapshot of the card, no rate query
+                return RateSnapshot(province, version, card=card, file=name, seq=seq, arrays=snapshot_files.load(name))
+            except (OSError, ValueError):
+                pass  # missing or unreadable file → rows from the DB
+        rows = crud.get_rate_rows(db, card)
+    return RateSnapshot(province, version, rows, card, seq=seq)
+
+
+def persist_card(province: str, card: int = None) -> str:
+    """Write the binary snapshot of a card (default: the published one) and
+    record it on the card; files no card references any more are removed."""
+    with get_session(province) as db:
+        if card is None:
+            _, card, _, _ = crud.get_published_state(db)
+        existing = crud.get_card(db, card)
+        if existing is not None and existing.snapshot_file and os.path.exists(snapshot_files.file_path(existing.snapshot_file)):
+            return existing.snapshot_file
+        name = snapshot_files.write(province, crud.get_rate_rows(db, card))
+        in_use = crud.set_snapshot_file(db, card, name)
+    snapshot_files.prune(province, in_use)
+    return name
+
+
+def _recent(province: str):
+    """The cached snapshot if its version was confirmed within RECHECK_INTERVAL."""
+    snapshot = _snapshots.get(province)
+    if snapshot is None or time.monotonic() - _checked.get(province, float("-inf")) >= RECHECK_INTERVAL:
+        return None
+    metrics.cache_lookups.inc(cache="snapshot", province=province, result="hit")
+    return snapshot
+
+
+def _cached(province: str):
+    """``(cached snapshot or None, whether it matches the stored version)``."""
+    snapshot = _recent(province)
+    if snapshot is not None:
+        return snapshot, True
+    snapshot = _snapshots.get(province)
+    fresh = False
+    if snapshot is not None:
+        with get_session(province) as db:
+            fresh = crud.get_data_version(db) == snapshot.version
+        if fresh:
+            _checked[province] = time.monotonic()
+    metrics.cache_lookups.inc(cache="snapshot", province=province, result="hit" if fresh else "miss")
+    return snapshot, fresh
+
+
+def get_snapshot(province: str) -> RateSnapshot:
+    snapshot, fresh = _cached(province)
+    return snapshot if fresh else _rebuild(province, snapshot)
+
+
+def _rebuild(province: str, snapshot) -> RateSnapshot:
+    with _lock_for(province):
+        current = _snapshots.get(province)
+        if current is not None and current is not snapshot:
+            return current  # another thread rebuilt it while we waited
+        current = load_snapshot(province)
+        _snapshots[province] = current
+        _checked[province] = time.monotonic()
+        return current
+
+
+def get_rate_index(province: str) -> RateIndex:
+    return get_snapshot(province).pricing_index
+
+
+def invalidate(province: str):
+    _checked.pop(province, None)
+    _snapshots.pop(province, None)
+
+
+# 🔀 Province fan-out
+FANOUT_WORKERS = int(os.environ.get("SNAPSHOT_FANOUT_WORKERS", "4"))
+_fanout = None
+
+
+def _get_fanout() -> ThreadPoolExecutor:
+    global _fanout
+    if _fanout is None:
+        with _locks_guard:
+            if _fanout is None:
+                _fanout = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="snapshot")
+    return _fanout
+
+
+def fan_out(fn, provinces) -> list:
+    """``[fn(p) for p in provinces]``, run concurrently; order is preserved."""
+    provinces = list(provinces)
+    if len(provinces) < 2:
+        return [fn(p) for p in provinces]
+    return list(_get_fanout().map(fn, provinces))
+
+
+def get_snapshots(provinces) -> list:
+    # version checks are a PK lookup each → inline; only stale provinces are rebuilt in the pool
+    cached = {province: _cached(province) for province in provinces}
+    stale = [province for province, (_, fresh) in cached.items() if not fresh]
+    rebuilt = dict(zip(stale, fan_out(lambda province: _rebuild(province, cached[province][0]), stale)))
+    return [rebuilt.get(province) or cached[province][0] for province in provinces]
+
+
+def get_rate_indexes(provinces) -> list:
+    snapshots = get_snapshots(provinces)
+    # pricing indexes are built lazily, so a fresh snapshot's build runs in the pool too
+    return fan_out(lambda i: snapshots[i].pricing_index, range(len(snapshots)))
+
+
+def get_price_tables(provinces) -> dict:
+    snapshots = get_snapshots(provinces)
+    tables = fan_out(lambda i: snapshots[i].price_table, range(len(snapshots)))
+    return dict(zip(provinces, tables))
+
+
+# ⚡ Async read path: inline when fresh, otherwise on the reader pool
+async def get_snapshot_async(province: str) -> RateSnapshot:
+    return _recent(province) or await readers.run(get_snapshot, province)
+
+
+async def get_snapshots_async(provinces) -> list:
+    provinces = list(provinces)
+    recent = [_recent(province) for province in provinces]
+    if all(recent):
+        return recent
+    return await readers.run(get_snapshots, provinces)
+
+
+async def _derived_async(provinces, name: str) -> list:
+    # cached_property stores in __dict__: present → already built, no blocking work
+    snapshots = await get_snapshots_async(provinces)
+    if all(name in snapshot.__dict__ for snapshot in snapshots):
+        return [getattr(snapshot, name) for snapshot in snapshots]
+    return await readers.run(fan_out, lambda i: getattr(snapshots[i], name), range(len(snapshots)))
+
+
+async def get_rate_index_async(province: str) -> RateIndex:
+    return (await _derived_async([province], "pricing_index"))[0]
+
+
+async def get_rate_indexes_async(provinces) -> list:
+    return await _derived_async(provinces, "pricing_index")
+
+
+async def get_country_index_async(province: str) -> CountryIndex:
+    return (await _derived_async([province], "country_index"))[0]
+
+
+async def get_price_tables_async(provinces) -> dict:
+    provinces = list(provinces)
+    return dict(zip(provinces, await _derived_async(provinces, "price_table")))
@@ -0,0 +1,60 @@
+"""Whole-workbook uploads (``/upload-workbook``).
+
+A manifest maps sheets (by name or 1-based position) to the file types of
+``/upload-rates``, e.g. ``{"Zones": "zones", "Pkg": "retail", "8": "surcharges"}``.
+The workbook is opened once to resolve the manifest, the listed sheets are
+parsed in parallel by the parse pool (:mod:`parsing`), and they are written
+one after the other in :data:`WRITE_ORDER` inside a single
+transaction that publishes one rate card.
+"""
+import json
+from typing import NamedTuple
+
+FILE_TYPES = (
+    "zones", "zones_docs", "zones_pkg", "zoneaddkg",
+    "retail", "docs", "student", "addkg",
+    "pkg_discount", "docs_discount", "surcharges",
+)
+# 🔀 zones first (zone sheets and surcharges look countries up by zone), then the
+# rate sheets, then the sheets that amend existing lanes; manifest order within a step
+WRITE_ORDER = {
+    "zones": 0,
+    "zones_docs": 1, "zones_pkg": 1, "zoneaddkg": 1, "retail": 1, "docs": 1, "student": 1, "addkg": 1,
+    "pkg_discount": 2, "docs_discount": 2, "surcharges": 2,
+}
+
+
+class ManifestError(ValueError):
+    pass
+
+
+class Entry(NamedTuple):
+    index: int  # 0-based worksheet position
+    name: str
+    file_type: str
+
+
+def parse_manifest(text: str) -> list:
+    """``[(sheet ref, file_type)]`` from the manifest JSON object."""
+    try:
+        manifest = json.loads(text)
+    except ValueError as e:
+        raise ManifestError(f"Manifest is not valid JSON: {e}")
+    if not isinstance(manifest, dict) or not manifest:
+        raise ManifestError('Manifest must be a JSON object of sheet → file type, e.g. {"Zones": "zones"}.')
+    unknown = sorted({str(t) for t in manifest.values() if t not in FILE_TYPES})
+    if unknown:
+        raise ManifestError(f"Unknown file type(s): {', '.join(unknown)}. Use one of: {', '.join(FILE_TYPES)}.")
+    return list(manifest.items())
+
+
+def plan(book, manifest: list) -> list:
+    """Manifest entries resolved against the workbook, in write order."""
+    entries = []
+    for ref, file_type in manifest:
+        index = book.index(ref)
+        if any(entry.index == index for entry in entries):
+            raise ManifestError(f"Worksheet '{book.sheet_names[index]}' is listed twice in the manifest.")
+        entries.append(Entry(index, book.sheet_names[index], file_type))
+    return sorted(entries, key=lambda entry: WRITE_ORDER[entry.file_type])
+
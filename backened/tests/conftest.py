@@ -0,0 +1,59 @@
+"""Shared app fixture: one working directory with copies of the province DBs
+(the checked-in ``shippingrates_*.db`` files are never written to)."""
+import io
+import os
+import shutil
+import time
+
+import pytest
+
+# uploads parse in the job thread, no parse processes to spawn
+os.environ.setdefault("EXCEL_PARSE_PROCESSES", "0")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    from fastapi.testclient import TestClient
+
+    from src.provinces import PROVINCES
+
+    workdir = tmp_path_factory.mktemp("app")
+    for province in PROVINCES:
+        path = os.path.join(BACKEND_DIR, f"shippingrates_{province}.db")
+        if os.path.exists(path):
+            shutil.copy(path, workdir)
+    cwd = os.getcwd()
+    os.chdir(workdir)  # the province DBs are opened relative to the working directory
+    try:
+        from src.main import app
+
+        yield TestClient(app)
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def upload(client):
+    """``upload(province, frame, file_type="retail")`` → the finished job."""
+
+    def run(province: str, frame, file_type: str = "retail") -> dict:
+        buffer = io.BytesIO()
+        frame.to_excel(buffer, index=False)
+        response = client.post(
+            "/upload-rates",
+            files={"file": ("rates.xlsx", buffer.getvalue())},
+            data={"province": province, "file_type": file_type, "sheet": 1},
+        )
+        assert response.status_code == 202, response.text
+        job_id = response.json()["job_id"]
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            job = client.get(f"/jobs/{job_id}").json()
+            if job["status"] in ("done", "failed"):
+                return job
+            time.sleep(0.02)
+        raise AssertionError(f"upload job {job_id} did not finish")
+
+    return run
@@ -0,0 +1,80 @@
+"""Country resolution (src/countries.py) and merging an upload typo through
+POST /country-aliases."""
+import pandas as pd
+
+from src import countries
+
+PROVINCE = "punjab"
+
+
+def resolver() -> countries.CountryResolver:
+    return countries.CountryResolver(
+        [(1, "germany"), (2, "costa rica"), (3, "uae"), (4, "st kitts"), (5, "stkitts")],
+        [("emirates", 3)],
+    )
+
+
+def test_exact_alias_and_squashed_names_resolve():
+    names = resolver()
+    assert names.resolve(" Germany ") == countries.Match(1, "germany", countries.EXACT)
+    assert names.resolve("EMIRATES") == countries.Match(3, "uae", countries.ALIAS)
+    assert names.resolve("Costa-Rica") == countries.Match(2, "costa rica", countries.ALIAS)
+    assert names.resolve("") is None
+
+
+def test_typo_resolves_only_when_fuzzy():
+    names = resolver()
+    assert names.resolve("Germny") == countries.Match(1, "germany", countries.FUZZY)
+    assert names.resolve("Germny", fuzzy=False) is None
+    assert names.closest("Germny").name == "germany"
+    assert names.canonical("Nowhere") == "nowhere"
+
+
+def test_squashed_key_shared_by_two_countries_never_matches():
+    assert resolver().resolve("s.t. kitts", fuzzy=False) is None
+
+
+def rates(client, country: str) -> dict:
+    rows = client.get(f"/{PROVINCE}-rates").json()["data"]
+    return {row["Weight"]: row["Retail Rate"] for row in rows if row["Country"] == country and row["Type"] == "non-docs"}
+
+
+def test_upload_typo_becomes_a_country_that_the_alias_endpoint_merges(client, upload):
+    job = upload(PROVINCE, pd.DataFrame({"WEIGHT": [0.5, 1.0], "Bangladesh": [10.0, 11.0]}))
+    assert job["status"] == "done", job["error"]
+
+    # 📌 a close match is not trusted: a new country plus a warning
+    job = upload(PROVINCE, pd.DataFrame({"WEIGHT": [0.5, 99.0], "Bangladsh": [20.0, 21.0]}))
+    assert job["status"] == "done", job["error"]
+    summary = job["result"]["countries"]
+    assert summary["created"] == ["bangladsh"]
+    assert summary["fuzzy"] == {"bangladsh": "bangladesh"}
+    assert "POST /country-aliases?alias=bangladsh&country=bangladesh" in summary["warnings"][0]
+    assert rates(client, "bangladesh") == {0.5: 10.0, 1.0: 11.0}
+
+    params = {"province": PROVINCE, "alias": "Bangladsh", "country": "Bangladesh"}
+    conflict = client.post("/country-aliases", params=params)
+    assert conflict.status_code == 409
+    assert "1 lane(s)" in conflict.json()["detail"]
+
+    merged = client.post("/country-aliases", params={**params, "conflicts": "keep"})
+    assert merged.status_code == 200, merged.text
+    assert (merged.json()["merged"]["moved"], merged.json()["merged"]["dropped"]) == (1, 1)
+    assert rates(client, "bangladesh") == {0.5: 10.0, 1.0: 11.0, 99.0: 21.0}
+    assert rates(client, "bangladsh") == {}
+
+    listed = {entry["name"]: entry["aliases"] for entry in client.get("/country-aliases", params={"province": PROVINCE}).json()["countries"]}
+    assert "bangladsh" not in listed
+    assert "bangladsh" in listed["bangladesh"]
+
+    # the spelling now resolves as an alias: no new country, no warning
+    job = upload(PROVINCE, pd.DataFrame({"WEIGHT": [1.0], "Bangladsh": [12.0]}))
+    assert job["status"] == "done", job["error"]
+    assert job["result"]["countries"]["created"] == []
+    assert rates(client, "bangladesh")[1.0] == 12.0
+
+
+def test_alias_for_unknown_province_or_country_is_404(client):
+    assert client.post("/country-aliases", params={"province": "atlantis", "alias": "x", "country": "uae"}).status_code == 404
+    params = {"province": PROVINCE, "alias": "x", "country": "Nowhere Land"}
+    assert client.post("/country-aliases", params=params).status_code == 404
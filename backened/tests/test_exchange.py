@@ -0,0 +1,184 @@
+"""Exchange-rate cache (src/exchange.py) against the local stand-in provider."""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import exchange
+
+
+class Clock:
+    """Replaces ``exchange.time``: ``time()`` only moves when the test says so."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        pass
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class GatedProvider(exchange.StaticProvider):
+    """Blocks every fetch until ``release()``; can be switched to failing."""
+
+    def __init__(self, rates: dict):
+        super().__init__(rates)
+        self.gate = threading.Event()
+        self.gate.set()
+        self.failing = False
+
+    def hold(self):
+        self.gate.clear()
+
+    def release(self):
+        self.gate.set()
+
+    def fetch(self, base: str, symbol: str) -> float:
+        self.calls += 1
+        assert self.gate.wait(5)
+        if self.failing:
+            raise OSError("provider down")
+        return self.rates[symbol]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(exchange, "time", clock)
+    return clock
+
+
+def service(provider, **options) -> exchange.ExchangeRates:
+    options.setdefault("ttl", 60)
+    options.setdefault("stale", 600)
+    options.setdefault("path", None)
+    return exchange.ExchangeRates(provider, **options)
+
+
+def test_fresh_rate_is_served_from_cache(clock):
+    provider = exchange.StaticProvider({"PKR": 280})
+    rates = service(provider)
+    assert rates.get("PKR").rate == 280
+    clock.advance(59)
+    assert rates.get("PKR") == rates.get("PKR")
+    assert provider.calls == 1
+
+
+def test_rate_is_fetched_again_after_ttl_and_stale_window(clock):
+    provider = exchange.StaticProvider({"PKR": 280})
+    rates = service(provider, ttl=60, stale=0)
+    rates.get("PKR")
+    provider.rates["PKR"] = 281
+    clock.advance(61)
+    rate = rates.get("PKR")
+    assert (rate.rate, rate.stale, provider.calls) == (281, False, 2)
+
+
+def test_expired_rate_is_served_stale_while_one_refresh_runs(clock):
+    provider = GatedProvider({"PKR": 280})
+    rates = service(provider)
+    rates.get("PKR")
+    provider.rates["PKR"] = 281
+    provider.hold()
+    clock.advance(61)
+
+    # served at once, without waiting for the provider
+    first, second = rates.get("PKR"), rates.get("PKR")
+    assert (first.rate, first.stale) == (280, True)
+    assert second.stale
+    refresh = rates.refresh("PKR")  # the refresh already in flight
+    provider.release()
+    assert refresh.result(5).rate == 281
+    assert provider.calls == 2
+
+    rate = rates.get("PKR")
+    assert (rate.rate, rate.stale, provider.calls) == (281, False, 2)
+
+
+def test_concurrent_misses_share_one_fetch(clock):
+    provider = GatedProvider({"PKR": 280})
+    rates = service(provider)
+    provider.hold()
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        futures = [pool.submit(rates.get, "PKR") for _ in range(20)]
+        provider.release()
+        results = [future.result(5) for future in futures]
+    assert {rate.rate for rate in results} == {280}
+    assert provider.calls == 1
+
+
+def test_concurrent_async_misses_share_one_fetch(clock):
+    provider = GatedProvider({"PKR": 280})
+    rates = service(provider)
+    provider.hold()
+
+    async def burst():
+        waiting = [asyncio.ensure_future(rates.get_async("PKR")) for _ in range(50)]
+        await asyncio.sleep(0)
+        provider.release()
+        return await asyncio.gather(*waiting)
+
+    assert {rate.rate for rate in asyncio.run(burst())} == {280}
+    assert provider.calls == 1
+
+
+def test_failed_fetch_falls_back_to_last_known_rate(clock):
+    provider = GatedProvider({"PKR": 280})
+    rates = service(provider)
+    rates.get("PKR")
+    provider.failing = True
+    clock.advance(10_000)  # past ttl + stale
+
+    rate = rates.get("PKR")
+    assert (rate.rate, rate.stale, provider.calls) == (280, True, 2)
+    # the failing provider is not retried on every request
+    assert rates.get("PKR").stale
+    assert provider.calls == 2
+
+
+def test_failed_fetch_without_a_known_rate_raises(clock):
+    provider = GatedProvider({"PKR": 280})
+    provider.failing = True
+    with pytest.raises(exchange.ExchangeRateError):
+        service(provider).get("PKR")
+
+
+def test_rate_is_shared_through_the_cache_file(clock, tmp_path):
+    path = str(tmp_path / "exchange_rates.json")
+    service(exchange.StaticProvider({"PKR": 280}), path=path).get("PKR")
+    provider = exchange.StaticProvider({"PKR": 999})
+    assert service(provider, path=path).get("PKR").rate == 280
+    assert provider.calls == 0
+
+
+def test_quote_in_pkr(client):
+    from src import snapshots
+
+    provider = exchange.StaticProvider({"PKR": 280})
+    exchange.set_provider(provider, path=None)
+    country = sorted({country for country, _, _ in snapshots.get_rate_index("sindh").lanes})[0]
+    params = {"province": "sindh", "country": country, "weight": 2}
+
+    plain = client.get("/quote", params=params).json()
+    assert plain["converted"] is None
+    quote = client.get("/quote", params={**params, "currency": "pkr"}).json()
+    converted = quote["converted"]
+    assert (converted["currency"], converted["rate"], converted["stale"]) == ("PKR", 280, False)
+    for field in ("original", "discounted", "discount_dollar", "surcharge"):
+        assert converted[field] == round(plain[field] * 280, 2)
+
+    assert client.get("/exchange-rate").json()["rate"] == 280
+    assert client.get("/quote", params={**params, "currency": "EUR"}).status_code == 400
+    assert provider.calls == 1
+
+
+def test_unavailable_rate_is_503(client):
+    provider = exchange.StaticProvider({})
+    exchange.set_provider(provider, path=None)
+    assert client.get("/exchange-rate").status_code == 503
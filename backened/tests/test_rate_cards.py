@@ -0,0 +1,76 @@
+"""Rate cards: rolling back to an older card and the change feed
+(/<province>-rates/changes) that lets a client follow both."""
+import pandas as pd
+
+PROVINCE = "balochistan"
+
+
+def key(row: dict) -> tuple:
+    return row["Country"], row["Type"], row["Weight"], row["Student"], row["Zone"]
+
+
+def table(client) -> tuple:
+    """``(seq, {lane: row})`` of the published card."""
+    payload = client.get(f"/{PROVINCE}-rates").json()
+    return payload["seq"], {key(row): {k: v for k, v in row.items() if k != "id"} for row in payload["data"]}
+
+
+def changes(client, since: int) -> dict:
+    response = client.get(f"/{PROVINCE}-rates/changes", params={"since": since})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def apply(rows: dict, feed: dict) -> dict:
+    assert not feed["resync"]
+    rows = dict(rows)
+    for row in feed["deletes"]:
+        rows.pop(key(row))
+    for row in feed["upserts"]:
+        rows[key(row)] = {k: v for k, v in row.items() if k != "id"}
+    return rows
+
+
+def retail(value: float) -> pd.DataFrame:
+    return pd.DataFrame({"WEIGHT": [0.5, 1.0], "Afghanistan": [value, value + 1], "Test Country": [value, value]})
+
+
+def test_change_feed_replays_an_upload(client, upload):
+    seq, before = table(client)
+    assert changes(client, seq) == {"province": PROVINCE, "since": seq, "seq": seq, "resync": False, "deletes": [], "upserts": []}
+
+    job = upload(PROVINCE, retail(100.0))
+    assert job["status"] == "done", job["error"]
+    new_seq, after = table(client)
+    assert new_seq > seq and after != before
+
+    feed = changes(client, seq)
+    assert feed["seq"] == new_seq
+    assert apply(before, feed) == after
+    assert changes(client, new_seq + 1)["resync"]  # a position the feed never reached
+
+
+def test_rollback_restores_the_previous_card(client, upload):
+    assert upload(PROVINCE, retail(200.0))["status"] == "done"
+    cards = client.get("/rate-cards", params={"province": PROVINCE}).json()
+    seq, before = table(client)
+
+    assert upload(PROVINCE, retail(300.0))["status"] == "done"
+    _, changed = table(client)
+    assert changed != before
+
+    response = client.post("/rate-cards/rollback", params={"province": PROVINCE})
+    assert response.status_code == 200, response.text
+    assert response.json()["published"] == cards["published"]
+    rollback_seq, restored = table(client)
+    assert restored == before
+
+    # 🔄 a client at the seq before the rollback catches up from the feed
+    assert apply(before, changes(client, seq)) == restored
+    assert changes(client, rollback_seq)["upserts"] == []
+
+
+def test_rollback_to_a_missing_card_is_404(client):
+    response = client.post("/rate-cards/rollback", params={"province": PROVINCE, "version": 10_000})
+    assert response.status_code == 404
+    assert client.post("/rate-cards/rollback", params={"province": "atlantis"}).status_code == 404
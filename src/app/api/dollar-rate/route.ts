@@ -1,21 +1,16 @@
-
-
-
-
 // // app/api/dollar-rate/route.ts
 
 import { NextResponse } from 'next/server';
 
-export async function GET() {
-  const API_KEY = process.env.EXCHANGE_RATE_API_KEY; // Make sure this is defined in .env.local
-  const url = 'https://api.apilayer.com/exchangerates_data/latest?base=USD&symbols=PKR';
+// The backend caches the USD→PKR rate (one provider call per hour, shared by
+// every visitor); this route only proxies it.
+const BACKEND_URL = process.env.BACKEND_URL ?? 'http://72.62.78.125:8001';
 
+export async function GET() {
   try {
-    const response = await fetch(url, {
+    const response = await fetch(`${BACKEND_URL}/exchange-rate?currency=PKR`, {
       method: 'GET',
-      headers: {
-        apikey: API_KEY!,
-      },
+      next: { revalidate: 300 },
     });
 
     if (!response.ok) {
@@ -23,17 +18,11 @@ export async function GET() {
     }
 
     const data = await response.json();
-    const rate = data.rates?.PKR;
+    const rate = data.rate;
 
-    return NextResponse.json({ rate });
+    return NextResponse.json({ rate, stale: data.stale, fetched_at: data.fetched_at });
   } catch (error) {
     console.error('API Error:', error);
     return NextResponse.json({ error: 'Internal Server Error' }, { status: 500 });
   }
 }
-
-
-
-
-
-
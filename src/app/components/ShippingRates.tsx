@@ -11,6 +11,10 @@ import { useUser } from "@clerk/nextjs";
 import AnimatedTriangle from './3DTriangles';
 import { MoreVertical } from 'lucide-react'; // You can use any 3-dot icon
 
+const UPLOAD_API = 'https://79e488e3-3feb-47f6-afc9-99f176e763b7-00-t6un1m7gnee5.pike.replit.dev';
+const JOB_POLL_MIN_MS = 500; // first poll delay, doubled after every poll
+const JOB_POLL_MAX_MS = 8000;
+const JOB_POLL_TIMEOUT_MS = 10 * 60 * 1000;
 
 export default function ShippingRates() {
     const [active, setActive] = useState<'docs' | 'pkg'>('pkg');
@@ -222,6 +226,31 @@ export default function ShippingRates() {
 
         loadRates();
     }, [province]);
+    // Poll a background upload job until it is done or failed, backing off up to a deadline
+    async function waitForJob(jobId: string) {
+        const deadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+        let delay = JOB_POLL_MIN_MS;
+        while (Date.now() < deadline) {
+            try {
+                const res = await fetch(`${UPLOAD_API}/jobs/${jobId}`);
+                const job = await res.json();
+                if (!res.ok) return { status: 'failed', error: job.detail || 'Upload failed.' };
+                if (job.status === 'done' || job.status === 'failed') return job;
+                if (job.phase) {
+                    setUploadMsg(`⏳ ${job.phase}... ${job.rows_processed}/${job.rows_total || '?'} rows`);
+                }
+            } catch {
+                // network hiccup → try again after the next delay
+            }
+            await new Promise((resolve) => setTimeout(resolve, Math.min(delay, Math.max(deadline - Date.now(), 0))));
+            delay = Math.min(delay * 2, JOB_POLL_MAX_MS);
+        }
+        return {
+            status: 'failed',
+            error: `No result after ${JOB_POLL_TIMEOUT_MS / 60000} minutes; the upload may still finish, reload the rates later (job ${jobId}).`,
+        };
+    }
+
     // Upload handler
     async function handleUpload(e: React.FormEvent) {
         e.preventDefault();
@@ -245,15 +274,25 @@ export default function ShippingRates() {
         try {
 
             // const res = await fetch('https://06d75d5e-523a-4ae0-9015-f96e9ebb379b-00-2htr8edtkrdqn.pike.replit.dev:8000/upload-rates', {
-            const res = await fetch('https://79e488e3-3feb-47f6-afc9-99f176e763b7-00-t6un1m7gnee5.pike.replit.dev/upload-rates', {
+            const res = await fetch(`${UPLOAD_API}/upload-rates`, {
 
                 method: 'POST',
                 body: formData,
             });
 
-            const result = await res.json();
+            const queued = await res.json();
 
-            if (!res.ok) {
+            // ⏳ Upload is processed in the background → poll the job until it finishes
+            let result = queued;
+            let ok = res.ok;
+            if (ok && queued.job_id) {
+                setUploadMsg(queued.message || '⏳ Processing upload...');
+                const job = await waitForJob(queued.job_id);
+                ok = job.status === 'done';
+                result = ok ? job.result : { detail: job.error };
+            }
+
+            if (!ok) {
                 setUploadMsg('❌ ' + (result.detail || 'Upload failed.'));
                 setSkippedLines([]);
                 setTimeout(() => {
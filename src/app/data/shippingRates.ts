@@ -13,8 +13,43 @@ export const pkgData: Record<string, ShippingRate> = {};
 export const discountData: Record<string, number> = {};
 export const surchargesData: Record<string, number> = {}; // ✅ NEW
 
+type Province = 'sindh' | 'punjab' | 'balochistan';
+type RateRecord = Record<string, any>;
+
+const API_URL = 'http://72.62.78.125:8001';
+
+// 🔄 Last full table per province + the change-feed position it is current to
+const cache: Partial<Record<Province, { seq: number; rows: Map<string, RateRecord> }>> = {};
+
+const laneKey = (item: RateRecord) =>
+  [item.Country, item.Type, item.Weight, item.Student, item.Zone].join('|');
+
+async function loadRecords(province: Province): Promise<RateRecord[]> {
+  const cached = cache[province];
+  if (cached) {
+    // ✅ only the rows published since our copy (deletes first, then upserts)
+    const res = await fetch(`${API_URL}/${province}-rates/changes?since=${cached.seq}`);
+    if (res.ok) {
+      const changes = await res.json();
+      if (!changes.resync) {
+        for (const item of changes.deletes) cached.rows.delete(laneKey(item));
+        for (const item of changes.upserts) cached.rows.set(laneKey(item), item);
+        cached.seq = changes.seq;
+        return Array.from(cached.rows.values());
+      }
+    }
+  }
+
+  // const res = await fetch('http://127.0.0.1:8000/all-rates');
+  const res = await fetch(`${API_URL}/${province}-rates`);
+  const json = await res.json();
+  const records: RateRecord[] = json.data;
+  cache[province] = { seq: json.seq ?? 0, rows: new Map(records.map((item) => [laneKey(item), item])) };
+  return records;
+}
+
 export async function fetchShippingRates(
-  province: 'sindh' | 'punjab' | 'balochistan' = 'sindh'
+  province: Province = 'sindh'
 ): Promise<{
   countries: string[];
   weights: number[];
@@ -24,12 +59,7 @@ export async function fetchShippingRates(
   surchargesData: Record<string, number>; // ✅ NEW
 }> {
   try {
-    // const res = await fetch('http://127.0.0.1:8000/all-rates');
-    const res = await fetch(`http://72.62.78.125:8001/${province}-rates`);
-
-
-    const json = await res.json();
-    const records = json.data;
+    const records = await loadRecords(province);
 
     const docs: Record<string, ShippingRate> = {};
     const pkg: Record<string, ShippingRate> = {};